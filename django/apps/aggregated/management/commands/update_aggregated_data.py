@@ -37,7 +37,7 @@ TASK_GROUP_METADATA_QUERY = f"""
                   ELSE 1
                 END
               ) * COUNT(*) as time_spent_max_allowed
-          FROM tasks T
+          FROM tasks_expanded T
               INNER JOIN used_task_groups UG USING (project_id, group_id)
           GROUP BY project_id, project_type, group_id
 """
@@ -27,6 +27,32 @@ IMAGE_API_KEYS = {
     "maxar_premium": IMAGE_MAXAR_PREMIUM_API_KEY,
 }
 
+# number of project drafts which are created in parallel
+CREATION_PROCESSES = int(os.getenv("CREATION_PROCESSES", default=1))
+
+# store tile tasks without geometry and urls, these are derived from the task id
+COMPACT_TILE_TASKS = os.getenv("COMPACT_TILE_TASKS", default="false").lower() == "true"
+
+# store results of tile tasks with packed 64-bit task keys
+COMPACT_TILE_TASK_KEYS = (
+    os.getenv("COMPACT_TILE_TASK_KEYS", default="false").lower() == "true"
+)
+
+# number of projects for which stats are generated in parallel
+GENERATE_STATS_PROCESSES = int(os.getenv("GENERATE_STATS_PROCESSES", default=1))
+# memory (in MB) available for generating stats in parallel
+GENERATE_STATS_MEMORY_LIMIT_MB = int(
+    os.getenv("GENERATE_STATS_MEMORY_LIMIT_MB", default=4096)
+)
+# time (in minutes) after which no further projects with new results are started.
+# If not set, the budget of scheduled runs is derived from their time interval
+# and runs which are not scheduled have no time budget.
+GENERATE_STATS_TIME_BUDGET_MINUTES = (
+    int(os.getenv("GENERATE_STATS_TIME_BUDGET_MINUTES"))
+    if os.getenv("GENERATE_STATS_TIME_BUDGET_MINUTES")
+    else None
+)
+
 SLACK_CHANNEL = os.getenv("SLACK_CHANNEL")
 SLACK_TOKEN = os.getenv("SLACK_TOKEN")
 SENTRY_DSN = os.getenv("SENTRY_DSN")
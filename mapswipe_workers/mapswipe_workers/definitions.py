@@ -17,6 +17,25 @@ OSM_API_LINK = "https://www.openstreetmap.org/api/0.6/"
 OSMCHA_API_LINK = "https://osmcha.org/api/v1/"
 OSMCHA_API_KEY = os.environ["OSMCHA_API_KEY"]
 
+# maximum number of concurrent requests to the OSMCha and OSM API
+CHANGESET_API_MAX_WORKERS = 4
+# persistent cache for changeset information queried from OSMCha and OSM API
+CHANGESET_CACHE_PATH = os.path.join(DATA_PATH, "changeset_cache.sqlite")
+CHANGESET_CACHE_TTL = 30 * 24 * 60 * 60  # seconds
+# content-addressed cache for responses of the ohsome API
+OHSOME_CACHE_PATH = os.path.join(DATA_PATH, "ohsome_cache")
+OHSOME_CACHE_MAX_BYTES = 2 * 1024**3
+OHSOME_CACHE_MAX_AGE = 7 * 24 * 60 * 60  # seconds
+# columnar cache for the results of projects used to generate stats
+RESULTS_CACHE_PATH = os.path.join(DATA_PATH, "results_cache")
+RESULTS_CACHE_MAX_PARTS = 16
+# keyed store for the dynamic information of projects (progress, users, results)
+PROJECTS_DYNAMIC_STORE_PATH = os.path.join(DATA_PATH, "projects_dynamic.sqlite")
+# keyed store for the static information of projects (status, area, geometry)
+PROJECTS_STATIC_STORE_PATH = os.path.join(DATA_PATH, "projects_static.sqlite")
+# manifests of the inputs and output files of the stats of each project
+STATS_MANIFEST_PATH = os.path.join(DATA_PATH, "api", "manifest")
+
 # number of geometries for project geometries
 MAX_INPUT_GEOMETRIES = 10
 
@@ -151,6 +170,17 @@ class ProjectType(Enum):
         }
         return project_type_classes[self.value]
 
+    @property
+    def result_categories(self):
+        """The possible results of a task, e.g. 0 (no), 1 (yes), 2 (maybe), 3 (bad)."""
+        project_type_categories = {
+            1: [0, 1, 2, 3],
+            2: [0, 1, 2, 3],
+            3: [0, 1, 2, 3],
+            4: [0, 1, 2, 3],
+        }
+        return project_type_categories[self.value]
+
     @property
     def tutorial(self):
         # Imports are first made once this method get called to avoid circular imports.
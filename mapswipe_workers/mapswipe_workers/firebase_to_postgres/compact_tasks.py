@@ -0,0 +1,66 @@
+"""
+Compact the tasks of tile projects in Postgres.
+"""
+from typing import List
+
+from mapswipe_workers import auth
+from mapswipe_workers.definitions import ProjectType, logger
+
+TILE_PROJECT_TYPES = [
+    ProjectType.BUILD_AREA.value,
+    ProjectType.CHANGE_DETECTION.value,
+    ProjectType.COMPLETENESS.value,
+]
+
+
+def get_tile_project_ids() -> List[str]:
+    """Get the ids of all projects with tile tasks."""
+    pg_db = auth.postgresDB()
+    sql_query = """
+        SELECT project_id
+        FROM projects
+        WHERE project_type = ANY(%(project_types)s)
+        ORDER BY created
+    """
+    rows = pg_db.retr_query(sql_query, {"project_types": TILE_PROJECT_TYPES})
+    return [row[0] for row in rows]
+
+
+def compact_tasks(project_ids: list) -> int:
+    """
+    Remove geometry and project type specifics of tile tasks.
+
+    Both are derived from the task id (z-x-y) and the tile servers
+    of the project in the tasks_expanded view.
+    Tasks of other project types are not changed.
+    Returns the number of compacted tasks.
+    """
+    pg_db = auth.postgresDB()
+    sql_query = """
+        WITH compacted AS (
+            UPDATE tasks t
+            SET
+                geom = NULL,
+                project_type_specifics = NULL
+            FROM projects p
+            WHERE p.project_id = t.project_id
+                AND t.project_id = %(project_id)s
+                AND p.project_type = ANY(%(project_types)s)
+                AND task_id_to_tile_key(t.task_id) IS NOT NULL
+                AND (t.geom IS NOT NULL OR t.project_type_specifics IS NOT NULL)
+            RETURNING 1
+        )
+        SELECT count(*) FROM compacted
+    """
+    total = 0
+    for i, project_id in enumerate(project_ids):
+        count = pg_db.retr_query(
+            sql_query,
+            {"project_id": project_id, "project_types": TILE_PROJECT_TYPES},
+        )[0][0]
+        total += count
+        logger.info(
+            f"compacted {count} tasks for project {project_id} "
+            f"({i+1}/{len(project_ids)})"
+        )
+    return total
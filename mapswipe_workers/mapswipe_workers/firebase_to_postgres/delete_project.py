@@ -9,6 +9,7 @@ from firebase_admin import exceptions
 
 from mapswipe_workers import auth
 from mapswipe_workers.definitions import CustomError, logger
+from mapswipe_workers.generate_stats import results_cache, stats_manifest
 
 
 def chunks(data: list, size: int = 250) -> Iterable[list]:
@@ -20,6 +21,8 @@ def chunks(data: list, size: int = 250) -> Iterable[list]:
 def delete_project(project_ids: list) -> bool:
     """
     Deletes project, groups, tasks and results from Firebase and Postgres.
+    The stats manifest and the results cache of the project are deleted as well,
+    so that a new project with the same id does not use them.
     """
     for project_id in project_ids:
         if project_id is None:
@@ -99,6 +102,14 @@ def delete_project(project_ids: list) -> bool:
             USING mapping_sessions ms
             WHERE ms.mapping_session_id = msr.mapping_session_id
                 AND ms.project_id = %(project_id)s;
+            DELETE FROM mapping_sessions_results_tiles msr
+            USING mapping_sessions ms
+            WHERE ms.mapping_session_id = msr.mapping_session_id
+                AND ms.project_id = %(project_id)s;
+            DELETE FROM task_result_counts
+            WHERE project_id = %(project_id)s;
+            DELETE FROM project_stats_queue
+            WHERE project_id = %(project_id)s;
         """
         pg_db.query(sql_query, {"project_id": project_id})
         sql_query = """
@@ -114,4 +125,7 @@ def delete_project(project_ids: list) -> bool:
         sql_query = "DELETE FROM projects WHERE project_id = %(project_id)s;"
         pg_db.query(sql_query, {"project_id": project_id})
 
+        stats_manifest.delete(project_id)
+        results_cache.clear(project_id)
+
     return True
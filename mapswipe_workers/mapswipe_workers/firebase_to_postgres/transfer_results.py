@@ -6,6 +6,7 @@ import dateutil.parser
 import psycopg2
 
 from mapswipe_workers import auth
+from mapswipe_workers.config import COMPACT_TILE_TASK_KEYS
 from mapswipe_workers.definitions import logger, sentry
 from mapswipe_workers.firebase_to_postgres import update_data
 
@@ -324,6 +325,9 @@ def save_results_to_postgres(results_file, project_id, filter_mode: bool):
     Saves results to a temporary table in postgres
     using the COPY Statement of Postgres
     for a more efficient import into the database.
+    The results per task and category in task_result_counts
+    and the number of new results of the project in project_stats_queue
+    are updated in the same transaction.
     Parameters
     ----------
     results_file: io.StringIO
@@ -395,21 +399,76 @@ def save_results_to_postgres(results_file, project_id, filter_mode: bool):
             GROUP BY project_id, group_id, user_id
         ON CONFLICT (project_id,group_id,user_id)
         DO NOTHING;
-        INSERT INTO mapping_sessions_results
+        -- Results are counted per task and result category.
+        -- Only inserted results are counted, duplicates are skipped.
+        WITH inserted_results AS (
+            INSERT INTO mapping_sessions_results
+                SELECT
+                    ms.mapping_session_id,
+                    r.task_id,
+                    r.result
+                FROM results_temp r
+                JOIN mapping_sessions ms ON
+                    ms.project_id = r.project_id
+                    AND ms.group_id = r.group_id
+                    AND ms.user_id = r.user_id
+                WHERE NOT %(compact)s OR task_id_to_tile_key(r.task_id) IS NULL
+            ON CONFLICT (mapping_session_id, task_id)
+            DO NOTHING
+            RETURNING mapping_session_id, task_id, result
+        ),
+        -- results of tile tasks are stored with packed task keys
+        inserted_tile_results AS (
+            INSERT INTO mapping_sessions_results_tiles
+                SELECT
+                    ms.mapping_session_id,
+                    task_id_to_tile_key(r.task_id),
+                    r.result
+                FROM results_temp r
+                JOIN mapping_sessions ms ON
+                    ms.project_id = r.project_id
+                    AND ms.group_id = r.group_id
+                    AND ms.user_id = r.user_id
+                WHERE %(compact)s AND task_id_to_tile_key(r.task_id) IS NOT NULL
+            ON CONFLICT (mapping_session_id, task_key)
+            DO NOTHING
+            RETURNING mapping_session_id, tile_key_to_task_id(task_key), result
+        ),
+        new_result_counts AS (
             SELECT
-                ms.mapping_session_id,
+                ms.project_id,
+                ms.group_id,
                 r.task_id,
-                r.result
-            FROM results_temp r
-            JOIN mapping_sessions ms ON
-                ms.project_id = r.project_id
-                AND ms.group_id = r.group_id
-                AND ms.user_id = r.user_id
-        ON CONFLICT (mapping_session_id, task_id)
-        DO NOTHING;
+                r.result,
+                count(*) as count
+            FROM (
+                SELECT * FROM inserted_results
+                UNION ALL
+                SELECT * FROM inserted_tile_results
+            ) r
+            JOIN mapping_sessions ms USING (mapping_session_id)
+            GROUP BY ms.project_id, ms.group_id, r.task_id, r.result
+        ),
+        updated_result_counts AS (
+            INSERT INTO task_result_counts
+                SELECT * FROM new_result_counts
+            ON CONFLICT (project_id, group_id, task_id, result)
+            DO UPDATE SET count = task_result_counts.count + EXCLUDED.count
+        )
+        -- Mark the project as dirty for the stats scheduler.
+        INSERT INTO project_stats_queue (project_id, new_results, dirty_since)
+            SELECT project_id, sum(count), now()
+            FROM new_result_counts
+            GROUP BY project_id
+        ON CONFLICT (project_id)
+        DO UPDATE SET
+            new_results = project_stats_queue.new_results + EXCLUDED.new_results,
+            dirty_since = coalesce(
+                project_stats_queue.dirty_since, EXCLUDED.dirty_since
+            );
         COMMIT;
     """
-    p_con.query(query_insert_mapping_sessions)
+    p_con.query(query_insert_mapping_sessions, {"compact": COMPACT_TILE_TASK_KEYS})
     del p_con
     logger.info("copied results into postgres.")
 
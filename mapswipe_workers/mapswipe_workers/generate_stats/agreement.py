@@ -0,0 +1,120 @@
+"""
+Agreement metrics for results with N answer categories.
+
+All functions take a count matrix with one row per task
+and one column per answer category.
+The answer categories of a project type are defined in
+ProjectType.result_categories.
+"""
+
+from typing import Dict
+
+import numpy as np
+
+
+def calc_total(counts: np.ndarray) -> np.ndarray:
+    """Calculate the number of results per task."""
+    return counts.sum(axis=1)
+
+
+def calc_shares(counts: np.ndarray) -> np.ndarray:
+    """Calculate the share of each category on the total count per task."""
+    return counts / calc_total(counts)[:, None]
+
+
+def calc_task_agreement(counts: np.ndarray) -> np.ndarray:
+    """
+    Calculate the observed agreement per task as used in Scott's Pi
+    and Fleiss' kappa: the share of agreeing pairs of results.
+    Scott's Pi is a measure for inter-rater reliability
+    https://en.wikipedia.org/wiki/Scott%27s_Pi
+
+    The agreement of tasks with a single result is 1.
+    """
+    total = calc_total(counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        agreement = (1.0 / (total * (total - 1))) * (counts * (counts - 1)).sum(axis=1)
+    return np.where(total == 1, 1.0, agreement)
+
+
+def calc_expected_agreement(counts: np.ndarray) -> np.float64:
+    """
+    Calculate the agreement expected by chance
+    from the share of each category on all results.
+
+    Only tasks with at least two results are considered
+    as for the project agreement.
+    """
+    category_totals = counts[calc_total(counts) > 1].sum(axis=0)
+    if category_totals.sum() == 0:
+        return np.nan
+    category_shares = category_totals / category_totals.sum()
+    return (category_shares**2).sum()
+
+
+def calc_task_kappa(counts: np.ndarray) -> np.ndarray:
+    """
+    Calculate the chance-corrected agreement per task
+    using the expected agreement of the project (Fleiss' kappa per task).
+    """
+    expected_agreement = calc_expected_agreement(counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (calc_task_agreement(counts) - expected_agreement) / (
+            1 - expected_agreement
+        )
+
+
+def calc_project_agreement(counts: np.ndarray) -> Dict[str, float]:
+    """
+    Calculate agreement metrics for all tasks of a project.
+
+    Only tasks with at least two results are considered.
+    mean_agreement: mean observed agreement per task
+    expected_agreement: agreement expected by chance
+    fleiss_kappa: chance-corrected mean agreement per task
+        https://en.wikipedia.org/wiki/Fleiss%27_kappa
+    scotts_pi: chance-corrected agreement of all pairs of results,
+        tasks with more results have a higher weight
+        https://en.wikipedia.org/wiki/Scott%27s_Pi
+    """
+    total = calc_total(counts)
+    counts = counts[total > 1]
+    total = total[total > 1]
+
+    if len(counts) == 0:
+        return {
+            "mean_agreement": np.nan,
+            "expected_agreement": np.nan,
+            "fleiss_kappa": np.nan,
+            "scotts_pi": np.nan,
+        }
+
+    expected_agreement = calc_expected_agreement(counts)
+    mean_agreement = calc_task_agreement(counts).mean()
+    pair_agreement = (counts * (counts - 1)).sum() / (total * (total - 1)).sum()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fleiss_kappa = (mean_agreement - expected_agreement) / (1 - expected_agreement)
+        scotts_pi = (pair_agreement - expected_agreement) / (1 - expected_agreement)
+
+    return {
+        "mean_agreement": float(mean_agreement),
+        "expected_agreement": float(expected_agreement),
+        "fleiss_kappa": float(fleiss_kappa),
+        "scotts_pi": float(scotts_pi),
+    }
+
+
+def calc_agreeing_counts(counts: np.ndarray, category_index: np.ndarray) -> np.ndarray:
+    """
+    Calculate for each result how many other results of the task agree.
+
+    Parameters
+    ----------
+    counts: np.ndarray
+        count per category for the task of each result
+    category_index: np.ndarray
+        column of the result in counts, -1 if the result is not a category
+    """
+    agreeing = counts[np.arange(len(counts)), category_index] - 1.0
+    return np.where(category_index >= 0, agreeing, np.nan)
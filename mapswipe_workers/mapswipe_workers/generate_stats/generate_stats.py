@@ -1,99 +1,297 @@
-import datetime as dt
-from typing import List, Optional
+import multiprocessing
+import multiprocessing.connection
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
 
 from mapswipe_workers import auth
-from mapswipe_workers.definitions import DATA_PATH, logger
-from mapswipe_workers.generate_stats import overall_stats, project_stats
+from mapswipe_workers.config import (
+    GENERATE_STATS_MEMORY_LIMIT_MB,
+    GENERATE_STATS_PROCESSES,
+    GENERATE_STATS_TIME_BUDGET_MINUTES,
+)
+from mapswipe_workers.definitions import DATA_PATH, logger, sentry
+from mapswipe_workers.generate_stats import overall_stats, project_stats, stats_queue
+from mapswipe_workers.generate_stats.projects_dynamic_store import (
+    load_projects_dynamic_store,
+)
+
+# Rough estimate of the memory needed to generate the stats of a project.
+# Results, aggregated results and user stats are held in memory at the same time.
+MEMORY_PER_PROCESS = 300 * 1024**2
+MEMORY_PER_RESULT = 2000
+
+# Share of the time interval of scheduled runs used as time budget.
+# The remaining time is left for the projects which are still running
+# and for the overall stats.
+TIME_BUDGET_SHARE = 0.8
+
 
+def get_time_budget(time_interval: int) -> int:
+    """Get the time budget in minutes for runs scheduled every time_interval minutes."""
+    return max(1, int(time_interval * TIME_BUDGET_SHARE))
 
-def get_recent_projects(hours: int = 3):
-    """Get ids for projects when results have been submitted within the last x hours."""
+
+def get_number_of_results(project_ids: List[str]) -> Dict[str, int]:
+    """Get the number of results per project."""
     pg_db = auth.postgresDB()
-    query_insert_results = """
-        select project_id
-        from mapping_sessions
-        where start_time >= %(timestamp)s
-        group by project_id
+    query = """
+        SELECT project_id, sum(count)
+        FROM task_result_counts
+        WHERE project_id = ANY(%(project_ids)s)
+        GROUP BY project_id
     """
-    timestamp = (dt.datetime.utcnow() - dt.timedelta(hours=hours)).isoformat()[
-        0:-3
-    ] + "Z"
-    project_info = pg_db.retr_query(query_insert_results, {"timestamp": timestamp})
+    rows = pg_db.retr_query(query, {"project_ids": project_ids})
+    return {
+        project_id: int(number_of_results) for project_id, number_of_results in rows
+    }
+
+
+def estimate_memory(number_of_results: int) -> int:
+    """Estimate the memory in bytes needed to generate the stats of a project."""
+    return MEMORY_PER_PROCESS + MEMORY_PER_RESULT * number_of_results
+
+
+def get_next_project(
+    pending: List[Tuple[str, int]], used_memory: int, memory_limit: int
+) -> Optional[int]:
+    """
+    Get the index of the next project to start or None if no project fits.
+
+    Pending projects are ordered by their estimated memory (largest first)
+    or by their priority if the time budget is limited.
+    The first project which fits into the free memory is started next.
+    Small projects are started alongside large projects as long as there is memory.
+    A project which needs more memory than the limit is started
+    once no other project is running (used_memory is 0).
+    """
+    for i, (_, memory) in enumerate(pending):
+        if used_memory + memory <= memory_limit:
+            return i
+    if pending and used_memory == 0:
+        return 0
+    return None
+
 
-    project_ids = []
-    for project_id in project_info:
-        project_ids.append(project_id[0])
-    logger.info(f"Got {len(project_ids)} projects from postgres with recent results.")
+def skip_projects(project_ids: List[str]) -> None:
+    """Log projects which are not started since the time budget is used up."""
+    logger.info(
+        f"time budget is used up. skip {len(project_ids)} projects "
+        f"until the next run: {project_ids}"
+    )
 
-    return project_ids
 
+def _get_per_project_statistics_in_subprocess(
+    connection: multiprocessing.connection.Connection,
+    project_id: str,
+    project_info: pd.DataFrame,
+    logging_disabled: bool,
+) -> None:
+    """Entry point for generating the stats of a project in a separate process."""
+    logger.disabled = logging_disabled
+    try:
+        project_stats_dict = project_stats.get_per_project_statistics(
+            project_id, project_info
+        )
+        connection.send(project_stats_dict)
+    except Exception:
+        logger.exception(f"failed to generate stats for project: {project_id}")
+        sentry.capture_exception()
+        raise
+    finally:
+        connection.close()
 
-def generate_stats(project_id_list: Optional[List[str]] = None):
+
+def get_per_project_statistics_in_parallel(
+    project_ids: List[str],
+    projects_df: pd.DataFrame,
+    processes: int,
+    memory_limit: int = GENERATE_STATS_MEMORY_LIMIT_MB * 1024**2,
+    deadline: Optional[float] = None,
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Generate the stats of projects in parallel with one process per project.
+
+    At most `processes` projects are processed at the same time
+    and the estimated memory of all running processes stays below memory_limit.
+    Yield project id and stats of each project as soon as it has finished.
+    Projects for which the process fails are skipped.
+
+    If a deadline (time.monotonic) is given, projects are started in the given order
+    and no further projects are started after the deadline.
+    """
+    # Use spawn to not share Postgres connections with the children.
+    context = multiprocessing.get_context("spawn")
+    number_of_results = get_number_of_results(project_ids)
+    pending = [
+        (project_id, estimate_memory(number_of_results.get(project_id, 0)))
+        for project_id in project_ids
+    ]
+    if deadline is None:
+        pending.sort(key=lambda item: item[1], reverse=True)
+    running = {}
+    used_memory = 0
+
+    while pending or running:
+        if pending and deadline is not None and time.monotonic() > deadline:
+            skip_projects([project_id for project_id, _ in pending])
+            pending = []
+            # nothing to wait for if no project is running
+            continue
+        while len(running) < processes:
+            i = get_next_project(pending, used_memory, memory_limit)
+            if i is None:
+                break
+            project_id, memory = pending.pop(i)
+            project_info = projects_df.loc[projects_df["project_id"] == project_id]
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_get_per_project_statistics_in_subprocess,
+                args=(sender, project_id, project_info, logger.disabled),
+                name=f"generate-stats-{project_id}",
+            )
+            process.start()
+            sender.close()
+            running[process.sentinel] = (process, project_id, memory, receiver)
+            used_memory += memory
+            logger.info(f"start generate stats for project: {project_id}")
+
+        finished = multiprocessing.connection.wait(list(running.keys()))
+        for sentinel in finished:
+            process, project_id, memory, receiver = running.pop(sentinel)
+            used_memory -= memory
+            project_stats_dict = receiver.recv() if receiver.poll() else None
+            receiver.close()
+            process.join()
+            if process.exitcode == 0 and project_stats_dict is not None:
+                yield project_id, project_stats_dict
+            else:
+                details = (
+                    "The generate stats process exited unexpectedly "
+                    f"with exit code {process.exitcode}."
+                )
+                logger.warning(f"{project_id} - {details}")
+                sentry.capture_message(f"{project_id} - {details}")
+
+
+def get_per_project_statistics(
+    project_ids: List[str],
+    projects_df: pd.DataFrame,
+    deadline: Optional[float] = None,
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Generate the stats of projects one after another.
+    If a deadline (time.monotonic) is given,
+    no further projects are started after the deadline.
+    """
+    for i, project_id in enumerate(project_ids):
+        if deadline is not None and time.monotonic() > deadline:
+            skip_projects(project_ids[i:])
+            break
+        project_info = projects_df.loc[projects_df["project_id"] == project_id]
+        logger.info(f"start generate stats for project: {project_id}")
+        yield project_id, project_stats.get_per_project_statistics(
+            project_id, project_info
+        )
+
+
+def generate_stats(
+    project_id_list: Optional[List[str]] = None,
+    processes: int = GENERATE_STATS_PROCESSES,
+    time_budget: Optional[int] = GENERATE_STATS_TIME_BUDGET_MINUTES,
+):
     """
     Query attributes for all projects from postgres projects table
     Write information on status (e.g. active, inactive, finished) and further attributes
     for all projects to projects_static.csv.
     Computationally more expensive tasks are only performed for projects specified in
     project_id_list.
-    Write information on progress and contributors and further attributes
-    only for projects specified in project_id_list to projects_dynamic.csv.
+    Update information on progress and contributors and further attributes
+    only for projects specified in project_id_list in the projects dynamic store
+    and write all projects from the store to projects_dynamic.csv.
     Write information on project progress history and aggregated results
     only for projects specified in project_id_list to csv and geojson files.
     Merge projects_static.csv and projects_dynamic.csv into projects.csv.
     Convert projects.csv file into GeoJSON format using project geometry and project
     centroid.
 
+    With more than one process the stats of several projects are generated
+    in parallel. Each project is handled in its own process.
+
+    If no project ids are given, the stats are generated for the projects
+    with new results in the stats queue ordered by their priority.
+    No further projects are started once the time budget is used up.
+    These projects stay in the queue for the next run.
+    Without time budget the stats of all queued projects are generated.
+
     Parameters
     ----------
     project_id_list: list
+    processes: int
+        Number of projects for which stats are generated in parallel.
+    time_budget: int, optional
+        Time in minutes after which no further projects from the queue are started.
     """
+    start_time = time.monotonic()
 
     projects_info_filename = f"{DATA_PATH}/api/projects/projects_static.csv"
     projects_df = overall_stats.get_project_static_info(projects_info_filename)
     project_id_list_postgres = projects_df["project_id"].to_list()
 
     projects_info_dynamic_filename = f"{DATA_PATH}/api/projects/projects_dynamic.csv"
-    projects_dynamic_df = overall_stats.load_project_info_dynamic(
-        projects_info_dynamic_filename
-    )
+    projects_dynamic_store = load_projects_dynamic_store(projects_info_dynamic_filename)
 
     # Check if an empty project id list has been passed.
     # This means the user did not specify for which projects
     # the generate stats workflow should be performed.
-    # In this case, project ids are queried from postgres for projects
-    # for which results have been submitted within the last three hours.
+    # In this case, project ids are taken from the stats queue for projects
+    # for which new results have been transferred.
     if project_id_list is None or len(project_id_list) == 0:
-        project_id_list = get_recent_projects(hours=3)
+        queued_projects = stats_queue.get_queued_projects()
+        project_id_list = stats_queue.prioritize_projects(
+            list(queued_projects.values())
+        )
+        if time_budget is not None:
+            deadline = start_time + time_budget * 60
+        else:
+            deadline = None
+    else:
+        queued_projects = stats_queue.get_queued_projects(project_id_list)
+        deadline = None
 
     logger.info(f"will generate stats for: {project_id_list}")
 
-    # get per project stats and aggregate based on task_id
+    # check if project id is existing
+    existing_project_ids = []
     for project_id in project_id_list:
-
-        # check if project id is existing
         if project_id not in project_id_list_postgres:
             logger.info(f"project {project_id} does not exist. skip this one.")
             continue
+        existing_project_ids.append(project_id)
 
-        project_info = projects_df.loc[projects_df["project_id"] == project_id]
+    # get per project stats and aggregate based on task_id
+    if processes > 1 and len(existing_project_ids) > 1:
+        per_project_statistics = get_per_project_statistics_in_parallel(
+            existing_project_ids, projects_df, processes, deadline=deadline
+        )
+    else:
+        per_project_statistics = get_per_project_statistics(
+            existing_project_ids, projects_df, deadline=deadline
+        )
 
-        logger.info(f"start generate stats for project: {project_id}")
-        idx = projects_dynamic_df.index[
-            projects_dynamic_df["project_id"] == project_id
-        ].tolist()
-        if len(idx) > 0:
-            projects_dynamic_df.drop([idx[0]], inplace=True)
+    with projects_dynamic_store:
+        for project_id, project_stats_dict in per_project_statistics:
+            if project_stats_dict:
+                projects_dynamic_store.update(project_stats_dict)
+            else:
+                projects_dynamic_store.delete(project_id)
+            if project_id in queued_projects:
+                stats_queue.mark_stats_generated(queued_projects[project_id])
 
-        # aggregate results and get per project statistics
-        project_stats_dict = project_stats.get_per_project_statistics(
-            project_id, project_info
-        )
-        if project_stats_dict:
-            projects_dynamic_df = projects_dynamic_df.append(
-                project_stats_dict, ignore_index=True
-            )
-            projects_dynamic_df.to_csv(
-                projects_info_dynamic_filename, index_label="idx"
+        if len(project_id_list) > 0:
+            projects_dynamic_df = projects_dynamic_store.to_csv(
+                projects_info_dynamic_filename
             )
 
     if len(project_id_list) > 0:
@@ -110,7 +308,7 @@ def generate_stats(project_id_list: Optional[List[str]] = None):
     logger.info(f"finished generate stats for: {project_id_list}")
 
 
-def generate_stats_all_projects():
+def generate_stats_all_projects(processes: int = GENERATE_STATS_PROCESSES):
     """
     queries all existing project ids from postgres projects table
     saves them into a csv file and returns a list of all project ids
@@ -125,4 +323,4 @@ def generate_stats_all_projects():
     project_id_list = projects_df["project_id"].to_list()
 
     # generate stats for the derived project ids
-    generate_stats(project_id_list)
+    generate_stats(project_id_list, processes)
@@ -1,11 +1,36 @@
-import os
+import tempfile
+from typing import Dict, List
 
 import pandas as pd
+from psycopg2 import sql
 
 from mapswipe_workers import auth
 from mapswipe_workers.definitions import logger
+from mapswipe_workers.generate_stats.projects_static_store import (
+    PROJECTS_STATIC_COLUMNS,
+    ProjectsStaticStore,
+)
 from mapswipe_workers.utils import geojson_functions
 
+# Hash of all attributes of a project which are used for the static information.
+# The geometry is hashed as well, so that area and centroid are only calculated
+# if the geometry changed.
+PROJECT_SIGNATURE = """
+    md5(
+        ROW(
+            name
+            ,project_details
+            ,look_for
+            ,project_type
+            ,project_type_specifics->'tileServer'->'name'
+            ,project_type_specifics->'tileServerA'->'name'
+            ,project_type_specifics->'tileServerB'->'name'
+            ,status
+            ,md5(ST_AsBinary(geom))
+        )::text
+    )
+"""
+
 
 def get_overall_stats(projects_df: pd.DataFrame, filename: str) -> pd.DataFrame:
     """
@@ -39,23 +64,26 @@ def get_overall_stats(projects_df: pd.DataFrame, filename: str) -> pd.DataFrame:
     return overall_stats_df
 
 
-def get_project_static_info(filename: str) -> pd.DataFrame:
+def get_project_signatures() -> Dict[str, str]:
+    """Get the signature of the static information of all projects in Postgres."""
+    pg_db = auth.postgresDB()
+    sql_query = f"""
+        SELECT project_id, {PROJECT_SIGNATURE}
+        FROM projects
     """
-    The function queries the projects table.
-    Each row represents a single project and provides the information which is static.
-    By static we understand all attributes which are not affected by new results being
-    contributed.
-    The results are stored in a csv file and also returned as a pandas DataFrame.
+    return dict(pg_db.retr_query(sql_query))
 
-    Parameters
-    ----------
-    filename: str
-    """
 
+def query_project_static_info(project_ids: List[str]) -> pd.DataFrame:
+    """
+    Query the static information and its signature for the given projects.
+    All values are returned as strings as written by Postgres.
+    """
     pg_db = auth.postgresDB()
 
     # make sure to replace newline characters here
-    sql_query = """
+    sql_query = sql.SQL(
+        """
         COPY (
             SELECT
                 project_id
@@ -75,48 +103,100 @@ def get_project_static_info(filename: str) -> pd.DataFrame:
                 ,ST_Area(geom::geography)/1000000 as area_sqkm
                 ,ST_AsText(geom) as geom
                 ,ST_AsText(ST_Centroid(geom)) as centroid
+                ,{signature} as signature
             FROM projects
+            WHERE project_id = ANY({project_ids})
         ) TO STDOUT WITH CSV HEADER"""
+    ).format(
+        signature=sql.SQL(PROJECT_SIGNATURE),
+        project_ids=sql.Literal(project_ids),
+    )
 
-    with open(filename, "w") as f:
+    with tempfile.TemporaryFile("w+") as f:
         pg_db.copy_expert(sql_query, f)
+        f.seek(0)
+        df = pd.read_csv(f, dtype=str, keep_default_na=False)
 
     del pg_db
-    logger.info("got projects from postgres.")
-
-    df = pd.read_csv(filename)
-
     return df
 
 
-def load_project_info_dynamic(filename: str) -> pd.DataFrame:
+def get_project_static_info(filename: str) -> pd.DataFrame:
     """
-    The function loads data from a csv file into a pandas dataframe.
-    If not file exists, it will be initialized.
+    The function gets the static information of all projects.
+    Each row represents a single project and provides the information which is static.
+    By static we understand all attributes which are not affected by new results being
+    contributed.
+
+    The static information is kept in the projects static store.
+    Only projects which are new or for which the signature
+    (e.g. status, name or geometry) changed are queried from the projects table.
+    Projects which have been deleted are removed from the store.
+    The results are stored in a csv file and also returned as a pandas DataFrame.
 
     Parameters
     ----------
     filename: str
     """
 
-    if os.path.isfile(filename):
-        logger.info(f"file {filename} exists. Init from this file.")
-        df = pd.read_csv(filename, index_col="idx")
-    else:
-        columns = [
-            "project_id",
-            "progress",
-            "number_of_users",
-            "number_of_results",
-            "number_of_results_progress",
-            "day",
+    signatures = get_project_signatures()
+    with ProjectsStaticStore() as store:
+        stored_signatures = store.get_signatures()
+        changed_project_ids = [
+            project_id
+            for project_id, signature in signatures.items()
+            if stored_signatures.get(project_id) != signature
+        ]
+        deleted_project_ids = [
+            project_id
+            for project_id in stored_signatures
+            if project_id not in signatures
         ]
-        df = pd.DataFrame(index=[], columns=columns)
-        df["project_id"].astype("str")
+
+        if changed_project_ids:
+            store.update(query_project_static_info(changed_project_ids))
+        if deleted_project_ids:
+            store.delete(deleted_project_ids)
+        logger.info(
+            f"got projects from postgres. updated {len(changed_project_ids)} "
+            f"and deleted {len(deleted_project_ids)} projects."
+        )
+
+        df = store.to_dataframe()
+
+    df.to_csv(filename, index=False, columns=PROJECTS_STATIC_COLUMNS)
+    df = pd.read_csv(filename)
 
     return df
 
 
+def write_projects_geojson(filename: str) -> None:
+    """
+    Convert the projects csv file to GeoJSON using (a) the geometry
+    and (b) the centroid of the projects.
+    The GeoJSON geometries are taken from the projects static store
+    and are only converted from WKT for projects which are not in the store.
+    """
+    with ProjectsStaticStore() as store:
+        geojson_geometries = store.get_geojson_geometries()
+
+    df = pd.read_csv(filename, dtype=str, keep_default_na=False)
+    for geometry_field in ["geom", "centroid"]:
+        outfile = filename.replace(".csv", f"_{geometry_field}.geojson")
+        geometries = df["project_id"].map(geojson_geometries[geometry_field])
+        missing = geometries.isna()
+        geometries[missing] = df.loc[missing, geometry_field].map(
+            geojson_functions.wkt_to_geojson_geometry
+        )
+        geojson_functions.write_geojson(
+            df.assign(**{geometry_field: geometries}),
+            outfile,
+            geometry_field,
+            geometry_format="geojson",
+        )
+        logger.info(f"converted {filename} to {outfile}.")
+
+
 def save_projects(
     filename: str, df: pd.DataFrame, df_dynamic: pd.DataFrame
 ) -> pd.DataFrame:
@@ -139,7 +219,6 @@ def save_projects(
     )
     projects_df.to_csv(filename, index_label="idx", line_terminator="\n")
     logger.info(f"saved projects: {filename}")
-    geojson_functions.csv_to_geojson(filename, "geom")
-    geojson_functions.csv_to_geojson(filename, "centroid")
+    write_projects_geojson(filename)
 
     return projects_df
@@ -1,23 +1,72 @@
-import datetime
 import gzip
+import io
 import json
 import os
 import tempfile
-from typing import List
+from typing import List, Optional
 
+import numpy as np
 import pandas as pd
 from pandas.api.types import is_numeric_dtype
 from psycopg2 import sql
 
 from mapswipe_workers import auth
-from mapswipe_workers.definitions import DATA_PATH, ProjectType, logger, sentry
+from mapswipe_workers.definitions import DATA_PATH, ProjectType, logger
 from mapswipe_workers.generate_stats import (
+    agreement,
     project_stats_by_date,
+    results_cache,
+    stats_manifest,
     tasking_manager_geometries,
     user_stats,
 )
 from mapswipe_workers.utils import geojson_functions, tile_functions
 
+RESULTS_CSV_COLUMNS = [
+    "project_id",
+    "group_id",
+    "user_id",
+    "task_id",
+    "timestamp",
+    "start_time",
+    "end_time",
+    "result",
+    "username",
+]
+
+# compact dtypes for the columns of tasks and groups
+# ids which are repeated in many rows are stored as categories
+TASKS_DTYPES = {
+    "project_id": "category",
+    "group_id": "category",
+    "task_id": str,
+}
+GROUPS_DTYPES = {
+    "project_id": "category",
+    "group_id": str,
+    "number_of_tasks": np.int32,
+    "number_of_users_required": np.int32,
+}
+
+# columns of groups used for the project history
+GROUPS_STATS_COLUMNS = [
+    "project_id",
+    "group_id",
+    "number_of_tasks",
+    "number_of_users_required",
+]
+
+# columns of tasks added to the aggregated results
+# project_id and group_id are not part of the aggregated results
+TASKS_AGG_RESULTS_COLUMNS = [
+    "task_id",
+    "tile_z",
+    "tile_x",
+    "tile_y",
+    "geom",
+    "project_type_specifics",
+]
+
 
 def add_metadata_to_csv(filename: str):
     """
@@ -59,59 +108,59 @@ def write_sql_to_gzipped_csv(filename: str, sql_query: sql.SQL):
     Use the copy statement to write data from postgres to a csv file.
     """
 
-    # generate temporary file which will be automatically deleted at the end
-    tmp_csv_file = os.path.join(tempfile._get_default_tempdir(), "tmp.csv")
-    pg_db = auth.postgresDB()
-    with open(tmp_csv_file, "w") as f:
-        pg_db.copy_expert(sql_query, f)
+    # generate temporary file which will be deleted at the end
+    # the name is unique as stats for several projects can be generated in parallel
+    file_descriptor, tmp_csv_file = tempfile.mkstemp(suffix=".csv")
+    os.close(file_descriptor)
+    try:
+        pg_db = auth.postgresDB()
+        with open(tmp_csv_file, "w") as f:
+            pg_db.copy_expert(sql_query, f)
 
-    normalize_project_type_specifics(tmp_csv_file)
+        normalize_project_type_specifics(tmp_csv_file)
 
-    with open(tmp_csv_file, "rb") as f_in, gzip.open(filename, "wb") as f_out:
-        f_out.writelines(f_in)
+        with open(tmp_csv_file, "rb") as f_in, gzip.open(filename, "wb") as f_out:
+            f_out.writelines(f_in)
+    finally:
+        os.remove(tmp_csv_file)
 
     logger.info(f"wrote gzipped csv file from sql: {filename}")
 
 
-def load_df_from_csv(filename: str) -> pd.DataFrame:
+def load_df_from_csv(
+    filename: str,
+    columns: Optional[List[str]] = None,
+    dtype: Optional[dict] = None,
+) -> pd.DataFrame:
     """
     Load a csv file into a pandas dataframe.
-    Make sure that project_id, group_id and task_id are read as strings.
+    Make sure that project_id, group_id and task_id are read as strings
+    if no other dtype is defined for them.
+    Only the given columns are loaded if columns are defined.
     """
     dtype_dict = {"project_id": str, "group_id": str, "task_id": str}
+    if dtype is not None:
+        dtype_dict.update(dtype)
 
-    df = pd.read_csv(filename, dtype=dtype_dict, compression="gzip")
+    df = pd.read_csv(filename, usecols=columns, dtype=dtype_dict, compression="gzip")
     logger.info(f"loaded pandas df from {filename}")
     return df
 
 
-def get_results(filename: str, project_id: str) -> pd.DataFrame:
+def get_usernames(project_id: str) -> pd.DataFrame:
     """
-    Query results from postgres database for project id.
-    Save results to a csv file.
-    Load pandas dataframe from this csv file.
-    Parse timestamp as datetime object and add attribute "day" for each result.
-    Return None if there are no results for this project.
-    Otherwise return dataframe.
+    Query the usernames of all users who contributed to the project.
 
     Parameters
     ----------
-    filename: str
     project_id: str
     """
 
     sql_query = sql.SQL(
         """
         COPY (
-            SELECT
-                ms.project_id,
-                ms.group_id,
+            SELECT DISTINCT
                 ms.user_id,
-                msr.task_id,
-                ms.start_time as timestamp,
-                ms.start_time,
-                ms.end_time,
-                msr.result,
                 -- the username for users which login to MapSwipe with their
                 -- OSM account is not defined or ''.
                 -- We capture this here as it will cause problems
@@ -120,42 +169,91 @@ def get_results(filename: str, project_id: str) -> pd.DataFrame:
                     WHEN U.username IS NULL or U.username = '' THEN 'unknown'
                     ELSE U.username
                 END as username
-            FROM mapping_sessions_results msr
-            LEFT JOIN mapping_sessions ms ON
-                ms.mapping_session_id = msr.mapping_session_id
+            FROM mapping_sessions ms
             LEFT JOIN users U USING (user_id)
-            WHERE project_id = {}
+            WHERE ms.project_id = {}
         ) TO STDOUT WITH CSV HEADER
         """
     ).format(sql.Literal(project_id))
-    write_sql_to_gzipped_csv(filename, sql_query)
 
-    df = load_df_from_csv(filename)
+    pg_db = auth.postgresDB()
+    with io.StringIO() as f:
+        pg_db.copy_expert(sql_query, f)
+        f.seek(0)
+        df = pd.read_csv(f, dtype={"user_id": str, "username": str})
+    return df
+
+
+def get_results(
+    filename: str,
+    project_id: str,
+    has_new_results: Optional[bool] = None,
+    manifest: Optional[stats_manifest.StatsManifest] = None,
+) -> pd.DataFrame:
+    """
+    Add new results from postgres database for project id to the results cache.
+    Load pandas dataframe from the results cache.
+    Save results to a csv file if there are new results.
+    Parse timestamp as datetime object and add attribute "day" for each result.
+    Return None if there are no results for this project.
+    Otherwise return dataframe.
+
+    Parameters
+    ----------
+    filename: str
+    project_id: str
+    has_new_results: bool
+        If the results cache has been updated already, whether there are new results.
+    manifest: StatsManifest
+        The manifest used to write the csv file.
+    """
+
+    if has_new_results is None:
+        has_new_results = results_cache.update(project_id)
+    df = results_cache.load_results(project_id)
 
     if df.empty:
         logger.info(f"there are no results for this project {project_id}")
         return None
-    else:
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-        df["day"] = df["timestamp"].apply(
-            lambda x: datetime.datetime(year=x.year, month=x.month, day=x.day)
+
+    # the usernames are mapped on the categories of user_id
+    # a merge would convert user_id back into strings
+    usernames = get_usernames(project_id).set_index("user_id")["username"]
+    df["username"] = df["user_id"].map(usernames).fillna("unknown").astype("category")
+    df["timestamp"] = df["start_time"]
+    df = df.reindex(columns=["mapping_session_id"] + RESULTS_CSV_COLUMNS)
+
+    if has_new_results or not os.path.isfile(filename):
+        stats_manifest.write_output(
+            filename,
+            lambda path: df.to_csv(
+                path, columns=RESULTS_CSV_COLUMNS, compression="gzip"
+            ),
+            manifest,
         )
-        logger.info(f"added day attribute for results for {project_id}")
-        return df
+        logger.info(f"wrote gzipped csv file from results cache: {filename}")
 
+    df["day"] = df["timestamp"].dt.floor("D")
+    logger.info(f"added day attribute for results for {project_id}")
+    return df
 
-def get_tasks(filename: str, project_id: str) -> pd.DataFrame:
+
+def get_tasks(
+    filename: str, project_id: str, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
     """
     Check if tasks have been downloaded already.
     If not: Query tasks from postgres database for project id and
     save tasks to a csv file.
-    Then load pandas dataframe from this csv file.
+    Then load pandas dataframe from this csv file with compact dtypes.
     Return dataframe.
 
     Parameters
     ----------
     filename: str
     project_id: str
+    columns: list
+        The columns to load. Default: all columns
     """
 
     if os.path.isfile(filename):
@@ -184,14 +282,14 @@ def get_tasks(filename: str, project_id: str) -> pd.DataFrame:
                     end as tile_y
                     ,ST_AsText(geom) as geom
                     ,project_type_specifics
-                FROM tasks
+                FROM tasks_expanded
                 WHERE project_id = {}
             ) TO STDOUT WITH CSV HEADER
             """
         ).format(sql.Literal(project_id))
         write_sql_to_gzipped_csv(filename, sql_query)
 
-    df = load_df_from_csv(filename)
+    df = load_df_from_csv(filename, columns, TASKS_DTYPES)
 
     # Tasks for the "footprint" project type can contain a "username" attribute.
     # We rename this attribute into "osm_username" to be able to distinguish it
@@ -203,18 +301,22 @@ def get_tasks(filename: str, project_id: str) -> pd.DataFrame:
     return df
 
 
-def get_groups(filename: str, project_id: str) -> pd.DataFrame:
+def get_groups(
+    filename: str, project_id: str, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
     """
     Check if groups have been downloaded already.
     If not: Query groups from postgres database for project id and
     save groups to a csv file.
-    Then load pandas dataframe from this csv file.
+    Then load pandas dataframe from this csv file with compact dtypes.
     Return dataframe.
 
     Parameters
     ----------
     filename: str
     project_id: str
+    columns: list
+        The columns to load. Default: all columns
     """
 
     if os.path.isfile(filename):
@@ -234,94 +336,113 @@ def get_groups(filename: str, project_id: str) -> pd.DataFrame:
         ).format(sql.Literal(project_id))
         write_sql_to_gzipped_csv(filename, sql_query)
 
-    df = load_df_from_csv(filename)
+    df = load_df_from_csv(filename, columns, GROUPS_DTYPES)
     return df
 
 
-def calc_agreement(total: int, no: int, yes: int, maybe: int, bad: int) -> float:
-    """
-    for each task the "agreement" is computed as defined by Scott's Pi
-    Scott's Pi is a measure for inter-rater reliability
-    https://en.wikipedia.org/wiki/Scott%27s_Pi
+def get_task_result_counts(project_id: str) -> pd.DataFrame:
     """
+    Query the number of results per task and result category from postgres.
+    The counts are updated during the transfer of results.
+    Return dataframe with project_id, group_id and task_id as index
+    and a column with the count for each result category.
 
-    # TODO: currently this is implemented only for the 4 given categories
+    Parameters
+    ----------
+    project_id: str
+    """
 
-    if total == 1:
-        agreement = 1.0
-    else:
-        agreement = (
-            1.0
-            / (total * (total - 1))
-            * (
-                (no * (no - 1))
-                + (yes * (yes - 1))
-                + (maybe * (maybe - 1))
-                + (bad * (bad - 1))
-            )
-        )
+    sql_query = sql.SQL(
+        """
+        COPY (
+            SELECT
+                project_id,
+                group_id,
+                task_id,
+                result,
+                count
+            FROM task_result_counts
+            WHERE project_id = {}
+        ) TO STDOUT WITH CSV HEADER
+        """
+    ).format(sql.Literal(project_id))
 
-    return agreement
+    pg_db = auth.postgresDB()
+    with io.StringIO() as f:
+        pg_db.copy_expert(sql_query, f)
+        f.seek(0)
+        df = pd.read_csv(f, dtype={"project_id": str, "group_id": str, "task_id": str})
+    logger.info(f"loaded task result counts for {project_id}")
 
+    return (
+        df.set_index(["project_id", "group_id", "task_id", "result"])["count"]
+        .unstack(fill_value=0)
+        .sort_index()
+    )
 
-def calc_share(total: int, no: int, yes: int, maybe: int, bad: int) -> List[float]:
-    """Calculate the share of each category on the total count."""
-    no_share = no / total
-    yes_share = yes / total
-    maybe_share = maybe / total
-    bad_share = bad / total
 
-    return [no_share, yes_share, maybe_share, bad_share]
+def count_results_by_task_id(results_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count the results per task and result category.
+    Return dataframe with project_id, group_id and task_id as index
+    and a column with the count for each result category.
+    """
+    return (
+        results_df.groupby(
+            ["project_id", "group_id", "task_id", "result"], observed=True
+        )
+        .size()
+        .unstack(fill_value=0)
+        .sort_index()
+    )
 
 
-def calc_count(row) -> List[int]:
+def calc_count(
+    results_by_task_id_df: pd.DataFrame, categories: List[int]
+) -> pd.DataFrame:
     """
-    Check if a count exists for each category ("no", "yes", "maybe", "bad").
+    Check if a count exists for each category (e.g. "no", "yes", "maybe", "bad").
     Then calculate total count as the sum of all categories.
     """
 
-    try:
-        no_count = row[0]
-    except KeyError:
-        no_count = 0
-
-    try:
-        yes_count = row[1]
-    except KeyError:
-        yes_count = 0
-
-    try:
-        maybe_count = row[2]
-    except KeyError:
-        maybe_count = 0
-
-    try:
-        bad_count = row[3]
-    except KeyError:
-        bad_count = 0
+    total_count = agreement.calc_total(
+        results_by_task_id_df.reindex(columns=categories, fill_value=0).to_numpy()
+    )
+    assert (total_count > 0).all(), "Total count for result must be bigger than zero."
 
-    total_count = no_count + yes_count + maybe_count + bad_count
-    assert total_count > 0, "Total count for result must be bigger than zero."
+    results_by_task_id_df["total_count"] = total_count
+    for category in categories:
+        if category not in results_by_task_id_df.columns:
+            results_by_task_id_df[category] = 0
 
-    return [total_count, no_count, yes_count, maybe_count, bad_count]
+    return results_by_task_id_df
 
 
-def calc_quadkey(row):
+def calc_quadkey(task_ids: pd.Series) -> np.ndarray:
     """Calculate quadkey based on task id."""
-    try:
-        tile_z, tile_x, tile_y = row["task_id"].split("-")
-        quadkey = tile_functions.tile_coords_and_zoom_to_quadKey(
-            int(tile_x), int(tile_y), int(tile_z)
+    quadkeys = np.full(len(task_ids), None, dtype=object)
+
+    # quadkey is None if task_id is not composed of x,y ,z
+    tile_coords = (
+        task_ids.reset_index(drop=True)
+        .str.extract(r"^(\d+)-(\d+)-(\d+)$")
+        .dropna()
+        .astype(int)
+    )
+    for zoom, coords in tile_coords.groupby(0):
+        quadkeys[
+            coords.index.to_numpy()
+        ] = tile_functions.tile_coords_and_zoom_to_quadKeys(
+            coords[1].to_numpy(), coords[2].to_numpy(), zoom
         )
-    except ValueError:
-        # return None if task_id is not composed of x,y ,z
-        quadkey = None
 
-    return quadkey
+    return quadkeys
 
 
 def get_agg_results_by_task_id(
-    results_df: pd.DataFrame, tasks_df: pd.DataFrame
+    results_df: pd.DataFrame,
+    tasks_df: pd.DataFrame,
+    categories: Optional[List[int]] = None,
 ) -> pd.DataFrame:
     """
     For each task several users contribute results.
@@ -330,52 +451,71 @@ def get_agg_results_by_task_id(
     Calculate the following attributes to agg_results dataframe:
     total_count, 0_count, 1_count, 2_count, 3_count
     0_share, 1_share, 2_share, 3_share.
-    Calculate "agreement" for each task based on Scott's Pi.
+    Calculate "agreement" for each task based on Scott's Pi
+    and "kappa" as agreement corrected by the agreement expected by chance.
     Perform a left join for agg_results df with
     tasks dataframe to add the task geometry.
     Return aggregated results dataframe.
 
+    All attributes are computed column-wise for all tasks at once.
+
     Parameters
     ----------
     results_df: pd.DataFrame
     tasks_df: pd.DataFrame
+    categories: list
+        The answer categories of the project type.
+        Default: 0 (no), 1 (yes), 2 (maybe), 3 (bad imagery)
     """
 
-    results_by_task_id_df = (
-        results_df.groupby(["project_id", "group_id", "task_id", "result"])
-        .size()
-        .unstack(fill_value=0)
+    return get_agg_results_from_counts(
+        count_results_by_task_id(results_df), tasks_df, categories
     )
 
+
+def get_agg_results_from_counts(
+    results_by_task_id_df: pd.DataFrame,
+    tasks_df: pd.DataFrame,
+    categories: Optional[List[int]] = None,
+) -> pd.DataFrame:
+    """
+    Get agg_results dataframe from the number of results per task and category.
+    The counts are given as returned by get_task_result_counts
+    or count_results_by_task_id.
+    See get_agg_results_by_task_id for the calculated attributes.
+
+    Parameters
+    ----------
+    results_by_task_id_df: pd.DataFrame
+    tasks_df: pd.DataFrame
+    categories: list
+        The answer categories of the project type.
+        Default: 0 (no), 1 (yes), 2 (maybe), 3 (bad imagery)
+    """
+
+    if categories is None:
+        categories = ProjectType.BUILD_AREA.result_categories
+
     # calculate total count and check if other counts are defined
-    results_by_task_id_df[["total_count", 0, 1, 2, 3]] = results_by_task_id_df.apply(
-        lambda row: calc_count(row), axis=1, result_type="expand"
-    )
+    results_by_task_id_df = calc_count(results_by_task_id_df, categories)
+    counts = results_by_task_id_df[categories].to_numpy()
 
     # calculate share based on counts
     results_by_task_id_df[
-        ["0_share", "1_share", "2_share", "3_share"]
-    ] = results_by_task_id_df.apply(
-        lambda row: calc_share(row["total_count"], row[0], row[1], row[2], row[3]),
-        axis=1,
-        result_type="expand",
-    )
+        [f"{category}_share" for category in categories]
+    ] = agreement.calc_shares(counts)
 
     # calculate agreement
-    results_by_task_id_df["agreement"] = results_by_task_id_df.apply(
-        lambda row: calc_agreement(row["total_count"], row[0], row[1], row[2], row[3]),
-        axis=1,
-    )
+    results_by_task_id_df["agreement"] = agreement.calc_task_agreement(counts)
+    results_by_task_id_df["kappa"] = agreement.calc_task_kappa(counts)
     logger.info("calculated agreement")
 
     # add quadkey
     results_by_task_id_df.reset_index(level=["task_id"], inplace=True)
-    results_by_task_id_df["quadkey"] = results_by_task_id_df.apply(
-        lambda row: calc_quadkey(row), axis=1
-    )
+    results_by_task_id_df["quadkey"] = calc_quadkey(results_by_task_id_df["task_id"])
 
     # add task geometry using left join
-    tasks_df.drop(columns=["project_id", "group_id"], inplace=True)
+    tasks_df.drop(columns=["project_id", "group_id"], inplace=True, errors="ignore")
     agg_results_df = results_by_task_id_df.merge(
         tasks_df,
         left_on="task_id",
@@ -385,7 +525,8 @@ def get_agg_results_by_task_id(
 
     # rename columns, ogr2ogr will fail otherwise
     agg_results_df.rename(
-        columns={0: "0_count", 1: "1_count", 2: "2_count", 3: "3_count"}, inplace=True
+        columns={category: f"{category}_count" for category in categories},
+        inplace=True,
     )
 
     return agg_results_df
@@ -401,7 +542,12 @@ def get_per_project_statistics(project_id: str, project_info: pd.Series) -> dict
     - Save project history to csv file.
     - return the most recent statistics as a dictionary
     The returned dictionary will be used by generate_stats.py
-    to update the projects_dynamic.csv
+    to update the projects dynamic store
+
+    The inputs, statistics and output files are recorded in the stats manifest.
+    If the results did not change since the last run, the statistics of the
+    manifest are returned without generating any files.
+    Output files are only replaced if their content changed.
     """
 
     # set filenames
@@ -414,54 +560,97 @@ def get_per_project_statistics(project_id: str, project_info: pd.Series) -> dict
     agg_results_by_user_id_filename = f"{DATA_PATH}/api/users/users_{project_id}.csv.gz"
     project_stats_by_date_filename = f"{DATA_PATH}/api/history/history_{project_id}.csv"
 
+    if any("maxar" in s for s in project_info["tile_server_names"]):
+        add_metadata = True
+    else:
+        add_metadata = False
+
+    # skip projects without changes since the last run
+    has_new_results = results_cache.update(project_id)
+    inputs = {
+        "version": stats_manifest.MANIFEST_VERSION,
+        "results_watermark": results_cache.get_watermark(project_id),
+        "number_of_results": results_cache.count_rows(project_id),
+        "project_type": int(project_info.iloc[0]["project_type"]),
+        "add_metadata": add_metadata,
+    }
+    manifest = stats_manifest.StatsManifest(project_id)
+    if inputs["number_of_results"] > 0 and manifest.is_up_to_date(inputs):
+        logger.info(f"no changes: skipping per project stats for {project_id}")
+        return manifest.project_stats
+
     # load data from postgres or local storage if already downloaded
-    results_df = get_results(results_filename, project_id)
+    results_df = get_results(results_filename, project_id, has_new_results, manifest)
 
     if results_df is None:
         logger.info(f"no results: skipping per project stats for {project_id}")
         return {}
     else:
-        groups_df = get_groups(groups_filename, project_id)
-        tasks_df = get_tasks(tasks_filename, project_id)
+        groups_df = get_groups(groups_filename, project_id, GROUPS_STATS_COLUMNS)
+        tasks_df = get_tasks(tasks_filename, project_id, TASKS_AGG_RESULTS_COLUMNS)
 
-        if any("maxar" in s for s in project_info["tile_server_names"]):
-            add_metadata = True
-        else:
-            add_metadata = False
+        # answer categories depend on the project type
+        categories = ProjectType(
+            int(project_info.iloc[0]["project_type"])
+        ).result_categories
 
         # aggregate results by task id
-        agg_results_df = get_agg_results_by_task_id(results_df, tasks_df)
-        agg_results_df.to_csv(agg_results_filename, index_label="idx")
-
-        geojson_functions.gzipped_csv_to_gzipped_geojson(
-            filename=agg_results_filename,
-            geometry_field="geom",
-            add_metadata=add_metadata,
+        # using the counts which are updated during the transfer of results
+        results_by_task_id_df = get_task_result_counts(project_id)
+        if results_by_task_id_df.to_numpy().sum() != inputs["number_of_results"]:
+            logger.warning(
+                f"task result counts do not match results for {project_id}. "
+                f"count results by task id."
+            )
+            results_by_task_id_df = count_results_by_task_id(results_df)
+        agg_results_df = get_agg_results_from_counts(
+            results_by_task_id_df, tasks_df, categories
+        )
+        project_agreement = agreement.calc_project_agreement(
+            agg_results_df[[f"{category}_count" for category in categories]].to_numpy()
+        )
+        stats_manifest.write_output(
+            agg_results_filename,
+            lambda path: agg_results_df.to_csv(path, index_label="idx"),
+            manifest,
+        )
+        stats_manifest.write_output(
+            agg_results_filename.replace(".csv", "_geom.geojson"),
+            lambda path: geojson_functions.write_geojson(
+                agg_results_df,
+                path,
+                geometry_field="geom",
+                add_metadata=add_metadata,
+                index_label="idx",
+            ),
+            manifest,
         )
         logger.info(f"saved agg results for {project_id}: {agg_results_filename}")
 
         # aggregate results by user id
-        # TODO: solve memory issue for agg results by user id
-        try:
-            agg_results_by_user_id_df = user_stats.get_agg_results_by_user_id(
-                results_df, agg_results_df
-            )
-            agg_results_by_user_id_df.to_csv(
-                agg_results_by_user_id_filename, index_label="idx"
-            )
-            logger.info(
-                f"saved agg results for {project_id}: {agg_results_by_user_id_filename}"
-            )
-        except MemoryError:
-            sentry.capture_exception()
-            logger.info(f"failed to agg results by user id for {project_id}")
+        agg_results_by_user_id_df = user_stats.get_agg_results_by_user_id(
+            results_df, agg_results_df, categories
+        )
+        stats_manifest.write_output(
+            agg_results_by_user_id_filename,
+            lambda path: agg_results_by_user_id_df.to_csv(path, index_label="idx"),
+            manifest,
+        )
+        logger.info(
+            f"saved agg results for {project_id}: {agg_results_by_user_id_filename}"
+        )
 
         # calculate progress and contributors over time for project
-        project_stats_by_date_df = project_stats_by_date.get_project_history(
-            results_df, groups_df
+        # only the days since the last run are calculated if possible
+        project_stats_by_date_df = project_stats_by_date.update_project_history(
+            results_df,
+            groups_df,
+            project_stats_by_date.load_project_history(project_stats_by_date_filename),
         )
         project_stats_by_date_df["project_id"] = project_id
-        project_stats_by_date_df.to_csv(project_stats_by_date_filename)
+        stats_manifest.write_output(
+            project_stats_by_date_filename, project_stats_by_date_df.to_csv, manifest
+        )
         logger.info(
             f"saved project stats by date for {project_id}: "
             f"{project_stats_by_date_filename}"
@@ -473,7 +662,9 @@ def get_per_project_statistics(project_id: str, project_info: pd.Series) -> dict
             logger.info(f"do NOT generate tasking manager geometries for {project_id}")
         else:
             tasking_manager_geometries.generate_tasking_manager_geometries(
-                project_id=project_id, agg_results_filename=agg_results_filename
+                project_id=project_id,
+                agg_results_filename=agg_results_filename,
+                manifest=manifest,
             )
 
         # prepare output of function
@@ -488,6 +679,9 @@ def get_per_project_statistics(project_id: str, project_info: pd.Series) -> dict
                 "cum_number_of_results_progress"
             ].iloc[-1],
             "day": project_stats_by_date_df.index[-1],
+            "scotts_pi": project_agreement["scotts_pi"],
+            "fleiss_kappa": project_agreement["fleiss_kappa"],
         }
+        manifest.save(inputs, project_stats_dict)
 
         return project_stats_dict
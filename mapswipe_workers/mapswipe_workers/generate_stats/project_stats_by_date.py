@@ -1,56 +1,64 @@
-import datetime
+import os
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 
 from mapswipe_workers.definitions import logger
 
 
 def calc_results_progress(
-    number_of_users: int,
-    number_of_users_required: int,
-    cum_number_of_users: int,
-    number_of_tasks: int,
-    number_of_results: int,
-) -> int:
+    number_of_users: np.ndarray,
+    number_of_users_required: np.ndarray,
+    cum_number_of_users: np.ndarray,
+    number_of_tasks: np.ndarray,
+    number_of_results: np.ndarray,
+) -> np.ndarray:
     """
     for each project the progress is calculated
     not all results are considered when calculating the progress
     if the required number of users has been reached for a task
     all further results will not contribute to increase the progress
+
+    The arguments are arrays (or series) with one value per group and day.
     """
 
-    if cum_number_of_users <= number_of_users_required:
-        # this is the simplest case, the number of users is less than the required
-        # number of users all results contribute to progress
-        number_of_results_progress = number_of_results
-    elif (cum_number_of_users - number_of_users) < number_of_users_required:
-        # the number of users is bigger than the number of users required
-        # but the previous number of users was below the required number
-        # some results contribute to progress
-        number_of_results_progress = (
-            number_of_users_required - (cum_number_of_users - number_of_users)
-        ) * number_of_tasks
-    else:
+    previous_number_of_users = cum_number_of_users - number_of_users
+    return np.select(
+        [
+            # this is the simplest case, the number of users is less than the
+            # required number of users all results contribute to progress
+            cum_number_of_users <= number_of_users_required,
+            # the number of users is bigger than the number of users required
+            # but the previous number of users was below the required number
+            # some results contribute to progress
+            previous_number_of_users < number_of_users_required,
+        ],
+        [
+            number_of_results,
+            (number_of_users_required - previous_number_of_users) * number_of_tasks,
+        ],
         # for all other cases: already more users than required
         # all results do not contribute to progress
-        number_of_results_progress = 0
-
-    return number_of_results_progress
+        default=0,
+    )
 
 
-def is_new_user(day: datetime.datetime, first_day: datetime.datetime):
+def is_new_user(day: pd.Series, first_day: pd.Series) -> np.ndarray:
     """
-    Check if user has contributed results to this project before
+    Check if user has contributed results to this project before.
+    Returns 1 for the first day of a user and 0 otherwise.
     """
 
-    if day == first_day:
-        return 1
-    else:
-        return 0
+    return (np.asarray(day) == np.asarray(first_day)).astype(np.int64)
 
 
 def get_progress_by_date(
-    results_df: pd.DataFrame, groups_df: pd.DataFrame
+    results_df: pd.DataFrame,
+    groups_df: pd.DataFrame,
+    previous_users_by_group: Optional[pd.Series] = None,
+    previous_cum_number_of_results: int = 0,
+    previous_cum_number_of_results_progress: int = 0,
 ) -> pd.DataFrame:
     """
     for each project we retrospectively generate the following attributes for a given
@@ -71,62 +79,69 @@ def get_progress_by_date(
     cum_progress:
         - absolute progress up to that day
         - refers to the project progress attribute in firebase
+
+    The previous arguments are used if only the results of the most recent days
+    are given. previous_users_by_group is the sum of the number of users per
+    group and day before these days.
     """
 
-    groups_df["required_results"] = (
+    required_results = (
         groups_df["number_of_tasks"] * groups_df["number_of_users_required"]
-    )
-    required_results = groups_df["required_results"].sum()
+    ).sum()
     logger.info(f"calcuated required results: {required_results}")
 
-    results_with_groups_df = results_df.merge(
-        groups_df, left_on="group_id", right_on="group_id"
-    )
-    results_by_group_id_df = results_with_groups_df.groupby(
-        ["project_id_x", "group_id", "day"]
-    ).agg(
-        number_of_tasks=pd.NamedAgg(column="number_of_tasks", aggfunc="min"),
-        number_of_users_required=pd.NamedAgg(
-            column="number_of_users_required", aggfunc="min"
-        ),
-        number_of_users=pd.NamedAgg(column="user_id", aggfunc=pd.Series.nunique),
+    group_attributes_df = groups_df.groupby("group_id", observed=True)[
+        ["number_of_tasks", "number_of_users_required"]
+    ].min()
+
+    results_by_group_id_df = (
+        results_df[results_df["group_id"].isin(group_attributes_df.index)]
+        .groupby(["project_id", "group_id", "day"], observed=True)
+        .agg(number_of_users=pd.NamedAgg(column="user_id", aggfunc="nunique"))
+        .sort_index()
     )
+    group_ids = results_by_group_id_df.index.get_level_values("group_id")
+    for column in ["number_of_tasks", "number_of_users_required"]:
+        results_by_group_id_df[column] = (
+            group_attributes_df[column].reindex(group_ids).to_numpy()
+        )
     results_by_group_id_df["number_of_results"] = (
         results_by_group_id_df["number_of_users"]
         * results_by_group_id_df["number_of_tasks"]
     )
     results_by_group_id_df["cum_number_of_users"] = (
         results_by_group_id_df["number_of_users"]
-        .groupby(["project_id_x", "group_id"])
+        .groupby(level=["project_id", "group_id"], observed=True)
         .cumsum()
     )
-    results_by_group_id_df["number_of_results_progress"] = results_by_group_id_df.apply(
-        lambda row: calc_results_progress(
-            row["number_of_users"],
-            row["number_of_users_required"],
-            row["cum_number_of_users"],
-            row["number_of_tasks"],
-            row["number_of_results"],
-        ),
-        axis=1,
+    if previous_users_by_group is not None:
+        results_by_group_id_df["cum_number_of_users"] += (
+            previous_users_by_group.reindex(group_ids, fill_value=0)
+            .to_numpy()
+            .astype(np.int64)
+        )
+    results_by_group_id_df["number_of_results_progress"] = calc_results_progress(
+        results_by_group_id_df["number_of_users"],
+        results_by_group_id_df["number_of_users_required"],
+        results_by_group_id_df["cum_number_of_users"],
+        results_by_group_id_df["number_of_tasks"],
+        results_by_group_id_df["number_of_results"],
     )
 
-    progress_by_date_df = (
-        results_by_group_id_df.reset_index()
-        .groupby(["day"])
-        .agg(
-            number_of_results=pd.NamedAgg(column="number_of_results", aggfunc="sum"),
-            number_of_results_progress=pd.NamedAgg(
-                column="number_of_results_progress", aggfunc="sum"
-            ),
-        )
+    progress_by_date_df = results_by_group_id_df.groupby(level="day").agg(
+        number_of_results=pd.NamedAgg(column="number_of_results", aggfunc="sum"),
+        number_of_results_progress=pd.NamedAgg(
+            column="number_of_results_progress", aggfunc="sum"
+        ),
+    )
+    progress_by_date_df["cum_number_of_results"] = (
+        progress_by_date_df["number_of_results"].cumsum()
+        + previous_cum_number_of_results
+    )
+    progress_by_date_df["cum_number_of_results_progress"] = (
+        progress_by_date_df["number_of_results_progress"].cumsum()
+        + previous_cum_number_of_results_progress
     )
-    progress_by_date_df["cum_number_of_results"] = progress_by_date_df[
-        "number_of_results"
-    ].cumsum()
-    progress_by_date_df["cum_number_of_results_progress"] = progress_by_date_df[
-        "number_of_results_progress"
-    ].cumsum()
     progress_by_date_df["progress"] = (
         progress_by_date_df["number_of_results_progress"] / required_results
     )
@@ -138,7 +153,11 @@ def get_progress_by_date(
     return progress_by_date_df
 
 
-def get_contributors_by_date(results_df: pd.DataFrame) -> pd.DataFrame:
+def get_contributors_by_date(
+    results_df: pd.DataFrame,
+    first_day_by_user: Optional[pd.Series] = None,
+    previous_cum_number_of_users: int = 0,
+) -> pd.DataFrame:
     """
     for each project we retrospectively generate the following attributes for a given
     date utilizing the results:
@@ -154,34 +173,37 @@ def get_contributors_by_date(results_df: pd.DataFrame) -> pd.DataFrame:
     cum_number_of_users:
         - overall number of distinct users active up to that day
         - refers to the project contributorCount attribute in firebase
+
+    The first day per user and the previous number of users are used
+    if only the results of the most recent days are given.
     """
 
-    user_first_day_df = results_df.groupby(["user_id"]).agg(
-        first_day=pd.NamedAgg(column="day", aggfunc="min")
-    )
+    if first_day_by_user is None:
+        first_day_by_user = results_df.groupby("user_id", observed=True)["day"].min()
     logger.info("calculated first day per user")
 
-    results_by_user_id_df = results_df.groupby(["project_id", "user_id", "day"]).agg(
-        number_of_results=pd.NamedAgg(column="user_id", aggfunc="count")
-    )
-    results_by_user_id_df = results_by_user_id_df.reset_index().merge(
-        user_first_day_df, left_on="user_id", right_on="user_id"
+    results_by_user_id_df = (
+        results_df.groupby(["project_id", "user_id", "day"], observed=True)
+        .size()
+        .reset_index(name="number_of_results")
     )
-    results_by_user_id_df["new_user"] = results_by_user_id_df.apply(
-        lambda row: is_new_user(row["day"], row["first_day"]), axis=1
+    results_by_user_id_df["new_user"] = is_new_user(
+        results_by_user_id_df["day"],
+        first_day_by_user.reindex(results_by_user_id_df["user_id"]),
     )
 
-    contributors_by_date_df = (
-        results_by_user_id_df.reset_index()
-        .groupby(["project_id", "day"])
-        .agg(
-            number_of_users=pd.NamedAgg(column="user_id", aggfunc=pd.Series.nunique),
-            number_of_new_users=pd.NamedAgg(column="new_user", aggfunc="sum"),
-        )
+    contributors_by_date_df = results_by_user_id_df.groupby(
+        ["project_id", "day"], observed=True
+    ).agg(
+        number_of_users=pd.NamedAgg(column="user_id", aggfunc="nunique"),
+        number_of_new_users=pd.NamedAgg(column="new_user", aggfunc="sum"),
+    )
+    # groups of categorical ids are not sorted if only observed ids are used
+    contributors_by_date_df.sort_index(inplace=True)
+    contributors_by_date_df["cum_number_of_users"] = (
+        contributors_by_date_df["number_of_new_users"].cumsum()
+        + previous_cum_number_of_users
     )
-    contributors_by_date_df["cum_number_of_users"] = contributors_by_date_df[
-        "number_of_new_users"
-    ].cumsum()
 
     logger.info("calculated contributors by date")
     return contributors_by_date_df
@@ -214,3 +236,108 @@ def get_project_history(
     )
 
     return project_history_df
+
+
+def load_project_history(filename: str) -> Optional[pd.DataFrame]:
+    """
+    Load the project history from a csv file written before.
+    Return None if the file does not exist.
+    """
+
+    if not os.path.isfile(filename):
+        return None
+    return pd.read_csv(
+        filename, index_col="day", parse_dates=["day"], float_precision="round_trip"
+    ).drop(columns=["project_id"], errors="ignore")
+
+
+def update_project_history(
+    results_df: pd.DataFrame,
+    groups_df: pd.DataFrame,
+    project_history_df: Optional[pd.DataFrame],
+) -> pd.DataFrame:
+    """
+    Calculate the project history only for the last day of an existing
+    project history and the days after.
+    The history of the days before is kept and the new days are appended.
+    The result is the same as for get_project_history.
+
+    The whole history is calculated again if there is no existing history
+    or if the results of the days before do not match the existing history,
+    e.g. if results of past days have been added later.
+
+    Parameters
+    ----------
+    results_df
+    groups_df
+    project_history_df: the existing project history
+    """
+
+    if project_history_df is None or project_history_df.empty:
+        return get_project_history(results_df, groups_df)
+
+    # the last day might have been incomplete when the history has been calculated
+    last_day = project_history_df.index[-1]
+    previous_history_df = project_history_df[project_history_df.index < last_day]
+    is_previous = (results_df["day"] < last_day).to_numpy()
+    previous_results_df = results_df[is_previous]
+    new_results_df = results_df[~is_previous]
+
+    # the state of each group and the totals before the last day
+    previous_users_by_group = (
+        previous_results_df.groupby(["group_id", "day"], observed=True)["user_id"]
+        .nunique()
+        .groupby(level="group_id", observed=True)
+        .sum()
+    )
+    number_of_tasks = groups_df.groupby("group_id", observed=True)[
+        "number_of_tasks"
+    ].min()
+    required_results = (
+        groups_df["number_of_tasks"] * groups_df["number_of_users_required"]
+    ).sum()
+    previous_cum_number_of_results = int(
+        (previous_users_by_group * number_of_tasks).sum()
+    )
+    previous_cum_number_of_users = previous_results_df["user_id"].nunique()
+
+    if previous_history_df.empty:
+        previous = {
+            "cum_number_of_results": 0,
+            "cum_number_of_results_progress": 0,
+            "cum_number_of_users": 0,
+            "cum_progress": 0,
+        }
+    else:
+        previous = previous_history_df.iloc[-1]
+
+    if (
+        new_results_df.empty
+        or previous["cum_number_of_results"] != previous_cum_number_of_results
+        or previous["cum_number_of_users"] != previous_cum_number_of_users
+        or previous["cum_progress"]
+        != previous["cum_number_of_results_progress"] / required_results
+    ):
+        logger.info("project history does not match results. calculate all days.")
+        return get_project_history(results_df, groups_df)
+
+    progress_by_date_df = get_progress_by_date(
+        new_results_df,
+        groups_df,
+        previous_users_by_group=previous_users_by_group,
+        previous_cum_number_of_results=previous_cum_number_of_results,
+        previous_cum_number_of_results_progress=int(
+            previous["cum_number_of_results_progress"]
+        ),
+    )
+    contributors_by_date_df = get_contributors_by_date(
+        new_results_df,
+        first_day_by_user=results_df.groupby("user_id", observed=True)["day"].min(),
+        previous_cum_number_of_users=previous_cum_number_of_users,
+    )
+    new_history_df = progress_by_date_df.merge(
+        contributors_by_date_df, left_on="day", right_on="day"
+    )
+    logger.info(f"calculated project history for {len(new_history_df)} days")
+
+    return pd.concat([previous_history_df[new_history_df.columns], new_history_df])
@@ -0,0 +1,139 @@
+"""Keyed store for the dynamic information of projects (progress, users, results).
+
+The statistics of a single project are updated in place in a SQLite database
+in the data directory instead of rewriting projects_dynamic.csv for each project.
+projects_dynamic.csv is written once from the store after all projects are done.
+"""
+
+import os
+import sqlite3
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from mapswipe_workers.definitions import PROJECTS_DYNAMIC_STORE_PATH, logger
+
+PROJECTS_DYNAMIC_COLUMNS = [
+    "project_id",
+    "progress",
+    "number_of_users",
+    "number_of_results",
+    "number_of_results_progress",
+    "day",
+    "scotts_pi",
+    "fleiss_kappa",
+]
+
+
+def to_sqlite_value(value):
+    """Convert numpy and pandas values into values supported by SQLite."""
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    if isinstance(value, pd.Timestamp):
+        # dates are written as in projects_dynamic.csv before
+        return str(value)
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+class ProjectsDynamicStore:
+    """SQLite table of the dynamic project information with project_id as key."""
+
+    def __init__(self, path: str = PROJECTS_DYNAMIC_STORE_PATH):
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS projects_dynamic (
+              project_id TEXT PRIMARY KEY,
+              progress REAL,
+              number_of_users INTEGER,
+              number_of_results INTEGER,
+              number_of_results_progress INTEGER,
+              day TEXT,
+              scotts_pi REAL,
+              fleiss_kappa REAL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute(
+            "SELECT count(*) FROM projects_dynamic"
+        ).fetchone()[0]
+
+    def update(self, project_stats_dict: dict) -> None:
+        """Add or replace the statistics of a project."""
+        with self._connection:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO projects_dynamic "
+                f"({', '.join(PROJECTS_DYNAMIC_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(PROJECTS_DYNAMIC_COLUMNS))})",
+                [
+                    to_sqlite_value(project_stats_dict.get(column))
+                    for column in PROJECTS_DYNAMIC_COLUMNS
+                ],
+            )
+
+    def delete(self, project_id: str) -> None:
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM projects_dynamic WHERE project_id = ?", (project_id,)
+            )
+
+    def import_csv(self, filename: str) -> None:
+        """Initialize the store from an existing projects_dynamic.csv file."""
+        df = pd.read_csv(filename, index_col="idx", dtype={"project_id": str})
+        df = df.reindex(columns=PROJECTS_DYNAMIC_COLUMNS)
+        with self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO projects_dynamic "
+                f"({', '.join(PROJECTS_DYNAMIC_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(PROJECTS_DYNAMIC_COLUMNS))})",
+                [[to_sqlite_value(value) for value in row] for row in df.to_numpy()],
+            )
+        logger.info(f"imported {len(df)} projects from {filename}")
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Get the statistics of all projects in the order they have been updated."""
+        return pd.read_sql_query(
+            f"SELECT {', '.join(PROJECTS_DYNAMIC_COLUMNS)} "
+            "FROM projects_dynamic ORDER BY rowid",
+            self._connection,
+        )
+
+    def to_csv(self, filename: str) -> pd.DataFrame:
+        df = self.to_dataframe()
+        df.to_csv(filename, index_label="idx")
+        logger.info(f"saved dynamic project information: {filename}")
+        return df
+
+
+def load_projects_dynamic_store(
+    csv_filename: Optional[str] = None, path: str = PROJECTS_DYNAMIC_STORE_PATH
+) -> ProjectsDynamicStore:
+    """
+    Open the store of the dynamic project information.
+    If the store is empty, it will be initialized from the csv file if it exists.
+    """
+    store = ProjectsDynamicStore(path)
+    if len(store) == 0 and csv_filename is not None and os.path.isfile(csv_filename):
+        logger.info(f"file {csv_filename} exists. Init from this file.")
+        store.import_csv(csv_filename)
+    return store
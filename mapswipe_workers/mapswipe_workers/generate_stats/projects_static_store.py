@@ -0,0 +1,125 @@
+"""Keyed store for the static information of projects (name, status, geometry).
+
+The static information of a project is stored in a SQLite database in the data
+directory together with a signature of the attributes it is derived from.
+Area and centroid of a project are only queried from Postgres
+if the signature changed, e.g. if the status or the geometry changed.
+The geometries are stored as GeoJSON as well and are converted only once.
+"""
+
+import sqlite3
+from typing import Dict, List
+
+import pandas as pd
+
+from mapswipe_workers.definitions import PROJECTS_STATIC_STORE_PATH
+from mapswipe_workers.utils.geojson_functions import wkt_to_geojson_geometry
+
+PROJECTS_STATIC_COLUMNS = [
+    "project_id",
+    "name",
+    "project_details",
+    "look_for",
+    "project_type",
+    "tile_server_names",
+    "status",
+    "area_sqkm",
+    "geom",
+    "centroid",
+]
+
+GEOMETRY_COLUMNS = ["geom", "centroid"]
+
+
+class ProjectsStaticStore:
+    """SQLite table of the static project information with project_id as key.
+
+    Values are stored as text as they are written to projects_static.csv.
+    """
+
+    def __init__(self, path: str = PROJECTS_STATIC_STORE_PATH):
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(f"{column} TEXT" for column in PROJECTS_STATIC_COLUMNS[1:])
+        geojson_columns = ", ".join(
+            f"{column}_geojson TEXT" for column in GEOMETRY_COLUMNS
+        )
+        self._connection.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS projects_static (
+              project_id TEXT PRIMARY KEY,
+              signature TEXT,
+              {columns},
+              {geojson_columns}
+            )
+            """
+        )
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def get_signatures(self) -> Dict[str, str]:
+        return dict(
+            self._connection.execute(
+                "SELECT project_id, signature FROM projects_static"
+            ).fetchall()
+        )
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        Add or replace the static information of projects.
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            Static information of the projects as strings with a signature column.
+        """
+        df = df.assign(
+            **{
+                f"{column}_geojson": df[column].map(wkt_to_geojson_geometry)
+                for column in GEOMETRY_COLUMNS
+            }
+        )
+        columns = (
+            ["signature"]
+            + PROJECTS_STATIC_COLUMNS
+            + [f"{column}_geojson" for column in GEOMETRY_COLUMNS]
+        )
+        with self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO projects_static ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                df[columns].to_numpy().tolist(),
+            )
+
+    def delete(self, project_ids: List[str]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM projects_static WHERE project_id = ?",
+                [(project_id,) for project_id in project_ids],
+            )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Get the static information of all projects ordered by project id."""
+        return pd.read_sql_query(
+            f"SELECT {', '.join(PROJECTS_STATIC_COLUMNS)} "
+            "FROM projects_static ORDER BY project_id",
+            self._connection,
+        )
+
+    def get_geojson_geometries(self) -> pd.DataFrame:
+        """Get geometry and centroid of all projects as GeoJSON by project id."""
+        df = pd.read_sql_query(
+            "SELECT project_id, "
+            + ", ".join(f"{column}_geojson AS {column}" for column in GEOMETRY_COLUMNS)
+            + " FROM projects_static",
+            self._connection,
+        )
+        return df.set_index("project_id")
@@ -0,0 +1,221 @@
+"""Local columnar cache for the results of a project.
+
+The results of a project are stored as Arrow IPC files under RESULTS_CACHE_PATH.
+Each file (part) holds the results of the mapping sessions which have been added
+since the previous part. The highest mapping_session_id of the cache is used
+as watermark to query only new results from Postgres.
+Ids are dictionary encoded and the files are loaded memory-mapped.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv
+from psycopg2 import sql
+
+from mapswipe_workers import auth
+from mapswipe_workers.definitions import (
+    RESULTS_CACHE_MAX_PARTS,
+    RESULTS_CACHE_PATH,
+    logger,
+)
+
+DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+RESULTS_SCHEMA = pa.schema(
+    [
+        ("mapping_session_id", pa.int64()),
+        ("project_id", DICTIONARY_TYPE),
+        ("group_id", DICTIONARY_TYPE),
+        ("user_id", DICTIONARY_TYPE),
+        ("task_id", DICTIONARY_TYPE),
+        ("start_time", pa.timestamp("us")),
+        ("end_time", pa.timestamp("us")),
+        ("result", pa.int16()),
+    ]
+)
+
+
+def get_cache_dir(project_id: str) -> str:
+    return os.path.join(RESULTS_CACHE_PATH, project_id)
+
+
+def get_parts(project_id: str) -> List[str]:
+    """Get the paths of all parts of the cache ordered by their watermark."""
+    cache_dir = get_cache_dir(project_id)
+    if not os.path.isdir(cache_dir):
+        return []
+    return sorted(
+        os.path.join(cache_dir, name)
+        for name in os.listdir(cache_dir)
+        if name.endswith(".arrow")
+    )
+
+
+def get_watermark(project_id: str) -> int:
+    """Get the highest mapping_session_id in the cache or 0 if it is empty."""
+    parts = get_parts(project_id)
+    if not parts:
+        return 0
+    return int(os.path.basename(parts[-1]).split(".")[0])
+
+
+def read_part(path: str) -> pa.Table:
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_table(project_id: str) -> pa.Table:
+    """Read all parts of the cache as a single (memory-mapped) table."""
+    tables = [read_part(path) for path in get_parts(project_id)]
+    if not tables:
+        return RESULTS_SCHEMA.empty_table()
+    return pa.concat_tables(tables)
+
+
+def count_rows(project_id: str) -> int:
+    """Count the results in the cache without reading the data."""
+    number_of_rows = 0
+    for path in get_parts(project_id):
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                number_of_rows += reader.get_batch(i).num_rows
+    return number_of_rows
+
+
+def write_part(project_id: str, table: pa.Table) -> str:
+    """Write results as new part of the cache.
+
+    The part is named by the highest mapping_session_id of the results.
+    The file is written to a temporary file first and then moved into the cache
+    so that a part is either complete or does not exist.
+    """
+    cache_dir = get_cache_dir(project_id)
+    os.makedirs(cache_dir, exist_ok=True)
+    watermark = pc.max(table["mapping_session_id"]).as_py()
+    path = os.path.join(cache_dir, f"{watermark:020d}.arrow")
+
+    # all record batches of a file need to share the same dictionaries
+    table = table.unify_dictionaries().combine_chunks()
+    file_descriptor, temporary_file = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+    os.close(file_descriptor)
+    with pa.OSFile(temporary_file, "wb") as sink:
+        with pa.ipc.new_file(sink, RESULTS_SCHEMA) as writer:
+            writer.write_table(table)
+    os.replace(temporary_file, path)
+    logger.info(f"added {table.num_rows} results to results cache: {path}")
+    return path
+
+
+def compact(project_id: str) -> None:
+    """Merge all parts of the cache into a single part."""
+    parts = get_parts(project_id)
+    if len(parts) < 2:
+        return
+    # the merged part has the same name as the newest part and replaces it
+    write_part(project_id, read_table(project_id))
+    for path in parts[:-1]:
+        os.remove(path)
+    logger.info(f"merged {len(parts)} parts of results cache for {project_id}")
+
+
+def clear(project_id: str) -> None:
+    shutil.rmtree(get_cache_dir(project_id), ignore_errors=True)
+
+
+def query_results(project_id: str, watermark: int) -> pa.Table:
+    """Query results of mapping sessions newer than the watermark from Postgres."""
+    sql_query = sql.SQL(
+        """
+        COPY (
+            SELECT
+                ms.mapping_session_id,
+                ms.project_id,
+                ms.group_id,
+                ms.user_id,
+                msr.task_id,
+                ms.start_time,
+                ms.end_time,
+                msr.result
+            FROM mapping_sessions_results_all msr
+            JOIN mapping_sessions ms USING (mapping_session_id)
+            WHERE ms.project_id = {} AND ms.mapping_session_id > {}
+        ) TO STDOUT WITH CSV HEADER
+        """
+    ).format(sql.Literal(project_id), sql.Literal(watermark))
+
+    pg_db = auth.postgresDB()
+    with tempfile.TemporaryFile() as f:
+        pg_db.copy_expert(sql_query, f)
+        f.seek(0)
+        table = pyarrow.csv.read_csv(
+            f,
+            convert_options=pyarrow.csv.ConvertOptions(
+                column_types={field.name: field.type for field in RESULTS_SCHEMA}
+            ),
+        )
+    return table.select(RESULTS_SCHEMA.names).cast(RESULTS_SCHEMA)
+
+
+def count_results(project_id: str) -> int:
+    """Get the number of results of the project in Postgres."""
+    pg_db = auth.postgresDB()
+    query = """
+        SELECT coalesce(sum(count), 0)
+        FROM task_result_counts
+        WHERE project_id = %(project_id)s
+    """
+    return int(pg_db.retr_query(query, {"project_id": project_id})[0][0])
+
+
+def update(project_id: str) -> bool:
+    """Add new results of the project to the cache.
+
+    The cache is rebuilt if the number of cached results does not match
+    the number of results in Postgres, e.g. if results have been added
+    to existing mapping sessions or if results have been deleted.
+    Return True if the cache has changed.
+    """
+    table = query_results(project_id, get_watermark(project_id))
+    if table.num_rows > 0:
+        write_part(project_id, table)
+
+    number_of_results = count_results(project_id)
+    if count_rows(project_id) != number_of_results:
+        logger.warning(
+            f"results cache does not match results for {project_id}. rebuild cache."
+        )
+        clear(project_id)
+        table = query_results(project_id, 0)
+        if table.num_rows > 0:
+            write_part(project_id, table)
+        return True
+
+    if len(get_parts(project_id)) > RESULTS_CACHE_MAX_PARTS:
+        compact(project_id)
+
+    return table.num_rows > 0
+
+
+def load_results(project_id: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load the cached results of the project as dataframe.
+
+    Dictionary encoded ids are loaded as categorical columns
+    with sorted categories, which needs a fraction of the memory of strings.
+    Only the given columns are loaded if columns are defined.
+    """
+    table = read_table(project_id)
+    if columns is not None:
+        table = table.select(columns)
+    df = table.unify_dictionaries().to_pandas()
+    for column in df.select_dtypes("category").columns:
+        df[column] = df[column].cat.reorder_categories(
+            df[column].cat.categories.sort_values()
+        )
+    return df
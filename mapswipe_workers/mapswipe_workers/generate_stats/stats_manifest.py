@@ -0,0 +1,174 @@
+"""Manifest of the stats files of a project in the API directory.
+
+For each project a manifest records the inputs of the last generation of stats
+(e.g. the watermark of the results), the returned statistics
+and the content hash of each output file.
+The stats of a project are skipped if the inputs did not change
+and all output files exist.
+
+Output files are written to a temporary file first, which only replaces
+the existing file if the content changed. Unchanged files keep their
+modification time, from which nginx derives the ETag of a file.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import Callable, Optional
+
+from mapswipe_workers.definitions import DATA_PATH, STATS_MANIFEST_PATH, logger
+from mapswipe_workers.generate_stats.projects_dynamic_store import to_sqlite_value
+
+API_PATH = os.path.join(DATA_PATH, "api")
+
+# increase to generate the stats of all projects again, e.g. if outputs change
+MANIFEST_VERSION = 1
+
+
+def get_manifest_filename(project_id: str) -> str:
+    return os.path.join(STATS_MANIFEST_PATH, f"manifest_{project_id}.json")
+
+
+def content_hash(filename: str) -> str:
+    """Calculate the sha256 hash of the content of a file.
+
+    Gzipped files are hashed uncompressed,
+    since the gzip header contains the time of compression.
+    """
+    sha256 = hashlib.sha256()
+    with (gzip.open if filename.endswith(".gz") else open)(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def write_json(filename: str, data: dict) -> None:
+    """Write a json file atomically."""
+    file_descriptor, temporary_file = tempfile.mkstemp(
+        suffix=".tmp", dir=os.path.dirname(filename)
+    )
+    with os.fdopen(file_descriptor, "w") as f:
+        json.dump(data, f, indent=2)
+    # mkstemp creates files readable by the owner only, nginx needs to read them
+    os.chmod(temporary_file, 0o644)
+    os.replace(temporary_file, filename)
+
+
+class StatsManifest:
+    """Inputs, statistics and output files of the last stats of a project."""
+
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+        self.filename = get_manifest_filename(project_id)
+        self.inputs: Optional[dict] = None
+        self.project_stats: Optional[dict] = None
+        self.files: dict = {}
+
+        if os.path.isfile(self.filename):
+            try:
+                with open(self.filename) as f:
+                    manifest = json.load(f)
+                self.inputs = manifest["inputs"]
+                self.project_stats = manifest["project_stats"]
+                self.files = manifest["files"]
+            except (ValueError, KeyError):
+                logger.warning(f"could not read stats manifest: {self.filename}")
+
+    def is_up_to_date(self, inputs: dict) -> bool:
+        """Check if the inputs did not change and all output files exist."""
+        return (
+            self.inputs == inputs
+            and self.project_stats is not None
+            and all(os.path.isfile(os.path.join(API_PATH, path)) for path in self.files)
+        )
+
+    def write_file(self, filename: str, write: Callable[[str], None]) -> bool:
+        """
+        Write an output file with the write function to a temporary file.
+        The temporary file replaces the existing file only if the content changed.
+        Return True if the file has been replaced.
+
+        Parameters
+        ----------
+        filename: str
+            The output file in the API directory.
+        write: function
+            Writes the output to the filename given as argument.
+        """
+
+        path = os.path.relpath(filename, API_PATH)
+        directory, basename = os.path.split(filename)
+        # the temporary file starts with the name of the output (e.g. used as name
+        # of a GeoJSON feature collection) and ends with the same extensions
+        # (e.g. to write gzipped files)
+        name, extensions = basename.split(".", 1)
+        file_descriptor, temporary_file = tempfile.mkstemp(
+            prefix=f"{name}.", suffix=f".tmp.{extensions}", dir=directory
+        )
+        os.close(file_descriptor)
+        try:
+            write(temporary_file)
+            sha256 = content_hash(temporary_file)
+            if path in self.files:
+                previous_sha256 = self.files[path]["sha256"]
+            elif os.path.isfile(filename):
+                previous_sha256 = content_hash(filename)
+            else:
+                previous_sha256 = None
+
+            is_changed = sha256 != previous_sha256 or not os.path.isfile(filename)
+            if is_changed:
+                # mkstemp creates files readable by the owner only,
+                # nginx needs to read them
+                os.chmod(temporary_file, 0o644)
+                os.replace(temporary_file, filename)
+            else:
+                logger.info(f"content did not change. keep file: {filename}")
+        finally:
+            if os.path.isfile(temporary_file):
+                os.remove(temporary_file)
+
+        self.files[path] = {
+            "sha256": sha256,
+            "size": os.path.getsize(filename),
+        }
+        return is_changed
+
+    def save(self, inputs: dict, project_stats: dict) -> None:
+        """Save the inputs and statistics of the current stats."""
+        self.inputs = inputs
+        self.project_stats = {
+            key: to_sqlite_value(value) for key, value in project_stats.items()
+        }
+        os.makedirs(STATS_MANIFEST_PATH, exist_ok=True)
+        write_json(
+            self.filename,
+            {
+                "project_id": self.project_id,
+                "inputs": self.inputs,
+                "project_stats": self.project_stats,
+                "files": self.files,
+            },
+        )
+        logger.info(f"saved stats manifest for {self.project_id}: {self.filename}")
+
+
+def write_output(
+    filename: str,
+    write: Callable[[str], None],
+    manifest: Optional[StatsManifest] = None,
+) -> None:
+    """Write an output file using the manifest if given, otherwise directly."""
+    if manifest is None:
+        write(filename)
+    else:
+        manifest.write_file(filename, write)
+
+
+def delete(project_id: str) -> None:
+    """Delete the manifest of a project, e.g. if the project is deleted."""
+    filename = get_manifest_filename(project_id)
+    if os.path.isfile(filename):
+        os.remove(filename)
@@ -0,0 +1,106 @@
+"""Queue of the projects for which stats need to be generated.
+
+The transfer of results counts the new results of each project
+in the project_stats_queue table. A project is dirty as long as
+there are results which are not part of its stats yet.
+Dirty projects are generated in the order of their priority,
+which grows with the number of new results and the time they are waiting.
+Projects waiting longer than MAX_STALENESS come first, oldest first,
+so that projects with only a few new results are not starved by busy projects.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from mapswipe_workers import auth
+from mapswipe_workers.definitions import logger
+
+# seconds after which a dirty project is generated before all others
+MAX_STALENESS = 3 * 60 * 60
+
+
+class QueuedProject(NamedTuple):
+    project_id: str
+    # number of results which are not part of the stats yet
+    new_results: int
+    # seconds since the oldest new result has been transferred
+    staleness: float
+
+
+def get_queued_projects(
+    project_ids: Optional[List[str]] = None,
+) -> Dict[str, QueuedProject]:
+    """
+    Get the dirty projects from the queue.
+    If project ids are given, get these projects whether they are dirty or not.
+    """
+    pg_db = auth.postgresDB()
+    if project_ids is None:
+        condition = "new_results > 0"
+    else:
+        condition = "project_id = ANY(%(project_ids)s::varchar[])"
+    query = f"""
+        SELECT
+            project_id
+            ,new_results
+            ,coalesce(extract(epoch FROM now() - dirty_since), 0)
+        FROM project_stats_queue
+        WHERE {condition}
+    """
+    rows = pg_db.retr_query(query, {"project_ids": project_ids})
+    return {
+        project_id: QueuedProject(project_id, int(new_results), float(staleness))
+        for project_id, new_results, staleness in rows
+    }
+
+
+def get_priority(
+    project: QueuedProject, max_staleness: float = MAX_STALENESS
+) -> Tuple[int, float]:
+    """
+    Get the priority of a project as sort key, lower values come first.
+
+    Projects waiting longer than max_staleness are ordered by their staleness.
+    All other projects are ordered by their new results,
+    which are weighted by the hours they are waiting.
+    """
+    if project.staleness >= max_staleness:
+        return 0, -project.staleness
+    return 1, -project.new_results * (1 + project.staleness / 3600)
+
+
+def prioritize_projects(
+    projects: List[QueuedProject], max_staleness: float = MAX_STALENESS
+) -> List[str]:
+    """Get the ids of the projects ordered by their priority."""
+    return [
+        project.project_id
+        for project in sorted(
+            projects, key=lambda project: get_priority(project, max_staleness)
+        )
+    ]
+
+
+def mark_stats_generated(project: QueuedProject) -> None:
+    """
+    Subtract the new results of the project at the time it has been queued.
+    Results which have been transferred while the stats have been generated
+    keep the project dirty.
+    """
+    pg_db = auth.postgresDB()
+    query = """
+        UPDATE project_stats_queue
+        SET
+            new_results = greatest(new_results - %(new_results)s, 0)
+            ,dirty_since = CASE
+                WHEN new_results > %(new_results)s THEN now()
+            END
+            ,stats_generated_at = now()
+        WHERE project_id = %(project_id)s
+    """
+    pg_db.query(
+        query, {"project_id": project.project_id, "new_results": project.new_results}
+    )
+    logger.info(
+        f"marked stats of {project.project_id} as generated "
+        f"with {project.new_results} new results."
+    )
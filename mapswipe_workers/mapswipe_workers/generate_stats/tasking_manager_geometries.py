@@ -1,19 +1,24 @@
 import csv
 import gzip
-import threading
-from queue import Queue
+from collections import deque
+from typing import List, Optional, Tuple
 
-from osgeo import ogr
+import numpy as np
+from osgeo import gdal, ogr
 
 from mapswipe_workers.definitions import DATA_PATH, logger
+from mapswipe_workers.generate_stats import stats_manifest
 from mapswipe_workers.utils import geojson_functions, tile_functions
 
+# number of tiles in x and y direction which are dissolved at once
+DISSOLVE_WINDOW_SIZE = 4096
+
 
 def load_data(project_id: str, gzipped_csv_file: str) -> list:
     """
     This will load the aggregated results csv file into a list of dictionaries.
     For further steps we currently rely on task_x, task_y, task_z and yes_share and
-    maybe_share and wkt
+    maybe_share. Geometries are derived from the tile coordinates when needed.
     """
 
     project_data = []
@@ -50,9 +55,6 @@ def load_data(project_id: str, gzipped_csv_file: str) -> list:
                     "yes_share": float(row[8]),
                     "maybe_share": float(row[9]),
                     "bad_imagery_share": float(row[10]),
-                    "wkt": tile_functions.geometry_from_tile_coords(
-                        task_x, task_y, task_z
-                    ),
                 }
             )
 
@@ -118,159 +120,122 @@ def get_neighbour_list(neighbourhood_shape: str, neighbourhood_size: int) -> lis
     return neighbour_list
 
 
-def add_group_id_to_neighbours(task_x: int, task_y: int, task_z: int, group_id: int):
+def get_neighbour_pairs(
+    tiles: np.ndarray, neighbour_list: list
+) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Add a group id to all other tiles that are in the neighbourhood of the given tile,
-    which is defined by task_x, task_y and task_z.
+    Find all pairs of tiles which are neighbours.
+    Tiles are given as array of rows with tile z, x and y.
+    Returns two arrays with the indices of the tiles of each pair.
     """
 
-    # look for neighbours
-    for i, j in neighbour_list:
-        new_task_x = int(task_x) + i
-        new_task_y = int(task_y) + j
-        new_task_id = f"{task_z}-{new_task_x}-{new_task_y}"
-
-        if new_task_id in yes_results_dict:
-            yes_results_dict[new_task_id]["my_group_id"] = group_id
-
-
-def create_duplicates_dict() -> dict:
+    if len(neighbour_list) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    offsets = np.array(neighbour_list, dtype=np.int64)
+    padding = int(np.abs(offsets).max())
+
+    # identify tiles by a single integer key
+    # tiles of different zoom levels are never neighbours due to the padding
+    zoom_index = np.unique(tiles[:, 0], return_inverse=True)[1].reshape(-1)
+    x = tiles[:, 1] - tiles[:, 1].min() + padding
+    y = tiles[:, 2] - tiles[:, 2].min() + padding
+    width = int(x.max()) + padding + 1
+    height = int(y.max()) + padding + 1
+    keys = (zoom_index * width + x) * height + y
+
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+
+    first_tiles = []
+    second_tiles = []
+    for i, j in offsets:
+        # pairs are symmetric, only one direction is needed
+        if (i, j) < (0, 0):
+            continue
+        neighbour_keys = keys + i * height + j
+        positions = np.searchsorted(sorted_keys, neighbour_keys)
+        positions[positions == len(sorted_keys)] = 0
+        found = sorted_keys[positions] == neighbour_keys
+        first_tiles.append(np.flatnonzero(found))
+        second_tiles.append(order[positions[found]])
+
+    return np.concatenate(first_tiles), np.concatenate(second_tiles)
+
+
+def get_connected_components(
+    number_of_tiles: int, first_tiles: np.ndarray, second_tiles: np.ndarray
+) -> np.ndarray:
     """
-    Check which tasks belong to multiple groups.
-    This will be used as a later stage to put tasks into distinct groups.
-    """
-
-    duplicated_groups = {}
-    for task_id in yes_results_dict.keys():
-        my_group_id = yes_results_dict[task_id]["my_group_id"]
-        # check for other results in the neighbourhood
-        # look for neighbours
-        for i, j in neighbour_list:
-            new_task_x = int(yes_results_dict[task_id]["task_x"]) + i
-            new_task_y = int(yes_results_dict[task_id]["task_y"]) + j
-            new_task_id = (
-                f"{yes_results_dict[task_id]['task_z']}-{new_task_x}-{new_task_y}"
-            )
+    Label the connected components of tiles given by pairs of neighbours.
+    Each tile gets the smallest index of all tiles in its component as label.
 
-            if new_task_id in yes_results_dict:
-                neighbours_group_id = yes_results_dict[new_task_id]["my_group_id"]
-                if neighbours_group_id != my_group_id:
-                    # add the other group to duplicated groups dict
-                    try:
-                        duplicated_groups[my_group_id].add(neighbours_group_id)
-                    except KeyError:
-                        duplicated_groups[my_group_id] = set([neighbours_group_id])
-                    # add my_group_id to other groupd_id in duplicated dict
-                    try:
-                        duplicated_groups[neighbours_group_id].add(my_group_id)
-                    except KeyError:
-                        duplicated_groups[neighbours_group_id] = set([my_group_id])
-
-    return duplicated_groups
-
-
-def remove_duplicates(duplicated_groups: dict):
+    The labels are propagated along the pairs and shortened
+    by pointer jumping (label of the label) until they are stable.
     """
-    Remove groups ids for tasks which have more than one.
-    This is to make sure that every task belongs to a single group only.
-    This distinct group id will be the basis for further geometric processing.
-    """
-
-    for duplicated_group_id in sorted(duplicated_groups.keys(), reverse=True):
-        logger.debug(
-            f"{duplicated_group_id}: {list(duplicated_groups[duplicated_group_id])}"
-        )
-        my_duplicated_group_id = duplicated_group_id
-        for other_group_id in duplicated_groups[duplicated_group_id]:
-            if other_group_id < my_duplicated_group_id:
-                my_duplicated_group_id = other_group_id
 
-        for task_id in yes_results_dict.keys():
-            if yes_results_dict[task_id]["my_group_id"] == duplicated_group_id:
-                yes_results_dict[task_id]["my_group_id"] = my_duplicated_group_id
-
-
-def split_groups(q):
+    labels = np.arange(number_of_tiles)
+    while True:
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, first_tiles, labels[second_tiles])
+        np.minimum.at(new_labels, second_tiles, labels[first_tiles])
+        while True:
+            jumped_labels = new_labels[new_labels]
+            if np.array_equal(jumped_labels, new_labels):
+                break
+            new_labels = jumped_labels
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+
+def split_cluster(
+    tiles: np.ndarray, group_size: int, neighbourhood_size: int
+) -> List[np.ndarray]:
     """
-    This function will be executed using threading.
-    First it checks if there are still processes pending in the queue.
-    We are using a clustering algorithm to put tasks together in groups.
-    Since it is computationally expensive to check which tiles are neighbours,
-    we split our results into chunks (called groups here).
-    When we reach a group size below the defined group size we will stop.
-    Otherwise, the group will be split into two parts and
-    both will be added as new groups to our queue.
-    """
-
-    while not q.empty():
-        group_id, group_data, group_size = q.get()
-        logger.debug(f"the group ({group_id}) has {len(group_data)} members")
-
-        # find min x, and min y
-        x_list = []
-        y_list = []
-
-        for result, data in group_data.items():
-            x_list.append(int(data["task_x"]))
-            y_list.append(int(data["task_y"]))
-
-        min_x = min(x_list)
-        max_x = max(x_list)
-        x_width = max_x - min_x
+    Split a cluster of tiles into groups with less than group_size tiles.
+    Returns a list with the indices of the tiles of each group.
 
-        min_y = min(y_list)
-        max_y = max(y_list)
-        y_width = max_y - min_y
+    The cluster is split in halves along the longer side of its bounding box
+    and the halves are split again until a group has less than group_size tiles.
+    To avoid large groups with few tiles, groups with a bounding box larger than
+    twice the neighbourhood are split as well.
+    """
 
-        new_grouped_data = {"a": {}, "b": {}}
+    groups = []
+    queue = deque([np.arange(len(tiles))])
+    while queue:
+        index = queue.popleft()
+        x = tiles[index, 1]
+        y = tiles[index, 2]
+        x_width = x.max() - x.min()
+        y_width = y.max() - y.min()
 
         if x_width >= y_width:
             # first split vertically
-            for result, data in group_data.items():
-                # result is in first segment
-                if int(data["task_x"]) < (min_x + (x_width / 2)):
-                    new_grouped_data["a"][result] = data
-                else:
-                    new_grouped_data["b"][result] = data
+            is_first = x < x.min() + x_width / 2
         else:
             # first split horizontally
-            for result, data in group_data.items():
-                # result is in first segment
-                if int(data["task_y"]) < (min_y + (y_width / 2)):
-                    new_grouped_data["a"][result] = data
-                else:
-                    new_grouped_data["b"][result] = data
-
-        for k in ["a", "b"]:
-            logger.debug("there are %s results in %s" % (len(new_grouped_data[k]), k))
-
-            for result, data in new_grouped_data[k].items():
-                x_list.append(int(data["task_x"]))
-                y_list.append(int(data["task_y"]))
-
-            min_x = min(x_list)
-            max_x = max(x_list)
-            x_width = max_x - min_x
-
-            min_y = min(y_list)
-            max_y = max(y_list)
-            y_width = max_y - min_y
-
-            if len(new_grouped_data[k]) < group_size:
-
-                # add this check to avoid large groups groups with few items
-                if x_width * y_width > 2 * (
-                    my_neighbourhood_size * my_neighbourhood_size
-                ):
-                    q.put([group_id, new_grouped_data[k], group_size])
-                else:
-                    split_groups_list.append(new_grouped_data[k])
-                    logger.debug('add "a" to split_groups_dict')
+            is_first = y < y.min() + y_width / 2
+
+        for part in [index[is_first], index[~is_first]]:
+            if len(part) == 0:
+                continue
+            part_area = np.ptp(tiles[part, 1]) * np.ptp(tiles[part, 2])
+            # parts which can not be split further are kept
+            if (
+                len(part) == 1
+                or len(part) == len(index)
+                or (
+                    len(part) < group_size
+                    and part_area <= 2 * neighbourhood_size * neighbourhood_size
+                )
+            ):
+                groups.append(part)
             else:
-                # add this group to a queue
-                q.put([group_id, new_grouped_data[k], group_size])
+                queue.append(part)
 
-        q.task_done()
+    return groups
 
 
 def create_hot_tm_tasks(
@@ -285,139 +250,180 @@ def create_hot_tm_tasks(
     Tasking Manager.
     It will create a neighbourhood list, which will function as a mask to filter tiles
     that are close to each other.
-    The functions assigns group ids to each tile.
-    For tiles that got several group ids, this will be resolved in the next step.
-    Once each task has a unique group id, the function checks the size (number of tiles)
-    for each group.
-    Groups that hold too many tiles (too big to map in the Tasking Manager) will be
+    Tiles which are connected through their neighbourhoods form a cluster.
+    The clusters are found as connected components of the tiles,
+    which are identified by their integer tile coordinates.
+    Clusters that hold too many tiles (too big to map in the Tasking Manager) will be
     split into smaller groups.
     Finally, a dictionary is returned which holds each group as an item.
     Each group consists of a limited number of tiles.
+
+    The function does not use any global state and can be used for several
+    projects at the same time.
     """
 
     # final groups dict will store the groups that are exported
     final_groups_dict = {}
-    highest_group_id = 0
 
-    # create a dictionary with all results
-    global yes_results_dict
-    yes_results_dict = {}
-    for result in project_data:
-        yes_results_dict[result["id"]] = result
-    logger.info(
-        "created results dictionary. there are %s results." % len(yes_results_dict)
-    )
-    if len(yes_results_dict) < 1:
+    # tiles are ordered by task id
+    yes_results = sorted(project_data, key=lambda result: result["id"])
+    logger.info("created results list. there are %s results." % len(yes_results))
+    if len(yes_results) < 1:
         return final_groups_dict
 
-    global neighbour_list
-    global my_neighbourhood_size
-    my_neighbourhood_size = neighbourhood_size
-
     neighbour_list = get_neighbour_list(neighbourhood_shape, neighbourhood_size)
     logger.info(
         "got neighbour list. neighbourhood_shape: %s, neighbourhood_size: %s"
         % (neighbourhood_shape, neighbourhood_size)
     )
 
-    global split_groups_list
-    split_groups_list = []
-
-    # test for neighbors and set groups id
-    for task_id in sorted(yes_results_dict.keys()):
-        try:
-            # this task has already a group id, great.
-            group_id = yes_results_dict[task_id]["my_group_id"]
-        except KeyError:
-            group_id = highest_group_id + 1
-            highest_group_id += 1
-            yes_results_dict[task_id]["my_group_id"] = group_id
-            logger.debug("created new group id")
-        logger.debug("group id: %s" % group_id)
-
-        # check for other results in the neighbourhood and add the group id to them
-        add_group_id_to_neighbours(
-            yes_results_dict[task_id]["task_x"],
-            yes_results_dict[task_id]["task_y"],
-            yes_results_dict[task_id]["task_z"],
-            group_id,
-        )
-
-    logger.info("added group ids to yes maybe results dict")
-
-    # check if some tasks have different groups from their neighbours
-    duplicates_dict = create_duplicates_dict()
-    while len(duplicates_dict) > 0:
-        remove_duplicates(duplicates_dict)
-        duplicates_dict = create_duplicates_dict()
-        logger.debug("there are %s duplicated groups" % len(duplicates_dict))
-
-    logger.info("removed all duplicated group ids in yes maybe results dict")
-
-    grouped_results_dict = {}
-    for task_id in yes_results_dict.keys():
-        group_id = yes_results_dict[task_id]["my_group_id"]
-        try:
-            grouped_results_dict[group_id][task_id] = yes_results_dict[task_id]
-        except KeyError:
-            grouped_results_dict[group_id] = {}
-            grouped_results_dict[group_id][task_id] = yes_results_dict[task_id]
-
-    logger.info("created dict item for each group")
-
-    # reset highest group id since we merged several groups
-    highest_group_id = max(grouped_results_dict)
-    logger.debug("new highest group id: %s" % highest_group_id)
-
-    q = Queue(maxsize=0)
-    num_threads = 1
+    tiles = np.array(
+        [
+            [int(result["task_z"]), int(result["task_x"]), int(result["task_y"])]
+            for result in yes_results
+        ],
+        dtype=np.int64,
+    )
+    first_tiles, second_tiles = get_neighbour_pairs(tiles, neighbour_list)
+    labels = get_connected_components(len(tiles), first_tiles, second_tiles)
 
-    for group_id in grouped_results_dict.keys():
+    # group ids are given in the order of the task ids, starting with 1
+    group_ids = np.unique(labels, return_inverse=True)[1].reshape(-1) + 1
+    highest_group_id = int(group_ids.max())
+    logger.info("created %s clusters of tiles" % highest_group_id)
 
-        if len(grouped_results_dict[group_id]) < group_size:
-            final_groups_dict[group_id] = grouped_results_dict[group_id]
+    order = np.argsort(group_ids, kind="stable")
+    boundaries = np.searchsorted(group_ids[order], np.arange(2, highest_group_id + 1))
+    split_groups_list = []
+    for group_id, index in enumerate(np.split(order, boundaries), start=1):
+        if len(index) < group_size:
+            final_groups_dict[group_id] = {
+                yes_results[i]["id"]: yes_results[i] for i in index
+            }
         else:
-            group_data = grouped_results_dict[group_id]
-            # add this group to the queue
-            q.put([group_id, group_data, group_size])
+            for part in split_cluster(tiles[index], group_size, neighbourhood_size):
+                split_groups_list.append(
+                    {yes_results[i]["id"]: yes_results[i] for i in index[part]}
+                )
 
-    logger.info("added groups to queue.")
-
-    for i in range(num_threads):
-        worker = threading.Thread(target=split_groups, args=(q,))
-        worker.start()
-
-    q.join()
     logger.info("split all groups.")
-
     logger.debug("there are %s split groups" % len(split_groups_list))
 
     # add the split groups to the final groups dict
     for group_data in split_groups_list:
-        new_group_id = highest_group_id + 1
         highest_group_id += 1
-        final_groups_dict[new_group_id] = group_data
+        final_groups_dict[highest_group_id] = group_data
 
     logger.info("created %s groups." % len(final_groups_dict))
     return final_groups_dict
 
 
-def dissolve_project_data(project_data):
+def polygonize_tile_grid(
+    grid: np.ndarray, offset_x: int, offset_y: int, zoom: int
+) -> List[ogr.Geometry]:
     """
-    This functions uses the unionCascaded function to return a dissolved MultiPolygon
-    geometry from several Single Part Polygon geometries.
+    Convert a grid of tiles into polygons of the outlines of connected tiles.
+    Cells of the grid are 1 for tiles which are part of the polygons and 0 otherwise.
+    The grid starts at tile offset_x, offset_y.
+
+    The grid is polygonized with gdal in tile coordinates.
+    All vertices lie on tile corners and are converted into lon, lat
+    the same way as the tile geometries.
     """
 
-    multipolygon_geometry = ogr.Geometry(ogr.wkbMultiPolygon)
-    for item in project_data:
-        polygon = ogr.CreateGeometryFromWkt(item["wkt"])
-        multipolygon_geometry.AddGeometry(polygon)
+    rows, cols = grid.shape
+    raster = gdal.GetDriverByName("MEM").Create("", cols, rows, 1, gdal.GDT_Byte)
+    raster.SetGeoTransform((offset_x, 1, 0, offset_y, 0, 1))
+    band = raster.GetRasterBand(1)
+    band.WriteRaster(0, 0, cols, rows, grid.astype(np.uint8).tobytes())
+
+    data_source = ogr.GetDriverByName("Memory").CreateDataSource("")
+    layer = data_source.CreateLayer("tiles", geom_type=ogr.wkbPolygon)
+    layer.CreateField(ogr.FieldDefn("value", ogr.OFTInteger))
+    # the band is also used as mask to skip cells without tiles
+    gdal.Polygonize(band, band, layer, 0)
+
+    lons = [
+        tile_functions.pixel_coords_zoom_to_lat_lon(x * 256, 0, zoom)[0]
+        for x in range(offset_x, offset_x + cols + 1)
+    ]
+    lats = [
+        tile_functions.pixel_coords_zoom_to_lat_lon(0, y * 256, zoom)[1]
+        for y in range(offset_y, offset_y + rows + 1)
+    ]
+
+    polygons = []
+    for feature in layer:
+        polygon = feature.GetGeometryRef().Clone()
+        for ring in polygon:
+            for i in range(ring.GetPointCount()):
+                x, y = ring.GetPoint_2D(i)
+                ring.SetPoint_2D(
+                    i, lons[int(round(x)) - offset_x], lats[int(round(y)) - offset_y]
+                )
+        # the tile geometries have a z coordinate of 0
+        polygon.Set3D(True)
+        polygons.append(polygon)
+
+    return polygons
+
+
+def dissolve_project_data(project_data: list) -> ogr.Geometry:
+    """
+    This functions returns a dissolved MultiPolygon geometry of the tiles
+    of the project data.
+
+    Since the tiles are aligned, they are marked in a grid of tile coordinates
+    and the outlines are derived from the grid with gdal.Polygonize.
+    Large areas are processed in windows of DISSOLVE_WINDOW_SIZE tiles.
+    The polygons of several windows are dissolved using the unionCascaded function.
+    """
 
-    dissolved_geometry = multipolygon_geometry.UnionCascaded()
+    tiles = np.array(
+        [[item["task_z"], item["task_x"], item["task_y"]] for item in project_data],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+
+    polygons = []
+    number_of_windows = 0
+    for zoom in np.unique(tiles[:, 0]):
+        zoom_tiles = tiles[tiles[:, 0] == zoom]
+        windows, window_index = np.unique(
+            zoom_tiles[:, 1:] // DISSOLVE_WINDOW_SIZE, axis=0, return_inverse=True
+        )
+        window_index = window_index.reshape(-1)
+        order = np.argsort(window_index, kind="stable")
+        boundaries = np.searchsorted(window_index[order], np.arange(1, len(windows)))
+        for window_tiles in np.split(zoom_tiles[order], boundaries):
+            offset_x, offset_y = window_tiles[:, 1].min(), window_tiles[:, 2].min()
+            grid = np.zeros(
+                (
+                    window_tiles[:, 2].max() - offset_y + 1,
+                    window_tiles[:, 1].max() - offset_x + 1,
+                ),
+                dtype=np.uint8,
+            )
+            grid[window_tiles[:, 2] - offset_y, window_tiles[:, 1] - offset_x] = 1
+            polygons.extend(
+                polygonize_tile_grid(grid, int(offset_x), int(offset_y), int(zoom))
+            )
+        number_of_windows += len(windows)
+
+    dissolved_geometry = ogr.Geometry(ogr.wkbMultiPolygon)
+    for polygon in polygons:
+        dissolved_geometry.AddGeometry(polygon)
+
+    if number_of_windows > 1:
+        # polygons at the borders of the windows share their edges
+        dissolved_geometry = ogr.ForceToMultiPolygon(dissolved_geometry.UnionCascaded())
     return dissolved_geometry
 
 
-def generate_tasking_manager_geometries(project_id: str, agg_results_filename):
+def generate_tasking_manager_geometries(
+    project_id: str,
+    agg_results_filename: str,
+    manifest: Optional[stats_manifest.StatsManifest] = None,
+):
     """
     This functions runs the workflow to create a GeoJSON file ready to be used in the
     HOT Tasking Manager.
@@ -427,6 +433,7 @@ def generate_tasking_manager_geometries(project_id: str, agg_results_filename):
     We then derive the Tasking Manager geometries, and a dissolved geometry of all
     filtered results.
     Finally, both data sets are saved into GeoJSON files.
+    The files are written using the stats manifest if given.
     """
 
     filtered_data_filename = f"{DATA_PATH}/api/yes_maybe/yes_maybe_{project_id}.geojson"
@@ -448,9 +455,17 @@ def generate_tasking_manager_geometries(project_id: str, agg_results_filename):
         tasking_manager_results = create_hot_tm_tasks(project_id, filtered_results)
 
         # save data as geojson
-        geojson_functions.create_geojson_file(
-            dissolved_filtered_results, filtered_data_filename
+        stats_manifest.write_output(
+            filtered_data_filename,
+            lambda path: geojson_functions.create_geojson_file(
+                dissolved_filtered_results, path, name=filtered_data_filename
+            ),
+            manifest,
         )
-        geojson_functions.create_geojson_file_from_dict(
-            tasking_manager_results, tasking_manager_data_filename
+        stats_manifest.write_output(
+            tasking_manager_data_filename,
+            lambda path: geojson_functions.create_geojson_file_from_dict(
+                tasking_manager_results, path, name=tasking_manager_data_filename
+            ),
+            manifest,
         )
@@ -1,8 +1,22 @@
+from typing import List, Optional
+
+import numpy as np
 import pandas as pd
 
+from mapswipe_workers.definitions import ProjectType
+from mapswipe_workers.generate_stats import agreement
+
+# number of results which are processed at once
+CHUNK_SIZE = 1000000
+
+USER_COLUMNS = ["project_id", "user_id", "username"]
+
 
 def get_agg_results_by_user_id(
-    results_df: pd.DataFrame, agg_results_df: pd.DataFrame
+    results_df: pd.DataFrame,
+    agg_results_df: pd.DataFrame,
+    categories: Optional[List[int]] = None,
+    chunk_size: int = CHUNK_SIZE,
 ) -> pd.DataFrame:
     """
     For each users we calcuate the number of total contributions (tasks)
@@ -13,50 +27,92 @@ def get_agg_results_by_user_id(
     coincide with the results of this user. E.g 0.8 means, that 80% of the
     results from other users are the same as the results for that user.
     Returns a pandas dataframe.
+
+    Results are processed in chunks of chunk_size rows.
+    The counts of the task of each result are looked up by array index
+    and summed up per user. Memory use is bounded by the number of tasks
+    and the chunk size and does not grow with a merge of results and agg results.
     """
-    raw_contributions_df = results_df.merge(
-        agg_results_df, left_on="task_id", right_on="task_id"
+    if categories is None:
+        categories = ProjectType.BUILD_AREA.result_categories
+
+    # counts per task, tasks are identified by their row in agg_results
+    counts = agg_results_df[[f"{category}_count" for category in categories]]
+    counts = counts.to_numpy(dtype=np.int32)
+    total_count = agg_results_df["total_count"].to_numpy(dtype=np.int32)
+    # the first row is used if a task id is not unique
+    task_ids = pd.Index(agg_results_df["task_id"])
+    first_rows = np.flatnonzero(~task_ids.duplicated())
+    task_index = task_ids[first_rows]
+
+    # integer codes for users and groups
+    user_codes, users = pd.factorize(
+        pd.MultiIndex.from_frame(results_df[USER_COLUMNS]), sort=True
     )
-    # compare to classifications of other users
-    # Calc number of agreeig and disagreeing results from other users.
-    raw_contributions_df.loc[
-        raw_contributions_df["result"] == 0, "agreeing_contributions"
-    ] = (raw_contributions_df["0_count"] - 1)
-    raw_contributions_df.loc[
-        raw_contributions_df["result"] == 1, "agreeing_contributions"
-    ] = (raw_contributions_df["1_count"] - 1)
-    raw_contributions_df.loc[
-        raw_contributions_df["result"] == 2, "agreeing_contributions"
-    ] = (raw_contributions_df["2_count"] - 1)
-    raw_contributions_df.loc[
-        raw_contributions_df["result"] == 3, "agreeing_contributions"
-    ] = (raw_contributions_df["3_count"] - 1)
-
-    raw_contributions_df["disagreeing_contributions"] = raw_contributions_df[
-        "total_count"
-    ] - (raw_contributions_df["agreeing_contributions"] + 1)
-
-    agg_results_by_user_id_df = raw_contributions_df.groupby(
-        ["project_id", "user_id", "username"]
-    ).agg(
-        groups_completed=pd.NamedAgg(column="group_id", aggfunc=pd.Series.nunique),
-        total_contributions=pd.NamedAgg(column="user_id", aggfunc="count"),
-        agreeing_contributions=pd.NamedAgg(
-            column="agreeing_contributions", aggfunc="sum"
-        ),
-        disagreeing_contributions=pd.NamedAgg(
-            column="disagreeing_contributions", aggfunc="sum"
-        ),
+    user_codes = user_codes.astype(np.int32)
+    group_codes, groups = pd.factorize(results_df["group_id"])
+    number_of_users = len(users)
+
+    total_contributions = np.zeros(number_of_users, dtype=np.int64)
+    agreeing_contributions = np.zeros(number_of_users)
+    disagreeing_contributions = np.zeros(number_of_users)
+    user_groups = []
+
+    for start in range(0, len(results_df), chunk_size):
+        chunk = results_df.iloc[start : start + chunk_size]
+        task_positions = task_index.get_indexer(chunk["task_id"])
+        user = user_codes[start : start + chunk_size]
+        # results without aggregated results for their task are skipped
+        valid = (task_positions >= 0) & (user >= 0)
+        task_rows = first_rows[task_positions[valid]]
+        user = user[valid]
+        category_index = (
+            pd.Index(categories).get_indexer(chunk["result"]).astype(np.int8)[valid]
+        )
+
+        # compare to classifications of other users
+        # Calc number of agreeing and disagreeing results from other users.
+        agreeing = agreement.calc_agreeing_counts(counts[task_rows], category_index)
+        disagreeing = total_count[task_rows] - (agreeing + 1)
+
+        total_contributions += np.bincount(user, minlength=number_of_users)
+        agreeing_contributions += np.bincount(
+            user, weights=np.nan_to_num(agreeing), minlength=number_of_users
+        )
+        disagreeing_contributions += np.bincount(
+            user, weights=np.nan_to_num(disagreeing), minlength=number_of_users
+        )
+        user_groups.append(
+            np.unique(
+                user.astype(np.int64) * len(groups)
+                + group_codes[start : start + chunk_size][valid]
+            )
+        )
+
+    # a user completed each group with at least one result
+    user_groups = np.unique(np.concatenate(user_groups or [np.array([], np.int64)]))
+    groups_completed = np.bincount(
+        user_groups // max(len(groups), 1), minlength=number_of_users
     )
 
     # Calc simple agreement score as share of agreeing contributions.
-    agg_results_by_user_id_df["simple_agreement_score"] = agg_results_by_user_id_df[
-        "agreeing_contributions"
-    ] / (
-        agg_results_by_user_id_df["agreeing_contributions"]
-        + agg_results_by_user_id_df["disagreeing_contributions"]
-    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        simple_agreement_score = agreeing_contributions / (
+            agreeing_contributions + disagreeing_contributions
+        )
 
-    agg_results_by_user_id_df.reset_index(inplace=True)
+    agg_results_by_user_id_df = pd.DataFrame(
+        {
+            "groups_completed": groups_completed,
+            "total_contributions": total_contributions,
+            "agreeing_contributions": agreeing_contributions,
+            "disagreeing_contributions": disagreeing_contributions,
+            "simple_agreement_score": simple_agreement_score,
+        },
+        index=users.set_names(USER_COLUMNS),
+    )
+    agg_results_by_user_id_df = agg_results_by_user_id_df[
+        agg_results_by_user_id_df["total_contributions"] > 0
+    ].reset_index()
 
     return agg_results_by_user_id_df
@@ -1,6 +1,11 @@
 """Command Line Interface for MapSwipe Workers."""
 
 import ast
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import tempfile
 import time
 from typing import List, Optional
 
@@ -8,6 +13,11 @@ import click
 import schedule as sched
 
 from mapswipe_workers import auth
+from mapswipe_workers.config import (
+    CREATION_PROCESSES,
+    GENERATE_STATS_PROCESSES,
+    GENERATE_STATS_TIME_BUDGET_MINUTES,
+)
 from mapswipe_workers.definitions import (
     CustomError,
     MessageType,
@@ -17,12 +27,18 @@ from mapswipe_workers.definitions import (
 )
 from mapswipe_workers.firebase_to_postgres import (
     archive_project,
+    compact_tasks,
     delete_project,
     transfer_results,
     update_data,
 )
 from mapswipe_workers.generate_stats import generate_stats
-from mapswipe_workers.utils import team_management, user_management
+from mapswipe_workers.utils import (
+    geometry_validation,
+    project_planner,
+    team_management,
+    user_management,
+)
 from mapswipe_workers.utils.create_directories import create_directories
 from mapswipe_workers.utils.slack_helper import (
     send_progress_notification,
@@ -50,8 +66,130 @@ def cli(verbose):
         logger.info("Logging enabled")
 
 
+def create_project(project_draft_id: str, project_draft: dict) -> None:
+    """
+    Create a single project from a project draft.
+
+    If the project can not be created the project draft is deleted
+    and a Slack message is sent.
+    """
+    fb_db = auth.firebaseDB()
+    project_draft["projectDraftId"] = project_draft_id
+    project_type = project_draft["projectType"]
+    project_name = project_draft["name"]
+    try:
+        # Create a project object using appropriate class (project type).
+        project = ProjectType(project_type).constructor(project_draft)
+        # TODO: here the project.geometry attribute is overwritten
+        #  this is super confusing since it's not a geojson anymore
+        #  but this is what we set initially,
+        #  e.g. in tile_map_service_grid/project.py
+        #  project.geometry is set to a list of wkt geometries now
+        #  this can't be handled in postgres,
+        #  postgres expects just a string not an array
+        #  validated_geometries should be called during init already
+        #  for the respective project types
+
+        project.geometry = project.validate_geometries()
+        project.create_groups()
+        project.calc_required_results()
+        # Save project and its groups and tasks to Firebase and Postgres.
+        project.save_project()
+        send_slack_message(MessageType.SUCCESS, project_name, project.projectId)
+        logger.info("Success: Project Creation ({0})".format(project_name))
+    except CustomError as e:
+        ref = fb_db.reference(f"v2/projectDrafts/{project_draft_id}")
+        ref.set({})
+
+        # check if project could be initialized
+        try:
+            project_id = project.projectId
+        except UnboundLocalError:
+            project_id = None
+
+        send_slack_message(MessageType.FAIL, project_name, project_id, str(e))
+        logger.exception("Failed: Project Creation ({0}))".format(project_name))
+        sentry.capture_exception()
+
+
+def _create_project_in_subprocess(
+    project_draft_id: str, project_draft: dict, logging_disabled: bool, processes: int
+) -> None:
+    """Entry point for creating a project in a separate process.
+
+    The geometry validation of each process uses its share of the CPUs
+    to not oversubscribe them with `processes` creation processes at a time.
+    """
+    logger.disabled = logging_disabled
+    geometry_validation.set_default_max_workers(
+        max(1, (os.cpu_count() or 1) // processes)
+    )
+    create_project(project_draft_id, project_draft)
+
+
+def create_projects_in_parallel(project_drafts: dict, processes: int) -> None:
+    """
+    Create projects in parallel with one process per project draft.
+
+    At most `processes` projects are created at the same time.
+    Each project draft is handled in its own process.
+    If a process crashes (e.g. killed because it ran out of memory)
+    only this project draft fails.
+    The project draft is deleted and a Slack message is sent
+    as it is done for project drafts which raise a CustomError.
+    """
+    # Use spawn to not share Firebase and Postgres connections with the children.
+    context = multiprocessing.get_context("spawn")
+    pending = list(project_drafts.items())
+    running = {}
+
+    while pending or running:
+        while pending and len(running) < processes:
+            project_draft_id, project_draft = pending.pop(0)
+            process = context.Process(
+                target=_create_project_in_subprocess,
+                args=(project_draft_id, project_draft, logger.disabled, processes),
+                name=f"create-project-{project_draft_id}",
+            )
+            process.start()
+            running[process.sentinel] = (process, project_draft_id, project_draft)
+            logger.info(f"{project_draft_id} - started project creation process")
+
+        finished = multiprocessing.connection.wait(list(running.keys()))
+        for sentinel in finished:
+            process, project_draft_id, project_draft = running.pop(sentinel)
+            process.join()
+            if process.exitcode == 0:
+                continue
+
+            # The process did not finish regularly.
+            # Handle the project draft in the same way as for a CustomError.
+            details = (
+                "The project creation process exited unexpectedly "
+                f"with exit code {process.exitcode}."
+            )
+            logger.warning(f"{project_draft_id} - {details}")
+            fb_db = auth.firebaseDB()
+            fb_db.reference(f"v2/projectDrafts/{project_draft_id}").set({})
+            send_slack_message(
+                MessageType.FAIL, project_draft.get("name"), project_draft_id, details
+            )
+            sentry.capture_message(f"{project_draft_id} - {details}")
+
+
 @cli.command("create-projects")
-def run_create_projects():
+@click.option(
+    "--processes",
+    "-p",
+    type=int,
+    default=CREATION_PROCESSES,
+    show_default=True,
+    help=(
+        "Number of project drafts which are processed in parallel. "
+        "With more than one process each draft is created in a separate process."
+    ),
+)
+def run_create_projects(processes: int = CREATION_PROCESSES):
     """
     Create projects from submitted project drafts.
 
@@ -68,44 +206,72 @@ def run_create_projects():
         logger.info("There are no project drafts in firebase.")
         return None
 
+    if processes > 1 and len(project_drafts) > 1:
+        create_projects_in_parallel(project_drafts, processes)
+    else:
+        for project_draft_id, project_draft in project_drafts.items():
+            create_project(project_draft_id, project_draft)
+
+
+@cli.command("plan-project")
+@click.option(
+    "--project-draft-id",
+    "-i",
+    help="Plan project draft with given id from Firebase.",
+    type=str,
+)
+@click.option(
+    "--file",
+    "-f",
+    help="Plan project draft from a JSON file.",
+    type=click.Path(exists=True),
+)
+def run_plan_project(project_draft_id, file):
+    """
+    Dry-run project creation for project drafts.
+
+    Compute number of groups and tasks and estimate Postgres rows,
+    Firebase bytes and worker memory without creating the project.
+    If neither a project draft id nor a file is given,
+    all project drafts in Firebase are planned.
+    Input geometries are written to a temporary directory only.
+    """
+    if file:
+        with open(file) as f:
+            project_draft = json.load(f)
+        project_drafts = {project_draft.get("projectDraftId", file): project_draft}
+    else:
+        fb_db = auth.firebaseDB()
+        if project_draft_id:
+            ref = fb_db.reference(f"v2/projectDrafts/{project_draft_id}")
+            project_draft = ref.get()
+            project_drafts = {project_draft_id: project_draft} if project_draft else {}
+        else:
+            ref = fb_db.reference("v2/projectDrafts/")
+            project_drafts = ref.get() or {}
+
+    if not project_drafts:
+        click.echo("There are no project drafts to plan.")
+        return None
+
+    plans = []
     for project_draft_id, project_draft in project_drafts.items():
         project_draft["projectDraftId"] = project_draft_id
-        project_type = project_draft["projectType"]
-        project_name = project_draft["name"]
         try:
-            # Create a project object using appropriate class (project type).
-            project = ProjectType(project_type).constructor(project_draft)
-            # TODO: here the project.geometry attribute is overwritten
-            #  this is super confusing since it's not a geojson anymore
-            #  but this is what we set initially,
-            #  e.g. in tile_map_service_grid/project.py
-            #  project.geometry is set to a list of wkt geometries now
-            #  this can't be handled in postgres,
-            #  postgres expects just a string not an array
-            #  validated_geometries should be called during init already
-            #  for the respective project types
-
-            project.geometry = project.validate_geometries()
-            project.create_groups()
-            project.calc_required_results()
-            # Save project and its groups and tasks to Firebase and Postgres.
-            project.save_project()
-            send_slack_message(MessageType.SUCCESS, project_name, project.projectId)
-            logger.info("Success: Project Creation ({0})".format(project_name))
-        except CustomError as e:
-            ref = fb_db.reference(f"v2/projectDrafts/{project_draft_id}")
-            ref.set({})
-
-            # check if project could be initialized
-            try:
-                project_id = project.projectId
-            except UnboundLocalError:
-                project_id = None
-
-            send_slack_message(MessageType.FAIL, project_name, project_id, str(e))
-            logger.exception("Failed: Project Creation ({0}))".format(project_name))
-            sentry.capture_exception()
-        continue
+            project = ProjectType(project_draft["projectType"]).constructor(
+                project_draft
+            )
+            with tempfile.TemporaryDirectory() as input_geometries_dir:
+                project.geometry = project.validate_geometries(input_geometries_dir)
+                plans.append(project_planner.plan_project(project))
+        except Exception as e:
+            # a single invalid draft should not stop the planning of the others
+            if not isinstance(e, CustomError):
+                e = f"{type(e).__name__}: {e}"
+            plans.append({"project_id": project_draft_id, "error": str(e)})
+            logger.exception(f"Failed: Project Planning ({project_draft_id})")
+
+    click.echo(json.dumps(plans, indent=2))
 
 
 @cli.command("create-user-groups")
@@ -207,25 +373,70 @@ def run_firebase_to_postgres(project_ids: list) -> list:
         "(You need the quotes.)"
     ),
 )
-def run_generate_stats(project_ids: list) -> None:
+@click.option(
+    "--processes",
+    "-p",
+    type=int,
+    default=GENERATE_STATS_PROCESSES,
+    show_default=True,
+    help=(
+        "Number of projects for which stats are generated in parallel. "
+        "With more than one process each project is handled in a separate process."
+    ),
+)
+@click.option(
+    "--time_budget",
+    type=int,
+    default=GENERATE_STATS_TIME_BUDGET_MINUTES,
+    show_default=True,
+    help=(
+        "Time in minutes after which no further projects with new results "
+        "are started, if no project ids are given. Default: no time budget."
+    ),
+)
+def run_generate_stats(
+    project_ids: list,
+    processes: int = GENERATE_STATS_PROCESSES,
+    time_budget: Optional[int] = GENERATE_STATS_TIME_BUDGET_MINUTES,
+) -> None:
     """
     This is the wrapper function to generate statistics for given project ids.
     We do it this way, to be able to use --verbose flag
     for the _run_generate_stats function.
     Otherwise we can't use --verbose during run function.
     """
-    _run_generate_stats(project_ids)
+    _run_generate_stats(project_ids, processes, time_budget)
 
 
-def _run_generate_stats(project_ids: list) -> None:
-    """Generate statistics for given project ids."""
-    generate_stats.generate_stats(project_ids)
+def _run_generate_stats(
+    project_ids: list,
+    processes: int = GENERATE_STATS_PROCESSES,
+    time_budget: Optional[int] = GENERATE_STATS_TIME_BUDGET_MINUTES,
+) -> None:
+    """
+    Generate statistics for given project ids.
+    Without project ids, generate statistics for projects with new results.
+    """
+    generate_stats.generate_stats(project_ids, processes, time_budget)
 
 
 @cli.command("generate-stats-all-projects")
-def run_generate_stats_all_projects() -> None:
+@click.option(
+    "--processes",
+    "-p",
+    type=int,
+    default=GENERATE_STATS_PROCESSES,
+    show_default=True,
+    help=(
+        "Number of projects for which stats are generated in parallel. "
+        "With more than one process each project is handled in a separate process."
+    ),
+)
+def run_generate_stats_all_projects(
+    processes: int = GENERATE_STATS_PROCESSES,
+) -> None:
     """Generate statistics for all projects."""
-    generate_stats.generate_stats_all_projects()
+    generate_stats.generate_stats_all_projects(processes)
 
 
 @cli.command("user-management")
@@ -465,6 +676,46 @@ def run_delete_project(project_id, project_ids):
         click.echo("Invalid input")
 
 
+@cli.command("compact-tasks")
+@click.option(
+    "--project-id",
+    "-i",
+    help="Compact tasks of project with given project id.",
+    type=str,
+)
+@click.option(
+    "--project-ids",
+    cls=PythonLiteralOption,
+    default="[]",
+    help=(
+        "Compact tasks of multiple projects. "
+        "Provide project id strings as a list: "
+        """'["project_a", "project_b"]'"""
+    ),
+)
+@click.option(
+    "--all-projects",
+    is_flag=True,
+    help="Compact tasks of all tile map service projects.",
+)
+def run_compact_tasks(project_id, project_ids, all_projects):
+    """
+    Remove geometry and urls of tile tasks in Postgres.
+
+    These are derived from the task id and the tile servers of the project
+    in the tasks_expanded view. Run VACUUM on the tasks table afterwards.
+    """
+    if all_projects:
+        project_ids = compact_tasks.get_tile_project_ids()
+    elif not project_ids and not project_id:
+        click.echo("Missing argument")
+        return None
+    elif not project_ids:
+        project_ids = [project_id]
+    count = compact_tasks.compact_tasks(project_ids)
+    click.echo(f"Compacted {count} tasks of {len(project_ids)} projects")
+
+
 @cli.command("set-tileserver-api-key")
 @click.option(
     "--project-id",
@@ -522,7 +773,12 @@ def run(context, analysis_type, schedule, time_interval):
 
     Run --create-projects, --firebase-to-postgres and --generate_stats_all_projects.
     If schedule option is set above commands will be run every 10 minutes sequentially.
+    Scheduled stats runs use a time budget derived from the time interval
+    unless GENERATE_STATS_TIME_BUDGET_MINUTES is set.
     """
+    time_budget = GENERATE_STATS_TIME_BUDGET_MINUTES
+    if schedule and time_budget is None:
+        time_budget = generate_stats.get_time_budget(time_interval)
 
     def _run():
         logger.info("start mapswipe backend workflow.")
@@ -532,7 +788,9 @@ def run(context, analysis_type, schedule, time_interval):
         context.invoke(run_create_users)
         context.invoke(run_create_user_group_membership_log)
         project_ids = context.invoke(run_firebase_to_postgres)
-        context.invoke(run_generate_stats, project_ids=project_ids)
+        context.invoke(
+            run_generate_stats, project_ids=project_ids, time_budget=time_budget
+        )
 
     def _run_creation():
         logger.info("start mapswipe backend workflow to create projects and tutorials.")
@@ -551,7 +809,7 @@ def run(context, analysis_type, schedule, time_interval):
 
     def _run_stats():
         logger.info("start mapswipe backend workflow to generate stats and files.")
-        context.invoke(run_generate_stats, project_ids=[])
+        context.invoke(run_generate_stats, project_ids=[], time_budget=time_budget)
 
     if schedule:
         if analysis_type == "all":
@@ -1,6 +1,8 @@
 import json
 import os
+import shutil
 import urllib.request
+from typing import Optional
 
 from osgeo import ogr
 
@@ -9,7 +11,12 @@ from mapswipe_workers.project_types.arbitrary_geometry import grouping_functions
 from mapswipe_workers.project_types.arbitrary_geometry.group import Group
 from mapswipe_workers.project_types.base.project import BaseProject
 from mapswipe_workers.project_types.base.tile_server import BaseTileServer
-from mapswipe_workers.utils.api_calls import geojsonToFeatureCollection, ohsome
+from mapswipe_workers.utils import geometry_validation
+from mapswipe_workers.utils.api_calls import (
+    geojsonToFeatureCollection,
+    ohsome,
+    ohsome_to_file,
+)
 
 
 class Project(BaseProject):
@@ -46,9 +53,11 @@ class Project(BaseProject):
             # write string to geom file
             ohsome_request = {"endpoint": "elements/geometry", "filter": self.filter}
 
-            result = ohsome(ohsome_request, self.geometry, properties="tags, metadata")
-            with open(raw_input_file, "w") as geom_file:
-                json.dump(result, geom_file)
+            # the response is read from the ohsome cache if possible
+            cached_response = ohsome_to_file(
+                ohsome_request, self.geometry, properties="tags, metadata"
+            )
+            shutil.copyfile(cached_response, raw_input_file)
         elif self.inputType == "TMId":
             logger.info("TMId detected")
             hot_tm_project_id = int(self.TMId)
@@ -62,16 +71,26 @@ class Project(BaseProject):
             logger.info("link detected")
             urllib.request.urlretrieve(self.geometry, raw_input_file)
 
-    def validate_geometries(self):
-        raw_input_file = (
-            f"{DATA_PATH}/" f"input_geometries/raw_input_{self.projectId}.geojson"
+    def validate_geometries(self, input_geometries_dir: Optional[str] = None):
+        """
+        Validate the input geometries and return them as WKT.
+
+        Parameters
+        ----------
+        input_geometries_dir: str
+            Directory to write the raw and valid input geometries to.
+            Default: input_geometries in the data directory.
+        """
+        if input_geometries_dir is None:
+            input_geometries_dir = f"{DATA_PATH}/input_geometries"
+        raw_input_file = os.path.join(
+            input_geometries_dir, f"raw_input_{self.projectId}.geojson"
         )
-        valid_input_file = (
-            f"{DATA_PATH}/" f"input_geometries/valid_input_{self.projectId}.geojson"
+        valid_input_file = os.path.join(
+            input_geometries_dir, f"valid_input_{self.projectId}.geojson"
         )
 
-        if not os.path.isdir("{}/input_geometries".format(DATA_PATH)):
-            os.mkdir("{}/input_geometries".format(DATA_PATH))
+        os.makedirs(input_geometries_dir, exist_ok=True)
 
         # input can be file, HOT TM projectId or link to geojson, after the call,
         # whatever the input is will be made
@@ -135,47 +154,53 @@ class Project(BaseProject):
         poly.AddGeometry(ring)
         wkt_geometry = poly.ExportToWkt()
 
-        # check if the input geometry is a valid polygon
-        for feature in layer:
-            feat_geom = feature.GetGeometryRef()
-            geom_name = feat_geom.GetGeometryName()
-            fid = feature.GetFID()
-
-            if not feat_geom.IsValid():
-                layer.DeleteFeature(fid)
-                logger.warning(
-                    f"{self.projectId}"
-                    f" - check_input_geometries - "
-                    f"deleted invalid feature {fid}"
-                )
-
-            # we accept only POLYGON or MULTIPOLYGON geometries
-            elif geom_name not in ["POLYGON", "MULTIPOLYGON"]:
-                layer.DeleteFeature(fid)
-                logger.warning(
-                    f"{self.projectId}"
-                    f" - check_input_geometries - "
-                    f"deleted non polygon feature {fid}"
-                )
-
-            else:
-                # Create output Feature
-                outFeature = ogr.Feature(outLayerDefn)
-                # Add field values from input Layer
-                for i in range(0, outLayerDefn.GetFieldCount()):
-                    outFeature.SetField(
-                        outLayerDefn.GetFieldDefn(i).GetNameRef(), feature.GetField(i)
-                    )
-                outFeature.SetGeometry(feat_geom)
-                outLayer.CreateFeature(outFeature)
-                outFeature = None
+        # check validity and geometry type of all input geometries at once
+        # this runs in parallel for large inputs, e.g. building footprints
+        validation = geometry_validation.validate_geometries(
+            geometry_validation.read_layer_geometries(layer)
+        )
+        keep_features = validation["is_valid"] & validation["is_polygon"]
+
+        invalid_count = int((~validation["is_valid"]).sum())
+        if invalid_count > 0:
+            logger.warning(
+                f"{self.projectId}"
+                f" - check_input_geometries - "
+                f"deleted {invalid_count} invalid features"
+            )
+
+        non_polygon_count = int(
+            (validation["is_valid"] & ~validation["is_polygon"]).sum()
+        )
+        if non_polygon_count > 0:
+            logger.warning(
+                f"{self.projectId}"
+                f" - check_input_geometries - "
+                f"deleted {non_polygon_count} non polygon features"
+            )
 
         # check if layer is empty
-        if layer.GetFeatureCount() < 1:
+        if not keep_features.any():
             err = "no geometries left after checking validity and geometry type."
             logger.warning(f"{self.projectId} - check_input_geometry - {err}")
             raise Exception(err)
 
+        for i, feature in enumerate(layer):
+            if not keep_features[i]:
+                continue
+            # Create output Feature
+            outFeature = ogr.Feature(outLayerDefn)
+            # Add field values from input Layer
+            for j in range(0, outLayerDefn.GetFieldCount()):
+                outFeature.SetField(
+                    outLayerDefn.GetFieldDefn(j).GetNameRef(), feature.GetField(j)
+                )
+            outFeature.SetGeometry(
+                ogr.CreateGeometryFromWkb(validation["geometries"][i])
+            )
+            outLayer.CreateFeature(outFeature)
+            outFeature = None
+
         del datasource
         del outDataSource
         del layer
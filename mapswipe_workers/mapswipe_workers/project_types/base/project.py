@@ -346,9 +346,12 @@ class BaseProject(metaclass=ABCMeta):
             project["requestingOrganisation"],
         ]
 
-        query_recreate_raw_groups = """
-            DROP TABLE IF EXISTS raw_groups CASCADE;
-            CREATE TABLE raw_groups (
+        # The staging tables are temporary tables which only exist
+        # for the session and are dropped at the end of the transaction.
+        # Hence, several projects can be created at the same time
+        # and no permanent tables are created and dropped (less WAL).
+        query_create_raw_groups = """
+            CREATE TEMP TABLE raw_groups (
               project_id varchar,
               group_id varchar,
               number_of_tasks int,
@@ -356,7 +359,7 @@ class BaseProject(metaclass=ABCMeta):
               required_count int,
               progress int,
               project_type_specifics json
-            );
+            ) ON COMMIT DROP;
             """
 
         query_insert_raw_groups = """
@@ -370,30 +373,35 @@ class BaseProject(metaclass=ABCMeta):
               progress,
               project_type_specifics
             FROM raw_groups;
-            DROP TABLE IF EXISTS raw_groups CASCADE;
             """
 
-        query_recreate_raw_tasks = """
-            DROP TABLE IF EXISTS raw_tasks CASCADE;
-            CREATE TABLE raw_tasks (
+        query_create_raw_tasks = """
+            CREATE TEMP TABLE raw_tasks (
                 project_id varchar,
                 group_id varchar,
                 task_id varchar,
                 geom varchar,
                 project_type_specifics json
-            );
+            ) ON COMMIT DROP;
             """
 
+        # Tasks in compact storage have no geometry and project type specifics.
+        # These are derived in the tasks_expanded view.
         query_insert_raw_tasks = """
             INSERT INTO tasks
             SELECT
               project_id,
               group_id,
               task_id,
-              ST_Force2D(ST_Multi(ST_GeomFromText(geom, 4326))),
-              project_type_specifics
+              CASE
+                WHEN %(compact)s THEN NULL
+                ELSE ST_Force2D(ST_Multi(ST_GeomFromText(geom, 4326)))
+              END,
+              CASE
+                WHEN %(compact)s THEN NULL
+                ELSE project_type_specifics
+              END
             FROM raw_tasks;
-            DROP TABLE IF EXISTS raw_tasks CASCADE;
             """
 
         groups_txt_filename = self.create_groups_txt_file(groups)
@@ -423,8 +431,8 @@ class BaseProject(metaclass=ABCMeta):
             p_con = auth.postgresDB()
             p_con._db_cur = p_con._db_connection.cursor()
             p_con._db_cur.execute(query_insert_project, data_project)
-            p_con._db_cur.execute(query_recreate_raw_groups, None)
-            p_con._db_cur.execute(query_recreate_raw_tasks, None)
+            p_con._db_cur.execute(query_create_raw_groups, None)
+            p_con._db_cur.execute(query_create_raw_tasks, None)
             with open(groups_txt_filename, "r") as groups_file:
                 p_con._db_cur.copy_from(
                     groups_file, "raw_groups", columns=groups_columns
@@ -432,7 +440,18 @@ class BaseProject(metaclass=ABCMeta):
             with open(tasks_txt_filename, "r") as tasks_file:
                 p_con._db_cur.copy_from(tasks_file, "raw_tasks", columns=tasks_columns)
             p_con._db_cur.execute(query_insert_raw_groups, None)
-            p_con._db_cur.execute(query_insert_raw_tasks, None)
+            p_con._db_cur.execute(
+                query_insert_raw_tasks, {"compact": self.has_compact_tasks()}
+            )
+            if self.has_lazy_tasks():
+                lazy_tasks_query = self.get_lazy_tasks_query()
+                if lazy_tasks_query is None:
+                    raise CustomError(
+                        f"{self.projectId} - projects with lazy tasks "
+                        "need to provide a lazy tasks query"
+                    )
+                query_insert_lazy_tasks, data_lazy_tasks = lazy_tasks_query
+                p_con._db_cur.execute(query_insert_lazy_tasks, data_lazy_tasks)
             p_con._db_connection.commit()
             p_con._db_cur.close()
         except Exception:
@@ -647,6 +666,31 @@ class BaseProject(metaclass=ABCMeta):
             f"from postgres"
         )
 
+    def has_lazy_tasks(self):
+        """
+        Check if tasks are derived from the groups instead of created as objects.
+
+        Tasks of such projects are not created in Python.
+        The tasks table in Postgres is populated from the groups
+        with the query returned by get_lazy_tasks_query().
+        """
+        return False
+
+    def has_compact_tasks(self):
+        """
+        Check if tasks are stored without geometry and project type specifics.
+
+        This is only possible for tasks which can be derived from the task id.
+        """
+        return False
+
+    def get_lazy_tasks_query(self):
+        """
+        Get query and data to insert the tasks derived from the raw_groups.
+        Only projects with lazy tasks provide a query.
+        """
+        return None
+
     def calc_required_results(self):
         for group in self.groups:
             group.requiredCount = self.verificationNumber
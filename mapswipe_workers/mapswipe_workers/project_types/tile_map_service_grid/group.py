@@ -33,6 +33,14 @@ class Group(BaseGroup):
         self.yMin = _slice["yMin"]
 
     def create_tasks(self, project):
+        if project.has_lazy_tasks():
+            # Tasks are derived from the tile range in Postgres and the app.
+            # Only the number of tasks is needed.
+            self.numberOfTasks = (int(self.xMax) - int(self.xMin) + 1) * (
+                int(self.yMax) - int(self.yMin) + 1
+            )
+            return
+
         for TileX in range(int(self.xMin), int(self.xMax) + 1):
             for TileY in range(int(self.yMin), int(self.yMax) + 1):
                 task = Task(self, project, TileX, TileY)
@@ -1,8 +1,11 @@
 import json
 import os
+from typing import Optional
 
-from osgeo import ogr, osr
+import numpy as np
+from osgeo import ogr
 
+from mapswipe_workers.config import COMPACT_TILE_TASKS
 from mapswipe_workers.definitions import (
     DATA_PATH,
     MAX_INPUT_GEOMETRIES,
@@ -13,6 +16,7 @@ from mapswipe_workers.definitions import (
 from mapswipe_workers.project_types.base.project import BaseProject
 from mapswipe_workers.project_types.base.tile_server import BaseTileServer
 from mapswipe_workers.project_types.tile_map_service_grid.group import Group
+from mapswipe_workers.utils import geometry_validation
 from mapswipe_workers.utils import tile_grouping_functions as grouping_functions
 
 
@@ -32,13 +36,23 @@ class Project(BaseProject):
         ]:
             self.tileServerB = vars(BaseTileServer(project_draft["tileServerB"]))
 
-    def validate_geometries(self):
-        raw_input_file = (
-            f"{DATA_PATH}/input_geometries/" f"raw_input_{self.projectId}.geojson"
+    def validate_geometries(self, input_geometries_dir: Optional[str] = None):
+        """
+        Validate the input geometries and return them as WKT.
+
+        Parameters
+        ----------
+        input_geometries_dir: str
+            Directory to write the input geometries to.
+            Default: input_geometries in the data directory.
+        """
+        if input_geometries_dir is None:
+            input_geometries_dir = f"{DATA_PATH}/input_geometries"
+        raw_input_file = os.path.join(
+            input_geometries_dir, f"raw_input_{self.projectId}.geojson"
         )
         # check if a 'data' folder exists and create one if not
-        if not os.path.isdir("{}/input_geometries".format(DATA_PATH)):
-            os.mkdir("{}/input_geometries".format(DATA_PATH))
+        os.makedirs(input_geometries_dir, exist_ok=True)
 
         # write string to geom file
         with open(raw_input_file, "w") as geom_file:
@@ -85,67 +99,67 @@ class Project(BaseProject):
                 "This can reduce the number of input geometries. "
             )
 
-        project_area = 0
+        # check all input geometries at once
+        # and compute the project area in Mollweide projection (EPSG Code 54009)
+        wkb_geometries = geometry_validation.read_layer_geometries(layer)
+        if None in wkb_geometries:
+            logger.warning(
+                f"{self.projectId}"
+                f" - validate geometry - "
+                f"feature geometry is not defined. "
+            )
+            raise CustomError(
+                "At least one feature geometry is not defined."
+                "Check in your input file if all geometries are defined "
+                "and no NULL geometries exist. "
+            )
+        validation = geometry_validation.validate_geometries(wkb_geometries)
+
+        invalid_indices = np.flatnonzero(~validation["is_valid"])
+        if len(invalid_indices) > 0:
+            geom_name = ogr.CreateGeometryFromWkb(
+                wkb_geometries[invalid_indices[0]]
+            ).GetGeometryName()
+            logger.warning(
+                f"{self.projectId}"
+                f" - validate geometry - "
+                f"Geometry is not valid: {geom_name}. "
+                f"Tested with IsValid() ogr method. "
+                f"Probably self-intersections."
+            )
+            raise CustomError(f"Geometry is not valid: {geom_name}. ")
+
+        # we accept only POLYGON or MULTIPOLYGON geometries
+        non_polygon_indices = np.flatnonzero(~validation["is_polygon"])
+        if len(non_polygon_indices) > 0:
+            geom_name = ogr.CreateGeometryFromWkb(
+                wkb_geometries[non_polygon_indices[0]]
+            ).GetGeometryName()
+            logger.warning(
+                f"{self.projectId}"
+                f" - validate geometry - "
+                f"Invalid geometry type: {geom_name}. "
+                f'Please provide "POLYGON" or "MULTIPOLYGON"'
+            )
+            raise CustomError(
+                f"Invalid geometry type: {geom_name}. "
+                "Make sure that all features in your dataset"
+                "are of type POLYGON or MULTIPOLYGON. "
+            )
+
+        # add geometries to geometry collection
         geometry_collection = ogr.Geometry(ogr.wkbMultiPolygon)
-        # check if the input geometry is a valid polygon
-        for feature in layer:
-
-            try:
-                feat_geom = feature.GetGeometryRef()
-                geom_name = feat_geom.GetGeometryName()
-            except AttributeError:
-                logger.warning(
-                    f"{self.projectId}"
-                    f" - validate geometry - "
-                    f"feature geometry is not defined. "
-                )
-                raise CustomError(
-                    "At least one feature geometry is not defined."
-                    "Check in your input file if all geometries are defined "
-                    "and no NULL geometries exist. "
-                )
-            # add geometry to geometry collection
-            if geom_name == "MULTIPOLYGON":
+        for wkb in wkb_geometries:
+            feat_geom = ogr.CreateGeometryFromWkb(wkb)
+            if feat_geom.GetGeometryName() == "MULTIPOLYGON":
                 for singlepart_polygon in feat_geom:
                     geometry_collection.AddGeometry(singlepart_polygon)
-            if geom_name == "POLYGON":
+            else:
                 geometry_collection.AddGeometry(feat_geom)
-            if not feat_geom.IsValid():
-                logger.warning(
-                    f"{self.projectId}"
-                    f" - validate geometry - "
-                    f"Geometry is not valid: {geom_name}. "
-                    f"Tested with IsValid() ogr method. "
-                    f"Probably self-intersections."
-                )
-                raise CustomError(f"Geometry is not valid: {geom_name}. ")
-
-            # we accept only POLYGON or MULTIPOLYGON geometries
-            if geom_name != "POLYGON" and geom_name != "MULTIPOLYGON":
-                logger.warning(
-                    f"{self.projectId}"
-                    f" - validate geometry - "
-                    f"Invalid geometry type: {geom_name}. "
-                    f'Please provide "POLYGON" or "MULTIPOLYGON"'
-                )
-                raise CustomError(
-                    f"Invalid geometry type: {geom_name}. "
-                    "Make sure that all features in your dataset"
-                    "are of type POLYGON or MULTIPOLYGON. "
-                )
-
-            # check size of project make sure its smaller than  5,000 sqkm
-            # for doing this we transform the geometry
-            # into Mollweide projection (EPSG Code 54009)
-            source = feat_geom.GetSpatialReference()
-            target = osr.SpatialReference()
-            target.ImportFromProj4(
-                "+proj=moll +lon_0=0 +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"
-            )
 
-            transform = osr.CoordinateTransformation(source, target)
-            feat_geom.Transform(transform)
-            project_area = +feat_geom.GetArea() / 1000000
+        # check size of project make sure its smaller than  5,000 sqkm
+        # the area of all features is summed up
+        project_area = validation["total_area_sqkm"]
 
         # max zoom level is 22
         if self.zoomLevel > 22:
@@ -184,6 +198,70 @@ class Project(BaseProject):
 
         return wkt_geometry_collection
 
+    def has_lazy_tasks(self):
+        """
+        Build area and completeness projects have no tasks in Firebase.
+        Their tasks are generated in Postgres from the tile ranges of the groups.
+        """
+        return self.projectType in [
+            ProjectType.BUILD_AREA.value,
+            ProjectType.COMPLETENESS.value,
+        ]
+
+    def has_compact_tasks(self):
+        """
+        Tile tasks are derived from the task id (z-x-y) and the tile servers.
+        In compact storage geometry and urls are not stored in Postgres.
+        """
+        return COMPACT_TILE_TASKS
+
+    def get_lazy_tasks_query(self):
+        """
+        Get query and data to insert one task per tile of each group.
+
+        The tasks are generated set-based from the tile range of the groups
+        and have the same attributes as tasks created by Task objects.
+        """
+        query = """
+            INSERT INTO tasks
+            SELECT
+              g.project_id,
+              g.group_id,
+              concat_ws('-', %(zoom)s, x, y),
+              CASE
+                WHEN %(compact)s THEN NULL
+                ELSE ST_Multi(tile_to_geometry(%(zoom)s, x, y))
+              END,
+              CASE
+                WHEN %(compact)s THEN NULL
+                ELSE json_strip_nulls(
+                  json_build_object(
+                    'taskX', x::varchar,
+                    'taskY', y::varchar,
+                    'url', tile_to_url(%(zoom)s, x, y, %(tile_server)s::json),
+                    'urlB', tile_to_url(%(zoom)s, x, y, %(tile_server_b)s::json)
+                  )
+                )
+              END
+            FROM raw_groups g
+            CROSS JOIN LATERAL generate_series(
+              (g.project_type_specifics->>'xMin')::int,
+              (g.project_type_specifics->>'xMax')::int
+            ) x
+            CROSS JOIN LATERAL generate_series(
+              (g.project_type_specifics->>'yMin')::int,
+              (g.project_type_specifics->>'yMax')::int
+            ) y;
+            """
+        tile_server_b = getattr(self, "tileServerB", None)
+        data = {
+            "compact": self.has_compact_tasks(),
+            "zoom": self.zoomLevel,
+            "tile_server": json.dumps(self.tileServer),
+            "tile_server_b": json.dumps(tile_server_b) if tile_server_b else None,
+        }
+        return query, data
+
     def create_groups(self):
         """
         The function to create groups from the project extent
@@ -1,3 +1,8 @@
+import concurrent.futures
+import functools
+import json
+import os
+from typing import Callable, Dict, List
 from xml.etree import ElementTree
 
 import requests
@@ -5,6 +10,7 @@ from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
 from mapswipe_workers.definitions import (
+    CHANGESET_API_MAX_WORKERS,
     OHSOME_API_LINK,
     OSM_API_LINK,
     OSMCHA_API_KEY,
@@ -12,6 +18,8 @@ from mapswipe_workers.definitions import (
     CustomError,
     logger,
 )
+from mapswipe_workers.utils import ohsome_cache
+from mapswipe_workers.utils.changeset_cache import ChangesetCache
 
 
 def remove_troublesome_chars(string: str):
@@ -24,16 +32,28 @@ def remove_troublesome_chars(string: str):
     return string
 
 
+@functools.lru_cache(maxsize=None)
+def get_session(retries: int = 3) -> requests.Session:
+    """Get a session which is shared by all requests of this process.
+
+    Connections are kept alive and reused by concurrent requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        max_retries=Retry(total=retries), pool_maxsize=CHANGESET_API_MAX_WORKERS
+    )
+    session.mount("https://", adapter)
+    return session
+
+
 def retry_get(url, retries=3, timeout=4, to_osmcha: bool = False):
     """Retry a query for a variable amount of tries."""
-    retry = Retry(total=retries)
-    with requests.Session() as session:
-        session.mount("https://", HTTPAdapter(max_retries=retry))
-        if to_osmcha:
-            headers = {"Authorization": f"Token {OSMCHA_API_KEY}"}
-            return session.get(url, timeout=timeout, headers=headers)
-        else:
-            return session.get(url, timeout=timeout)
+    session = get_session(retries)
+    if to_osmcha:
+        headers = {"Authorization": f"Token {OSMCHA_API_KEY}"}
+        return session.get(url, timeout=timeout, headers=headers)
+    else:
+        return session.get(url, timeout=timeout)
 
 
 def geojsonToFeatureCollection(geojson: dict) -> dict:
@@ -111,6 +131,26 @@ def query_osm(changeset_ids: list, changeset_results):
     return changeset_results
 
 
+def query_changesets(
+    query_function: Callable, changeset_ids: List[int], batch_size: int
+) -> Dict[int, dict]:
+    """Query changesets in batches with concurrent requests.
+
+    The query_function is query_osmcha or query_osm.
+    """
+    chunk_list = chunks(changeset_ids, batch_size)
+    changeset_results = {}
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=CHANGESET_API_MAX_WORKERS
+    ) as executor:
+        futures = [executor.submit(query_function, subset, {}) for subset in chunk_list]
+        for i, future in enumerate(concurrent.futures.as_completed(futures)):
+            changeset_results.update(future.result())
+            progress = round(100 * ((i + 1) / len(chunk_list)), 1)
+            logger.info(f"finished query {i+1}/{len(chunk_list)}, {progress}")
+    return changeset_results
+
+
 def remove_noise_and_add_user_info(json: dict) -> dict:
     """Delete unwanted information from properties."""
     logger.info("starting filtering and adding extra info")
@@ -138,29 +178,28 @@ def remove_noise_and_add_user_info(json: dict) -> dict:
         changeset_results[new_properties["changesetId"]] = None
         feature["properties"] = new_properties
 
-    # add info
-    len_osm = len(changeset_results.keys())
-    batches = int(len(changeset_results.keys()) / batch_size) + 1
-    logger.info(
-        f"""{len_osm} changesets will be queried in roughly {batches} batches from osmCHA"""  # noqa E501
-    )
+    # add info, changesets are taken from the cache if possible
+    with ChangesetCache() as cache:
+        changeset_results.update(cache.get_many(changeset_results.keys()))
+        missing_ids = [i for i, v in changeset_results.items() if v is None]
+        logger.info(
+            f"{len(changeset_results)} changesets, "
+            f"{len(missing_ids)} will be queried from osmCHA"
+        )
+        queried_changesets = query_changesets(query_osmcha, missing_ids, batch_size)
+        changeset_results.update(queried_changesets)
 
-    chunk_list = chunks(list(changeset_results.keys()), batch_size)
-    for i, subset in enumerate(chunk_list):
-        changeset_results = query_osmcha(subset, changeset_results)
-        progress = round(100 * ((i + 1) / len(chunk_list)), 1)
-        logger.info(f"finished query {i+1}/{len(chunk_list)}, {progress}")
-
-    missing_ids = [i for i, v in changeset_results.items() if v is None]
-    chunk_list = chunks(missing_ids, batch_size)
-    batches = int(len(missing_ids) / batch_size) + 1
-    logger.info(
-        f"""{len(missing_ids)} changesets where missing from osmCHA and are now queried via osmAPI in {batches} batches"""  # noqa E501
-    )
-    for i, subset in enumerate(chunk_list):
-        changeset_results = query_osm(subset, changeset_results)
-        progress = round(100 * ((i + 1) / len(chunk_list)), 1)
-        logger.info(f"finished query {i+1}/{len(chunk_list)}, {progress}")
+        missing_ids = [i for i, v in changeset_results.items() if v is None]
+        logger.info(
+            f"{len(missing_ids)} changesets where missing from osmCHA "
+            f"and are now queried via osmAPI"
+        )
+        queried_changesets.update(query_changesets(query_osm, missing_ids, batch_size))
+        changeset_results.update(queried_changesets)
+
+        cache.put_many(queried_changesets)
+        cache.purge_expired()
+        cache.log_metrics()
 
     for feature in json["features"]:
         changeset = changeset_results[int(feature["properties"]["changesetId"])]
@@ -177,27 +216,55 @@ def remove_noise_and_add_user_info(json: dict) -> dict:
     return json
 
 
-def ohsome(request: dict, area: str, properties=None) -> dict:
-    """Request data from Ohsome API."""
+def ohsome_to_file(request: dict, area: str, properties=None) -> str:
+    """Request data from Ohsome API and get the path of the (cached) response.
+
+    The response is streamed to disk. Responses with properties
+    are stored after removing noise and adding the changeset information.
+    """
+    key = ohsome_cache.get_cache_key(
+        request["endpoint"], area, request["filter"], properties
+    )
+    cached_response = ohsome_cache.get_cached_response(key)
+    if cached_response:
+        return cached_response
+
     url = OHSOME_API_LINK + request["endpoint"]
     data = {"bpolys": area, "filter": request["filter"]}
     if properties:
         data["properties"] = properties
     logger.info("Target: " + url)
     logger.info("Filter: " + request["filter"])
-    response = requests.post(url, data=data)
-    if response.status_code != 200:
-        err = f"ohsome request failed: {response.status_code}"
-        logger.warning(
-            f"{err} - check for errors in filter or geometries - {request['filter']}"
-        )
-        logger.warning(response.json())
-        raise CustomError(err)
-    else:
-        logger.info("Query succesfull.")
+    with requests.post(url, data=data, stream=True) as response:
+        if response.status_code != 200:
+            err = f"ohsome request failed: {response.status_code}"
+            logger.warning(
+                f"{err} - check for errors in filter or geometries - "
+                f"{request['filter']}"
+            )
+            logger.warning(response.json())
+            raise CustomError(err)
+
+        temporary_file = ohsome_cache.create_temporary_file()
+        try:
+            with open(temporary_file, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+            logger.info("Query succesfull.")
+
+            if properties:
+                with open(temporary_file) as f:
+                    result = remove_noise_and_add_user_info(json.load(f))
+                with open(temporary_file, "w") as f:
+                    json.dump(result, f)
+        except BaseException:
+            os.remove(temporary_file)
+            raise
+
+    return ohsome_cache.add_to_cache(key, temporary_file)
 
-    response = response.json()
 
-    if properties:
-        response = remove_noise_and_add_user_info(response)
-    return response
+def ohsome(request: dict, area: str, properties=None) -> dict:
+    """Request data from Ohsome API."""
+    with open(ohsome_to_file(request, area, properties)) as f:
+        return json.load(f)
@@ -0,0 +1,118 @@
+"""Persistent cache for changeset information queried from OSMCha and OSM API.
+
+Neighbouring footprint projects share most of their changesets.
+The username, userid, comment and editor of a changeset are stored
+in a SQLite database in the data directory and are reused until they expire.
+"""
+
+import json
+import sqlite3
+import time
+from typing import Dict, Iterable
+
+from mapswipe_workers.definitions import (
+    CHANGESET_CACHE_PATH,
+    CHANGESET_CACHE_TTL,
+    logger,
+)
+
+# SQLite limits the number of variables in a single query
+QUERY_BATCH_SIZE = 500
+
+
+class ChangesetCache:
+    """
+    SQLite cache of changeset information with a time to live.
+
+    Attributes
+    ----------
+    hits: int
+        Number of changesets found in the cache
+    misses: int
+        Number of changesets not found in the cache (including expired)
+    expired: int
+        Number of changesets found in the cache but expired
+    """
+
+    def __init__(
+        self, path: str = CHANGESET_CACHE_PATH, ttl: int = CHANGESET_CACHE_TTL
+    ):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        # several projects can be created at the same time in different processes
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS changesets (
+              changeset_id INTEGER PRIMARY KEY,
+              data TEXT NOT NULL,
+              cached_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def get_many(self, changeset_ids: Iterable[int]) -> Dict[int, dict]:
+        """Get the cached information of changesets which are not expired."""
+        changeset_ids = [int(i) for i in changeset_ids]
+        min_cached_at = time.time() - self.ttl
+        found = {}
+        for i in range(0, len(changeset_ids), QUERY_BATCH_SIZE):
+            batch = changeset_ids[i : i + QUERY_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._connection.execute(
+                "SELECT changeset_id, data, cached_at FROM changesets "
+                f"WHERE changeset_id IN ({placeholders})",
+                batch,
+            )
+            for changeset_id, data, cached_at in rows:
+                if cached_at < min_cached_at:
+                    self.expired += 1
+                else:
+                    found[changeset_id] = json.loads(data)
+
+        self.hits += len(found)
+        self.misses += len(set(changeset_ids)) - len(found)
+        return found
+
+    def put_many(self, changesets: Dict[int, dict]) -> None:
+        """Add or update the information of changesets."""
+        cached_at = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO changesets VALUES (?, ?, ?)",
+                [
+                    (int(changeset_id), json.dumps(data), cached_at)
+                    for changeset_id, data in changesets.items()
+                    if data is not None
+                ],
+            )
+
+    def purge_expired(self) -> int:
+        """Delete expired changesets and return the number of deleted rows."""
+        with self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM changesets WHERE cached_at < ?",
+                (time.time() - self.ttl,),
+            )
+        return cursor.rowcount
+
+    def log_metrics(self) -> None:
+        requested = self.hits + self.misses
+        hit_rate = round(100 * self.hits / requested, 1) if requested else 0
+        logger.info(
+            f"changeset cache: {self.hits} hits, {self.misses} misses "
+            f"({self.expired} expired), hit rate {hit_rate}%"
+        )
@@ -11,6 +11,7 @@ def create_directories() -> None:
         "/api/groups",
         "/api/history",
         "/api/hot_tm",
+        "/api/manifest",
         "/api/project_geometries",
         "/api/projects",
         "/api/results",
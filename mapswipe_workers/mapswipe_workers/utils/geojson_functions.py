@@ -1,289 +1,256 @@
 import gzip
 import json
 import os
-import shutil
-import subprocess
 import tempfile
+from typing import Iterable, Optional, Union
 
+import pandas as pd
 from osgeo import ogr, osr
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
 
 from mapswipe_workers.definitions import logger
+from mapswipe_workers.utils import tile_functions
 
+# properties which are never cast to numbers
+STRING_PROPERTIES = ["project_id", "name", "project_details", "task_id", "group_id"]
 
-def gzipped_csv_to_gzipped_geojson(
-    filename: str, geometry_field: str = "geom", add_metadata: bool = False
-):
-    """Convert gzipped csv file to gzipped GeoJSON.
+METADATA = {"usage": "This data can only be used for editing in OpenStreetMap."}
 
-    First the gzipped files are unzipped and stored in temporary csv and geojson files.
-    Then the unzipped csv file is converted into a geojson file with ogr2ogr.
-    Last, the generated geojson file is again compressed using gzip.
-    """
-    # generate temporary files which will be automatically deleted at the end
-    tmp_csv_file = os.path.join(tempfile._get_default_tempdir(), "tmp.csv")
-    tmp_geojson_file = os.path.join(tempfile._get_default_tempdir(), "tmp.geojson")
 
-    outfile = filename.replace(".csv", f"_{geometry_field}.geojson")
+def wkt_to_geojson_geometry(wkt) -> str:
+    """Convert a WKT geometry into a GeoJSON geometry. Return null if not valid."""
+    if not isinstance(wkt, str) or wkt == "":
+        return "null"
+    geom = ogr.CreateGeometryFromWkt(wkt)
+    if geom is None:
+        return "null"
+    return geom.ExportToJson()
 
-    # uncompress content of zipped csv file and save to csv file
-    with gzip.open(filename, "rb") as f_in:
-        with open(tmp_csv_file, "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
-
-    # use ogr2ogr to transform csv file into geojson file
-    # TODO: remove geom column from normal attributes in sql query
-    subprocess.run(
-        [
-            "ogr2ogr",
-            "-f",
-            "GeoJSON",
-            tmp_geojson_file,
-            tmp_csv_file,
-            "-sql",
-            f'SELECT *, CAST({geometry_field} as geometry) FROM "tmp"',  # noqa E501
-        ],
-        check=True,
-    )
 
-    if add_metadata:
-        add_metadata_to_geojson(tmp_geojson_file)
+def to_number_or_string(value):
+    """Cast a value to float if possible, otherwise return it as string."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
 
-    cast_datatypes_for_geojson(tmp_geojson_file)
-
-    # compress geojson file with gzip
-    with open(tmp_geojson_file, "r") as f:
-        json_data = json.load(f)
-
-    with gzip.open(outfile, "wt") as fout:
-        json.dump(json_data, fout)
-
-    logger.info(f"converted {filename} to {outfile} with ogr2ogr.")
 
+def get_property_values(column: pd.Series) -> list:
+    """
+    Get the values of a column as they are written to the GeoJSON properties.
 
-def csv_to_geojson(filename: str, geometry_field: str = "geom"):
+    Values of the string properties (e.g. ids) are written as strings.
+    All other values are cast to float if possible.
+    Missing values and empty strings are None and are not written.
     """
-    Use ogr2ogr to convert csv file to GeoJSON
+    missing = column.isna().to_numpy()
+    if column.name in STRING_PROPERTIES:
+        values = column.astype(str).tolist()
+    elif is_bool_dtype(column):
+        values = column.astype(str).tolist()
+    elif is_numeric_dtype(column):
+        values = column.astype(float).tolist()
+    else:
+        values = [
+            None if value == "" else to_number_or_string(value)
+            for value in column.tolist()
+        ]
+    return [None if is_missing else v for v, is_missing in zip(values, missing)]
+
+
+def write_geojson(
+    frames: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    outfile: str,
+    geometry_field: str = "geom",
+    add_metadata: bool = False,
+    index_label: Optional[str] = None,
+    geometry_format: str = "wkt",
+) -> None:
+    """Write dataframes with a WKT geometry column as (gzipped) GeoJSON file.
+
+    Features are written one after another without holding the GeoJSON in memory.
+    Several dataframes (e.g. record batches) can be given and are written
+    as a single feature collection.
+    The file is gzipped if the filename ends with ".gz".
+    It is written to a temporary file first and then moved to the outfile.
+
+    Parameters
+    ----------
+    frames: pd.DataFrame or iterable of pd.DataFrame
+    outfile: str
+    geometry_field: str
+        Column with the geometry.
+    add_metadata: bool
+        Add a metadata attribute about intended data usage.
+    index_label: str
+        Write the index as property with this name.
+    geometry_format: str
+        Format of the geometry column, either "wkt" or "geojson".
+        GeoJSON geometries are written as they are, e.g. if they have been
+        converted before.
     """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
 
-    outfile = filename.replace(".csv", f"_{geometry_field}.geojson")
-    # need to remove file here because ogr2ogr can't overwrite when choosing GeoJSON
-    if os.path.isfile(outfile):
-        os.remove(outfile)
-    filename_without_path = filename.split("/")[-1].replace(".csv", "")
-    # TODO: remove geom column from normal attributes in sql query
-    subprocess.run(
-        [
-            "ogr2ogr",
-            "-f",
-            "GeoJSON",
-            outfile,
-            filename,
-            "-sql",
-            f'SELECT *, CAST({geometry_field} as geometry) FROM "{filename_without_path}"',  # noqa E501
-        ],
-        check=True,
+    name = os.path.basename(outfile).split(".")[0]
+    file_descriptor, temporary_file = tempfile.mkstemp(
+        suffix=".tmp", dir=os.path.dirname(outfile) or None
     )
-    logger.info(f"converted {filename} to {outfile}.")
+    os.close(file_descriptor)
+    if outfile.endswith(".gz"):
+        f = gzip.open(temporary_file, "wt")
+    else:
+        f = open(temporary_file, "w")
+
+    number_of_features = 0
+    with f:
+        f.write(f'{{"type": "FeatureCollection", "name": {json.dumps(name)}, ')
+        f.write('"features": [')
+        for df in frames:
+            if index_label is not None:
+                df = df.reset_index().rename(columns={"index": index_label})
+            # the geometry is not written as property
+            property_names = [
+                column
+                for column in df.columns
+                if column not in [geometry_field, "geom"]
+            ]
+            property_values = [get_property_values(df[c]) for c in property_names]
+            if geometry_format == "geojson":
+                geometries = df[geometry_field].tolist()
+            else:
+                geometries = [
+                    wkt_to_geojson_geometry(wkt) for wkt in df[geometry_field]
+                ]
+
+            for i, geometry in enumerate(geometries):
+                properties = {
+                    property_name: values[i]
+                    for property_name, values in zip(property_names, property_values)
+                    if values[i] is not None
+                }
+                if number_of_features > 0:
+                    f.write(", ")
+                f.write(
+                    '{"type": "Feature", '
+                    f'"properties": {json.dumps(properties)}, '
+                    f'"geometry": {geometry}}}'
+                )
+                number_of_features += 1
+        f.write("]")
+        if add_metadata:
+            f.write(f', "metadata": {json.dumps(METADATA)}')
+        f.write("}")
+
+    # mkstemp creates files readable by the owner only, nginx needs to read them
+    os.chmod(temporary_file, 0o644)
+    os.replace(temporary_file, outfile)
+    if number_of_features == 0:
+        logger.info(f"there are no features for this file: {outfile}")
+    logger.info(f"wrote {number_of_features} features to {outfile}.")
 
-    cast_datatypes_for_geojson(outfile)
 
+def gzipped_csv_to_gzipped_geojson(
+    filename: str, geometry_field: str = "geom", add_metadata: bool = False
+):
+    """Convert gzipped csv file to gzipped GeoJSON."""
+    outfile = filename.replace(".csv", f"_{geometry_field}.geojson")
+    df = pd.read_csv(filename, dtype=str, keep_default_na=False, compression="gzip")
+    write_geojson(df, outfile, geometry_field, add_metadata)
+    logger.info(f"converted {filename} to {outfile}.")
 
-def cast_datatypes_for_geojson(filename: str):
-    """
-    Go through geojson file and try to cast all values as float, except project_id
-    remove redundant geometry property
-    """
 
-    filename = filename.replace("csv", "geojson")
-    with open(filename) as f:
-        geojson_data = json.load(f)
+def csv_to_geojson(filename: str, geometry_field: str = "geom"):
+    """Convert csv file to GeoJSON."""
+    outfile = filename.replace(".csv", f"_{geometry_field}.geojson")
+    df = pd.read_csv(filename, dtype=str, keep_default_na=False)
+    write_geojson(df, outfile, geometry_field)
+    logger.info(f"converted {filename} to {outfile}.")
 
-    if len(geojson_data["features"]) < 1:
-        logger.info(f"there are no features for this file: {filename}")
 
-    else:
-        properties = list(geojson_data["features"][0]["properties"].keys())
-        for i in range(0, len(geojson_data["features"])):
-            for property in properties:
-                if property in [
-                    "project_id",
-                    "name",
-                    "project_details",
-                    "task_id",
-                    "group_id",
-                ]:
-                    # don't try to cast project_id
-                    pass
-                elif property in ["geom"]:
-                    # remove redundant geometry property
-                    del geojson_data["features"][i]["properties"][property]
-                elif geojson_data["features"][i]["properties"][property] == "":
-                    del geojson_data["features"][i]["properties"][property]
-                else:
-                    try:
-                        geojson_data["features"][i]["properties"][property] = float(
-                            geojson_data["features"][i]["properties"][property]
-                        )
-                    except ValueError:
-                        pass
-
-        with open(filename, "w") as f:
-            json.dump(geojson_data, f)
-        logger.info(f"converted datatypes for {filename}.")
-
-
-def add_metadata_to_geojson(filename: str, geometry_field: str = "geom"):
+def create_group_geom(group_data: dict) -> dict:
     """
-    Add a metadata attribute to the geojson file about intended data usage.
+    Create the bounding box of the tiles of a group as GeoJSON geometry.
+
+    The bounding box is calculated from the min and max tile coordinates
+    and only its corners are converted into lon, lat.
+    As in RFC 7946 the ring is counterclockwise
+    and coordinates are rounded to 7 decimals.
     """
 
-    filename = filename.replace(".csv", f"_{geometry_field}.geojson")
-    with open(filename) as f:
-        geojson_data = json.load(f)
+    tile_x = [int(data["task_x"]) for data in group_data.values()]
+    tile_y = [int(data["task_y"]) for data in group_data.values()]
+    zoom = int(next(iter(group_data.values()))["task_z"])
 
-    if len(geojson_data["features"]) < 1:
-        logger.info(f"there are no features for this file: {filename}")
+    lon_left, lat_top = tile_functions.pixel_coords_zoom_to_lat_lon(
+        min(tile_x) * 256, min(tile_y) * 256, zoom
+    )
+    lon_right, lat_bottom = tile_functions.pixel_coords_zoom_to_lat_lon(
+        (max(tile_x) + 1) * 256, (max(tile_y) + 1) * 256, zoom
+    )
 
-    geojson_data["metadata"] = {
-        "usage": "This data can only be used for editing in OpenStreetMap."
+    ring = [
+        (lon_left, lat_bottom),
+        (lon_right, lat_bottom),
+        (lon_right, lat_top),
+        (lon_left, lat_top),
+        (lon_left, lat_bottom),
+    ]
+    return {
+        "type": "Polygon",
+        "coordinates": [[[round(lon, 7), round(lat, 7)] for lon, lat in ring]],
     }
 
-    with open(filename, "w") as f:
-        json.dump(geojson_data, f)
-    logger.info(f"added metadata to {filename}.")
-
-
-def create_group_geom(group_data, shape="bounding_box"):
-    """Create bounding box or convex hull of input task geometries."""
-
-    result_geom_collection = ogr.Geometry(ogr.wkbMultiPolygon)
-    for result, data in group_data.items():
-        result_geom = ogr.CreateGeometryFromWkt(data["wkt"])
-        result_geom_collection.AddGeometry(result_geom)
 
-    if shape == "convex_hull":
-        group_geom = result_geom_collection.ConvexHull()
-    elif shape == "bounding_box":
-        # Get Envelope
-        lon_left, lon_right, lat_top, lat_bottom = result_geom_collection.GetEnvelope()
-
-        # Create Geometry
-        ring = ogr.Geometry(ogr.wkbLinearRing)
-        ring.AddPoint(lon_left, lat_top)
-        ring.AddPoint(lon_right, lat_top)
-        ring.AddPoint(lon_right, lat_bottom)
-        ring.AddPoint(lon_left, lat_bottom)
-        ring.AddPoint(lon_left, lat_top)
-        # TODO: Make sure to return 2D geom, currently 3D with z = 0.0
-        group_geom = ogr.Geometry(ogr.wkbPolygon)
-        group_geom.AddGeometry(ring)
-
-    return group_geom
-
-
-def create_geojson_file_from_dict(final_groups_dict, outfile):
+def create_geojson_file_from_dict(
+    final_groups_dict: dict, outfile: str, name: Optional[str] = None
+):
     """Take output from generate stats and create TM geometries.
 
-    In order to create a GeoJSON file with a coordinate precision of 7
-    we take a small detour.
-    First, we create a GeoJSONSeq file.
-    This contains only the features.
-    Then we add these features to the final GeoJSON file.
-    The current shape of the output geometries is set to 'bounding_box'.
+    The geometry of each group is its bounding box.
+    The file is written to a temporary file first and then moved to the outfile.
+    The name of the feature collection is the outfile if no name is given.
     """
 
-    driver = ogr.GetDriverByName("GeoJSONSeq")
-    # define spatial Reference
-    srs = osr.SpatialReference()
-    srs.ImportFromEPSG(4326)
-    outfile_temp = outfile.replace(".geojson", "_temp.geojson")
-
-    if os.path.exists(outfile_temp):
-        driver.DeleteDataSource(outfile_temp)
-
-    if os.path.exists(outfile):
-        driver.DeleteDataSource(outfile)
-
-    dataSource = driver.CreateDataSource(outfile_temp)
-    # create layer
-    layer = dataSource.CreateLayer(
-        outfile_temp,
-        srs,
-        geom_type=ogr.wkbPolygon,
-    )
-
-    # create fields
-    field_id = ogr.FieldDefn("group_id", ogr.OFTInteger)
-    layer.CreateField(field_id)
-
-    if len(final_groups_dict) < 1:
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"group_id": group_id},
+            "geometry": create_group_geom(group_data),
+        }
+        for group_id, group_data in final_groups_dict.items()
+    ]
+    if len(features) < 1:
         logger.info("there are no geometries to save")
-    else:
-        for group_id in final_groups_dict.keys():
-            group_data = final_groups_dict[group_id]
-            # create the final group geometry
-            group_geom = create_group_geom(group_data, "bounding_box")
-            final_groups_dict[group_id]["group_geom"] = group_geom
-            # init feature
-
-            if group_geom.GetGeometryName() == "POLYGON":
-                featureDefn = layer.GetLayerDefn()
-                feature = ogr.Feature(featureDefn)
-                # create polygon from wkt and set geometry
-                feature.SetGeometry(group_geom)
-                # set other attributes
-                feature.SetField("group_id", group_id)
-                # add feature to layer
-                layer.CreateFeature(feature)
-                feature.Destroy
-            elif group_geom.GetGeometryName() == "MULTIPOLYGON":
-                for geom_part in group_geom:
-                    featureDefn = layer.GetLayerDefn()
-                    feature = ogr.Feature(featureDefn)
-                    # create polygon from wkt and set geometry
-                    feature.SetGeometry(group_geom)
-                    # set other attributes
-                    feature.SetField("group_id", group_id)
-                    # add feature to layer
-                    layer.CreateFeature(feature)
-                    feature.Destroy
-            else:
-                print("other geometry type: %s" % group_geom.GetGeometryName())
-                print(group_geom)
-                continue
-
-    # make sure to close layer and data source
-    layer = None
-    dataSource = None
-
-    # load the features from temp file
-    feature_collection = []
-    with open(outfile_temp, "r") as f:
-        for cnt, line in enumerate(f):
-            feature_collection.append(json.loads(line))
 
     # create final geojson structure
     geojson_structure = {
         "type": "FeatureCollection",
-        "name": outfile,
+        "name": name or outfile,
         "crs": {
             "type": "name",
             "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"},
         },
-        "features": feature_collection,
+        "features": features,
     }
 
     # save to geojson
-    with open(outfile, "w") as json_file:
+    file_descriptor, temporary_file = tempfile.mkstemp(
+        suffix=".tmp", dir=os.path.dirname(outfile) or None
+    )
+    with os.fdopen(file_descriptor, "w") as json_file:
         json.dump(geojson_structure, json_file)
-        logger.info("created outfile: %s." % outfile)
-
-    # remove temp file
-    if os.path.exists(outfile_temp):
-        driver.DeleteDataSource(outfile_temp)
+    # mkstemp creates files readable by the owner only, nginx needs to read them
+    os.chmod(temporary_file, 0o644)
+    os.replace(temporary_file, outfile)
+    logger.info("created outfile: %s." % outfile)
 
 
-def create_geojson_file(geometries, outfile):
+def create_geojson_file(geometries, outfile, name: Optional[str] = None):
+    """
+    Create a GeoJSON file of OGR geometries with a coordinate precision of 7.
+    The name of the feature collection is the outfile if no name is given.
+    """
 
     driver = ogr.GetDriverByName("GeoJSONSeq")
     # define spatial Reference
@@ -337,7 +304,7 @@ def create_geojson_file(geometries, outfile):
     # create final geojson structure
     geojson_structure = {
         "type": "FeatureCollection",
-        "name": outfile,
+        "name": name or outfile,
         "crs": {
             "type": "name",
             "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"},
@@ -0,0 +1,164 @@
+"""Batch validation and area computation for input geometries of projects."""
+
+import concurrent.futures
+import functools
+import math
+import os
+from itertools import repeat
+from typing import Dict, List, Optional
+
+import numpy as np
+from osgeo import ogr, osr
+
+from mapswipe_workers.definitions import logger
+
+MOLLWEIDE_PROJ4 = "+proj=moll +lon_0=0 +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"
+POLYGON_TYPES = [ogr.wkbPolygon, ogr.wkbMultiPolygon]
+
+# Inputs with less geometries are validated in the calling process.
+# Starting worker processes does not pay off for small inputs.
+PARALLEL_THRESHOLD = 10000
+
+# Number of worker processes if validate_geometries is called without max_workers.
+# None means one worker process per CPU.
+_default_max_workers: Optional[int] = None
+
+
+@functools.lru_cache(maxsize=None)
+def get_mollweide_transformation() -> osr.CoordinateTransformation:
+    """Get the (cached) transformation from WGS84 into Mollweide (EPSG:54009).
+
+    The transformation is created only once per process.
+    Longitude/latitude axis order is used for WGS84 as in GeoJSON files.
+    """
+    source = osr.SpatialReference()
+    source.ImportFromEPSG(4326)
+    source.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    target = osr.SpatialReference()
+    target.ImportFromProj4(MOLLWEIDE_PROJ4)
+    return osr.CoordinateTransformation(source, target)
+
+
+def read_layer_geometries(layer: ogr.Layer) -> List[Optional[bytes]]:
+    """Read all feature geometries of a layer as WKB. Missing geometries are None."""
+    geometries = []
+    layer.ResetReading()
+    for feature in layer:
+        feat_geom = feature.GetGeometryRef()
+        if feat_geom is None:
+            geometries.append(None)
+        else:
+            geometries.append(bytes(feat_geom.ExportToWkb()))
+    layer.ResetReading()
+    return geometries
+
+
+def _validate_chunk(wkb_geometries: List[Optional[bytes]], repair: bool) -> Dict:
+    """Check validity and geometry type and compute area for a chunk of geometries.
+
+    Invalid geometries are repaired with MakeValid() if repair is set.
+    The area is only computed for valid (or repaired) polygon geometries.
+    """
+    n = len(wkb_geometries)
+    is_valid = np.zeros(n, dtype=bool)
+    geometry_types = np.full(n, ogr.wkbNone, dtype=np.int64)
+    area_sqkm = np.zeros(n, dtype=np.float64)
+    repaired = {}
+    transformation = get_mollweide_transformation()
+
+    for i, wkb in enumerate(wkb_geometries):
+        if wkb is None:
+            continue
+        geom = ogr.CreateGeometryFromWkb(wkb)
+        if geom is None:
+            continue
+        geom_valid = geom.IsValid()
+        if not geom_valid and repair:
+            repaired_geom = geom.MakeValid()
+            if repaired_geom is not None and repaired_geom.IsValid():
+                geom = repaired_geom
+                geom_valid = True
+                repaired[i] = bytes(geom.ExportToWkb())
+
+        geometry_types[i] = ogr.GT_Flatten(geom.GetGeometryType())
+        is_valid[i] = geom_valid
+        if geom_valid and geometry_types[i] in POLYGON_TYPES:
+            geom.Transform(transformation)
+            area_sqkm[i] = geom.GetArea() / 1000000
+
+    return {
+        "is_valid": is_valid,
+        "geometry_types": geometry_types,
+        "area_sqkm": area_sqkm,
+        "repaired": repaired,
+    }
+
+
+def set_default_max_workers(max_workers: Optional[int]) -> None:
+    """Set the number of worker processes used by validate_geometries by default.
+
+    If several projects are created in parallel each creation process
+    should only use its share of the CPUs.
+    """
+    global _default_max_workers
+    _default_max_workers = max_workers
+
+
+def validate_geometries(
+    wkb_geometries: List[Optional[bytes]],
+    repair: bool = False,
+    max_workers: Optional[int] = None,
+) -> Dict:
+    """Validate a batch of geometries given as WKB.
+
+    Large inputs (e.g. building footprints) are split into chunks
+    which are validated in parallel in a process pool.
+
+    Returns a dictionary with:
+    is_valid: bool array, geometry is valid (or has been repaired)
+    is_polygon: bool array, geometry is a POLYGON or MULTIPOLYGON
+    geometry_types: int array of OGR geometry types (wkbNone for missing geometries)
+    area_sqkm: float array, area in Mollweide projection (0 for invalid geometries)
+    total_area_sqkm: float, summed area of all valid polygons
+    geometries: list of WKB geometries, repaired geometries are replaced
+    repaired_count: int, number of repaired geometries
+    """
+    n = len(wkb_geometries)
+    if max_workers is None:
+        max_workers = _default_max_workers or os.cpu_count() or 1
+
+    if n < PARALLEL_THRESHOLD or max_workers < 2:
+        chunk_size = max(n, 1)
+        results = [_validate_chunk(wkb_geometries, repair)]
+    else:
+        # use more chunks than workers to balance the load
+        chunk_size = math.ceil(n / (max_workers * 4))
+        chunks = [wkb_geometries[i : i + chunk_size] for i in range(0, n, chunk_size)]
+        logger.info(
+            f"validate {n} geometries in {len(chunks)} chunks "
+            f"using {max_workers} processes"
+        )
+        with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+            results = list(executor.map(_validate_chunk, chunks, repeat(repair)))
+
+    geometries = list(wkb_geometries)
+    for chunk_number, result in enumerate(results):
+        for i, wkb in result["repaired"].items():
+            geometries[chunk_number * chunk_size + i] = wkb
+
+    is_valid = np.concatenate([r["is_valid"] for r in results])
+    geometry_types = np.concatenate([r["geometry_types"] for r in results])
+    area_sqkm = np.concatenate([r["area_sqkm"] for r in results])
+
+    is_polygon = np.isin(geometry_types, POLYGON_TYPES)
+    repaired_count = sum(len(r["repaired"]) for r in results)
+
+    return {
+        "is_valid": is_valid,
+        "is_polygon": is_polygon,
+        "geometry_types": geometry_types,
+        "area_sqkm": area_sqkm,
+        "total_area_sqkm": float(area_sqkm[is_valid & is_polygon].sum()),
+        "geometries": geometries,
+        "repaired_count": repaired_count,
+    }
@@ -0,0 +1,140 @@
+"""Content-addressed on-disk cache for responses of the ohsome API.
+
+Project managers often resubmit the same AOI and filter.
+Responses are stored as files named by a hash of the normalized request.
+The least recently used files are deleted if the cache exceeds its size limit.
+Responses older than OHSOME_CACHE_MAX_AGE are not used and deleted,
+so that OSM data is requested again after some time.
+
+The modification time of a file is the time the response has been cached,
+the access time is the time it has been used the last time.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Optional
+
+from mapswipe_workers.definitions import (
+    OHSOME_CACHE_MAX_AGE,
+    OHSOME_CACHE_MAX_BYTES,
+    OHSOME_CACHE_PATH,
+    logger,
+)
+
+# strings in double quotes, e.g. tag values like name="A  B"
+QUOTED_STRING = re.compile(r'("(?:[^"\\]|\\.)*")')
+
+
+def normalize_area(area: str) -> str:
+    """Serialize the AOI GeoJSON independent of whitespace and key order."""
+    try:
+        return json.dumps(json.loads(area), sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return area.strip()
+
+
+def normalize_filter(filter: str) -> str:
+    """Collapse whitespace of the filter outside of quoted strings."""
+    # split with a capturing group returns the quoted strings at odd positions
+    parts = QUOTED_STRING.split(filter)
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)
+    ).strip()
+
+
+def get_cache_key(
+    endpoint: str, area: str, filter: str, properties: Optional[str] = None
+) -> str:
+    """Get the hash of the normalized AOI, filter, endpoint and properties."""
+    if properties:
+        properties = ",".join(sorted(p.strip() for p in properties.split(",")))
+    request = {
+        "endpoint": endpoint.strip("/"),
+        "area": normalize_area(area),
+        "filter": normalize_filter(filter),
+        "properties": properties or "",
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+def get_cache_file(key: str) -> str:
+    return os.path.join(OHSOME_CACHE_PATH, f"{key}.geojson")
+
+
+def get_cached_response(
+    key: str, max_age: float = OHSOME_CACHE_MAX_AGE
+) -> Optional[str]:
+    """
+    Get the path of a cached response or None if it is not cached
+    or if it is older than max_age seconds.
+    """
+    path = get_cache_file(key)
+    if not os.path.isfile(path):
+        logger.info(f"ohsome cache miss: {key}")
+        return None
+    now = time.time()
+    cached_at = os.stat(path).st_mtime
+    if now - cached_at > max_age:
+        logger.info(f"ohsome cache expired: {key}")
+        remove(path)
+        return None
+    # the access time is used for the least recently used eviction
+    os.utime(path, (now, cached_at))
+    logger.info(f"ohsome cache hit: {key}")
+    return path
+
+
+def create_temporary_file() -> str:
+    """Create a file in the cache directory to write a response to."""
+    os.makedirs(OHSOME_CACHE_PATH, exist_ok=True)
+    file_descriptor, path = tempfile.mkstemp(suffix=".tmp", dir=OHSOME_CACHE_PATH)
+    os.close(file_descriptor)
+    return path
+
+
+def add_to_cache(key: str, temporary_file: str) -> str:
+    """Move a completely written response into the cache and evict old files."""
+    path = get_cache_file(key)
+    os.replace(temporary_file, path)
+    evict(OHSOME_CACHE_MAX_BYTES, keep=path)
+    return path
+
+
+def remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        # already deleted by another process
+        pass
+
+
+def evict(
+    max_bytes: int, keep: Optional[str] = None, max_age: float = OHSOME_CACHE_MAX_AGE
+) -> None:
+    """Delete expired responses and least recently used responses
+    until the cache is below max_bytes.
+
+    The file given by keep is not deleted even if it exceeds the limit.
+    """
+    now = time.time()
+    files = []
+    for entry in os.scandir(OHSOME_CACHE_PATH):
+        if entry.is_file() and entry.name.endswith(".geojson") and entry.path != keep:
+            stat = entry.stat()
+            if now - stat.st_mtime > max_age:
+                remove(entry.path)
+                logger.info(f"evicted expired ohsome response from cache: {entry.path}")
+                continue
+            files.append((stat.st_atime, stat.st_size, entry.path))
+
+    total_bytes = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total_bytes <= max_bytes:
+            break
+        remove(path)
+        total_bytes -= size
+        logger.info(f"evicted ohsome response from cache: {path}")
@@ -0,0 +1,198 @@
+"""Plan the creation of a project without creating all groups and tasks.
+
+The planner derives the exact number of groups and tasks of a project draft
+and estimates how many rows will be written to Postgres, how many bytes will be
+uploaded to Firebase and how much memory the worker needs to create the project.
+For tile map service projects the number of tasks is computed from the tile
+ranges of the groups. Only a single sample task is created for the estimates.
+"""
+
+import json
+import sys
+from typing import Dict
+
+from mapswipe_workers.definitions import ProjectType, logger
+from mapswipe_workers.project_types.arbitrary_geometry import (
+    grouping_functions as ag_grouping_functions,
+)
+from mapswipe_workers.project_types.arbitrary_geometry.group import (
+    Group as ArbitraryGeometryGroup,
+)
+from mapswipe_workers.project_types.tile_map_service_grid.group import (
+    Group as TileMapServiceGroup,
+)
+from mapswipe_workers.project_types.tile_map_service_grid.task import (
+    Task as TileMapServiceTask,
+)
+from mapswipe_workers.utils import gzip_str
+from mapswipe_workers.utils import tile_grouping_functions as grouping_functions
+
+# During project creation every task exists as object, as dictionary
+# (see BaseProject.save_project) and as row in a temporary text file.
+MEMORY_OVERHEAD_FACTOR = 3
+
+# Attributes which are not uploaded to Firebase.
+NON_FIREBASE_PROJECT_ATTRIBUTES = [
+    "groups",
+    "geometry",
+    "inputGeometries",
+    "validInputGeometries",
+]
+
+
+def get_object_size(obj: object) -> int:
+    """Approximate the memory used by a group or task object in bytes."""
+    attributes = {k: v for k, v in vars(obj).items() if k != "tasks"}
+    size = sys.getsizeof(obj) + sys.getsizeof(attributes)
+    for key, value in attributes.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+def get_json_size(data) -> int:
+    """Get the size of data serialized as JSON in bytes."""
+    return len(json.dumps(data, default=str).encode())
+
+
+def get_task_firebase_size(project: object, tasks: list) -> int:
+    """Get the size of a list of tasks as they are uploaded to Firebase."""
+    tasks = [
+        {k: v for k, v in vars(task).items() if k not in ["geometry", "properties"]}
+        for task in tasks
+    ]
+    if project.projectType == ProjectType.FOOTPRINT.value:
+        return len(gzip_str.compress_tasks(tasks))
+    else:
+        return get_json_size(tasks)
+
+
+def get_tile_map_service_groups(project: object) -> Dict:
+    """Get the number of tasks per group and a sample group with a single task."""
+    raw_groups = grouping_functions.extent_to_groups(
+        project.validInputGeometries, project.zoomLevel, project.groupSize
+    )
+    tile_counts = grouping_functions.count_tiles_per_group(raw_groups)
+
+    sample_group = None
+    sample_tasks = []
+    if raw_groups:
+        group_id, _slice = next(iter(raw_groups.items()))
+        sample_group = TileMapServiceGroup(project, group_id, _slice)
+        sample_tasks = [
+            TileMapServiceTask(
+                sample_group, project, int(_slice["xMin"]), int(_slice["yMin"])
+            )
+        ]
+        sample_group.numberOfTasks = tile_counts[group_id]
+
+    return {
+        "tasks_per_group": tile_counts,
+        "sample_group": sample_group,
+        "sample_tasks": sample_tasks,
+    }
+
+
+def get_arbitrary_geometry_groups(project: object) -> Dict:
+    """Get the number of tasks per group and the tasks of a sample group."""
+    raw_groups = ag_grouping_functions.group_input_geometries(
+        project.validInputGeometries, project.groupSize
+    )
+    tasks_per_group = {
+        group_id: len(item["feature_ids"]) for group_id, item in raw_groups.items()
+    }
+
+    sample_group = None
+    sample_tasks = []
+    if raw_groups:
+        group_id, item = next(iter(raw_groups.items()))
+        sample_group = ArbitraryGeometryGroup(project, group_id)
+        sample_group.create_tasks(item["feature_ids"], item["features"])
+        sample_tasks = sample_group.tasks
+
+    return {
+        "tasks_per_group": tasks_per_group,
+        "sample_group": sample_group,
+        "sample_tasks": sample_tasks,
+    }
+
+
+def plan_project(project: object) -> Dict:
+    """
+    Compute number of groups and tasks and estimate resources for a project.
+
+    The geometries of the project need to be validated before
+    (project.validate_geometries()).
+    Estimates are derived from a sample group and its (sample) tasks
+    and are scaled to the total number of groups and tasks.
+    """
+
+    if project.projectType == ProjectType.FOOTPRINT.value:
+        groups_info = get_arbitrary_geometry_groups(project)
+    else:
+        groups_info = get_tile_map_service_groups(project)
+
+    tasks_per_group = groups_info["tasks_per_group"]
+    sample_group = groups_info["sample_group"]
+    sample_tasks = groups_info["sample_tasks"]
+
+    number_of_groups = len(tasks_per_group)
+    number_of_tasks = sum(tasks_per_group.values())
+
+    project_attributes = {
+        k: v
+        for k, v in vars(project).items()
+        if k not in NON_FIREBASE_PROJECT_ATTRIBUTES
+    }
+    firebase_bytes = {
+        "project": get_json_size(project_attributes),
+        "groups": 0,
+        "tasks": 0,
+    }
+    memory_bytes = 0
+
+    if sample_group is not None and sample_tasks:
+        group_attributes = {k: v for k, v in vars(sample_group).items() if k != "tasks"}
+        firebase_bytes["groups"] = get_json_size(group_attributes) * number_of_groups
+
+        bytes_per_task = get_object_size(sample_tasks[0]) + get_json_size(
+            vars(sample_tasks[0])
+        )
+        # tasks of projects with lazy tasks are generated in Postgres
+        task_objects = 0 if project.has_lazy_tasks() else number_of_tasks
+        memory_bytes = MEMORY_OVERHEAD_FACTOR * (
+            bytes_per_task * task_objects
+            + get_object_size(sample_group) * number_of_groups
+        )
+
+        # only footprint and change detection projects have tasks in Firebase
+        if project.projectType in [
+            ProjectType.FOOTPRINT.value,
+            ProjectType.CHANGE_DETECTION.value,
+        ]:
+            task_bytes = get_task_firebase_size(project, sample_tasks)
+            firebase_bytes["tasks"] = int(
+                task_bytes / len(sample_tasks) * number_of_tasks
+            )
+
+    plan = {
+        "project_id": project.projectId,
+        "project_type": project.projectType,
+        "number_of_groups": number_of_groups,
+        "number_of_tasks": number_of_tasks,
+        "max_tasks_per_group": max(tasks_per_group.values(), default=0),
+        "required_results": number_of_tasks * project.verificationNumber,
+        "postgres_rows": {
+            "projects": 1,
+            "groups": number_of_groups,
+            "tasks": number_of_tasks,
+        },
+        "firebase_bytes": firebase_bytes,
+        "firebase_bytes_total": sum(firebase_bytes.values()),
+        "worker_memory_bytes": memory_bytes,
+    }
+
+    logger.info(
+        f"{project.projectId} - plan_project - "
+        f"{number_of_groups} groups and {number_of_tasks} tasks"
+    )
+    return plan
@@ -1,5 +1,6 @@
 import math
 
+import numpy as np
 from osgeo import ogr
 
 
@@ -140,6 +141,23 @@ def tile_coords_and_zoom_to_quadKey(TileX, TileY, zoom):
     return quadKey
 
 
+def tile_coords_and_zoom_to_quadKeys(
+    tile_x: np.ndarray, tile_y: np.ndarray, zoom: int
+) -> np.ndarray:
+    """Create quadkeys for arrays of tile coordinates at the same zoom level."""
+
+    tile_x = np.asarray(tile_x, dtype=np.int64)
+    tile_y = np.asarray(tile_y, dtype=np.int64)
+    if zoom == 0:
+        return np.full(len(tile_x), "", dtype=object)
+
+    # one column per zoom level, starting with the most significant bit
+    shifts = np.arange(zoom - 1, -1, -1)
+    digits = ((tile_x[:, None] >> shifts) & 1) + 2 * ((tile_y[:, None] >> shifts) & 1)
+    characters = np.ascontiguousarray(digits + ord("0"), dtype=np.uint8)
+    return characters.view(f"S{zoom}").ravel().astype(str).astype(object)
+
+
 def quadKey_to_Bing_URL(quadKey, api_key):
     """Create a tile image URL linking to a Bing tile server."""
 
@@ -445,6 +445,32 @@ def extent_to_groups(infile, zoom: int, groupSize):
     return groups_dict
 
 
+def count_tiles_per_group(groups: Dict) -> Dict[str, int]:
+    """
+    The function to count the tiles of each group using the tile ranges.
+    This gives the number of tasks per group without creating the tasks.
+
+    Parameters
+    ----------
+    groups : dict
+        a dictionary containing "xMin", "xMax", "yMin", "yMax"
+        and the "group_id" as key
+
+    Returns
+    -------
+    tile_counts : dict
+        the number of tiles per group with the "group_id" as key
+    """
+
+    tile_counts = {}
+    for group_id, group in groups.items():
+        x_size = int(group["xMax"]) - int(group["xMin"]) + 1
+        y_size = int(group["yMax"]) - int(group["yMin"]) + 1
+        tile_counts[group_id] = x_size * y_size
+
+    return tile_counts
+
+
 def vertical_groups_as_geojson(raw_group_infos: Dict, outfile: str):
     """
     The function to create a geojson file from the groups dictionary.
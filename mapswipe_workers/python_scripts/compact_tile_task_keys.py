@@ -0,0 +1,46 @@
+import sys
+
+from mapswipe_workers import auth
+from mapswipe_workers.definitions import logger
+from mapswipe_workers.firebase_to_postgres.compact_tasks import get_tile_project_ids
+
+
+def compact_project_results(project_id: str) -> None:
+    """Move results of tile tasks into the table with packed task keys."""
+    p_con = auth.postgresDB()
+    query = """
+        BEGIN;
+        INSERT INTO mapping_sessions_results_tiles
+            SELECT
+                msr.mapping_session_id,
+                task_id_to_tile_key(msr.task_id),
+                msr.result
+            FROM mapping_sessions_results msr
+            JOIN mapping_sessions ms USING (mapping_session_id)
+            WHERE ms.project_id = %(project_id)s
+                AND task_id_to_tile_key(msr.task_id) IS NOT NULL
+        ON CONFLICT (mapping_session_id, task_key)
+        DO NOTHING;
+        DELETE FROM mapping_sessions_results msr
+            USING mapping_sessions ms
+            WHERE ms.mapping_session_id = msr.mapping_session_id
+                AND ms.project_id = %(project_id)s
+                AND task_id_to_tile_key(msr.task_id) IS NOT NULL;
+        COMMIT;
+    """
+    p_con.query(query, {"project_id": project_id})
+    logger.info(f"moved results of tile tasks to packed task keys for {project_id}")
+
+
+if __name__ == "__main__":
+    """Use this command to run in docker container.
+    docker-compose run -d mapswipe_workers_creation python3 python_scripts/compact_tile_task_keys.py [project_id ...]  # noqa
+
+    Results of all tile projects are moved if no project ids are given.
+    Set COMPACT_TILE_TASK_KEYS=true for the workers before
+    so that new results are stored with packed task keys as well.
+    """
+    project_ids = sys.argv[1:] or get_tile_project_ids()
+    for i, project_id in enumerate(project_ids):
+        compact_project_results(project_id)
+        logger.info(f"progress: {i+1}/{len(project_ids)}")
@@ -0,0 +1,118 @@
+"""
+Benchmark the aggregation of results by task id on a synthetic project.
+
+The vectorized project_stats.get_agg_results_by_task_id is compared
+with the former row-wise implementation using DataFrame.apply.
+Run with: python benchmark_agg_results_by_task_id.py [number_of_results]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from mapswipe_workers.generate_stats import project_stats
+from mapswipe_workers.utils import tile_functions
+
+
+def create_synthetic_project(number_of_results: int, verification_number: int = 5):
+    """Create results and tasks dataframes of a build area project at zoom 18."""
+    rng = np.random.default_rng(42)
+    number_of_tasks = number_of_results // verification_number
+    tile_x = 140000 + np.arange(number_of_tasks) % 1000
+    tile_y = 90000 + np.arange(number_of_tasks) // 1000
+    task_ids = pd.Series([f"18-{x}-{y}" for x, y in zip(tile_x, tile_y)])
+    group_ids = pd.Series(np.arange(number_of_tasks) // 120).astype(str)
+    tasks_df = pd.DataFrame(
+        {
+            "project_id": "benchmark",
+            "group_id": group_ids,
+            "task_id": task_ids,
+            "geom": "POLYGON EMPTY",
+        }
+    )
+
+    task_index = np.repeat(np.arange(number_of_tasks), verification_number)
+    results_df = pd.DataFrame(
+        {
+            "project_id": "benchmark",
+            "group_id": group_ids.to_numpy()[task_index],
+            "task_id": task_ids.to_numpy()[task_index],
+            "result": rng.choice(
+                [0, 1, 2, 3], len(task_index), p=[0.7, 0.2, 0.05, 0.05]
+            ),
+        }
+    )
+    return results_df, tasks_df
+
+
+def get_agg_results_by_task_id_row_wise(results_df, tasks_df):
+    """Reference implementation which processes one task after another."""
+
+    def calc_count(row):
+        counts = [row.get(category, 0) for category in [0, 1, 2, 3]]
+        return [sum(counts)] + counts
+
+    def calc_agreement(row):
+        total = row["total_count"]
+        if total == 1:
+            return 1.0
+        return (
+            1.0
+            / (total * (total - 1))
+            * sum(row[c] * (row[c] - 1) for c in [0, 1, 2, 3])
+        )
+
+    def calc_quadkey(row):
+        try:
+            tile_z, tile_x, tile_y = row["task_id"].split("-")
+            return tile_functions.tile_coords_and_zoom_to_quadKey(
+                int(tile_x), int(tile_y), int(tile_z)
+            )
+        except ValueError:
+            return None
+
+    df = (
+        results_df.groupby(["project_id", "group_id", "task_id", "result"])
+        .size()
+        .unstack(fill_value=0)
+    )
+    df[["total_count", 0, 1, 2, 3]] = df.apply(calc_count, axis=1, result_type="expand")
+    df[["0_share", "1_share", "2_share", "3_share"]] = df.apply(
+        lambda row: [row[c] / row["total_count"] for c in [0, 1, 2, 3]],
+        axis=1,
+        result_type="expand",
+    )
+    df["agreement"] = df.apply(calc_agreement, axis=1)
+    df.reset_index(level=["task_id"], inplace=True)
+    df["quadkey"] = df.apply(calc_quadkey, axis=1)
+    tasks_df = tasks_df.drop(columns=["project_id", "group_id"])
+    df = df.merge(tasks_df, left_on="task_id", right_on="task_id")
+    return df.rename(columns={0: "0_count", 1: "1_count", 2: "2_count", 3: "3_count"})
+
+
+def benchmark(function, results_df, tasks_df):
+    start = time.perf_counter()
+    agg_results_df = function(results_df.copy(), tasks_df.copy())
+    return agg_results_df, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    number_of_results = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    results_df, tasks_df = create_synthetic_project(number_of_results)
+    print(f"{len(results_df)} results, {len(tasks_df)} tasks")
+
+    vectorized_df, vectorized_seconds = benchmark(
+        project_stats.get_agg_results_by_task_id, results_df, tasks_df
+    )
+    print(f"vectorized: {vectorized_seconds:.1f} s")
+
+    row_wise_df, row_wise_seconds = benchmark(
+        get_agg_results_by_task_id_row_wise, results_df, tasks_df
+    )
+    print(f"row-wise:   {row_wise_seconds:.1f} s")
+
+    # kappa per task is not calculated row-wise
+    pd.testing.assert_frame_equal(vectorized_df.drop(columns="kappa"), row_wise_df)
+    print(f"identical output, speedup: {row_wise_seconds / vectorized_seconds:.1f}x")
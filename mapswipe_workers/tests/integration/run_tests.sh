@@ -5,3 +5,5 @@ python -m unittest test_update_user_data.py
 python -m unittest test_transfer_results.py
 # python -m unittest test_gdal.py
 # python -m unittest test_team_management.py
+python -m unittest test_tile_task_keys.py
+python -m unittest test_compact_tasks.py
@@ -43,6 +43,20 @@ def set_postgres_test_data(
     with open(file_path) as test_file:
         pg_db.copy_from(test_file, data_type)
 
+    if data_type == "mapping_sessions_results":
+        # results are counted per task and category during the transfer of results
+        pg_db.query(
+            """
+            INSERT INTO task_result_counts
+                SELECT ms.project_id, ms.group_id, msr.task_id, msr.result, count(*)
+                FROM mapping_sessions_results msr
+                JOIN mapping_sessions ms USING (mapping_session_id)
+                GROUP BY ms.project_id, ms.group_id, msr.task_id, msr.result
+            ON CONFLICT (project_id, group_id, task_id, result)
+            DO UPDATE SET count = EXCLUDED.count
+            """
+        )
+
 
 def create_test_project(
     project_type: str, fixture_name: str, results: bool = False
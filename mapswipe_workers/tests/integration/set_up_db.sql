@@ -223,3 +223,240 @@ CREATE TABLE IF NOT EXISTS results_user_groups_temp (
     user_id varchar,
     user_group_id varchar
 );
+
+-- Tile map service helper functions.
+-- Tasks of build area and completeness projects are derived from the
+-- tile ranges of their groups. These functions compute geometry and url
+-- of a tile the same way as mapswipe_workers.utils.tile_functions.
+CREATE OR REPLACE FUNCTION tile_to_geometry(z int, x int, y int) RETURNS geometry
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT ST_MakeEnvelope(
+        x::float8 / (1 << z) * 360 - 180,
+        degrees(2 * atan(exp(pi() * (1 - 2 * (y + 1)::float8 / (1 << z)))) - pi() / 2),
+        (x + 1)::float8 / (1 << z) * 360 - 180,
+        degrees(2 * atan(exp(pi() * (1 - 2 * y::float8 / (1 << z)))) - pi() / 2),
+        4326
+    );
+$$;
+
+CREATE OR REPLACE FUNCTION tile_to_quadkey(z int, x int, y int) RETURNS varchar
+    LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS
+$$
+DECLARE
+    quadkey varchar := '';
+    digit int;
+    mask int;
+BEGIN
+    FOR i IN REVERSE z..1 LOOP
+        digit := 0;
+        mask := 1 << (i - 1);
+        IF (x & mask) <> 0 THEN
+            digit := digit + 1;
+        END IF;
+        IF (y & mask) <> 0 THEN
+            digit := digit + 2;
+        END IF;
+        quadkey := quadkey || digit;
+    END LOOP;
+    RETURN quadkey;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_to_url(z int, x int, y int, tile_server json) RETURNS varchar
+    LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS
+$$
+DECLARE
+    url varchar := tile_server->>'url';
+    tile_y int := y;
+BEGIN
+    IF tile_server->>'name' = 'bing' THEN
+        RETURN 'https://ecn.t0.tiles.virtualearth.net/tiles/a'
+            || tile_to_quadkey(z, x, y)
+            || '.jpeg?g=7505&mkt=en-US&token='
+            || coalesce(tile_server->>'apiKey', 'None');
+    END IF;
+    -- maxar and '{-y}' urls use the Google tile y coordinate instead of TMS
+    IF tile_server->>'name' <> 'sinergise'
+        AND (tile_server->>'name' LIKE '%maxar%' OR url LIKE '%{-y}%') THEN
+        tile_y := (1 << z) - y - 1;
+        url := replace(url, '{-y}', '{y}');
+    END IF;
+    url := replace(url, '{key}', coalesce(tile_server->>'apiKey', 'None'));
+    url := replace(url, '{layer}', coalesce(tile_server->>'wmtsLayerName', 'None'));
+    url := replace(url, '{x}', x::varchar);
+    url := replace(url, '{y}', tile_y::varchar);
+    url := replace(url, '{z}', z::varchar);
+    RETURN url;
+END;
+$$;
+
+-- Tile task ids ('z-x-y') can be stored as packed 64-bit keys.
+-- Bits 58-63 hold the zoom level, bits 29-57 the tile x
+-- and bits 0-28 the tile y coordinate.
+CREATE OR REPLACE FUNCTION tile_key(z int, x int, y int) RETURNS int8
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT (z::int8 << 58) | (x::int8 << 29) | y::int8;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_key_z(key int8) RETURNS int
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT (key >> 58)::int;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_key_x(key int8) RETURNS int
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT ((key >> 29) & 536870911)::int;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_key_y(key int8) RETURNS int
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT (key & 536870911)::int;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_key_to_task_id(key int8) RETURNS varchar
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT concat_ws('-', tile_key_z(key), tile_key_x(key), tile_key_y(key));
+$$;
+
+-- Returns NULL for task ids which can not be packed without loss,
+-- e.g. task ids of footprint projects.
+CREATE OR REPLACE FUNCTION task_id_to_tile_key(task_id varchar) RETURNS int8
+    LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS
+$$
+DECLARE
+    parts text[];
+BEGIN
+    IF task_id !~ '^([0-9]|[12][0-9])-(0|[1-9][0-9]{0,8})-(0|[1-9][0-9]{0,8})$' THEN
+        RETURN NULL;
+    END IF;
+    parts := string_to_array(task_id, '-');
+    IF parts[2]::int > 536870911 OR parts[3]::int > 536870911 THEN
+        RETURN NULL;
+    END IF;
+    RETURN tile_key(parts[1]::int, parts[2]::int, parts[3]::int);
+END;
+$$;
+
+-- Results of tile tasks with packed task keys.
+-- Used instead of mapping_sessions_results if COMPACT_TILE_TASK_KEYS is set.
+CREATE TABLE IF NOT EXISTS mapping_sessions_results_tiles (
+    mapping_session_id int8,
+    task_key int8,
+    result int2 not null,
+    PRIMARY KEY (mapping_session_id, task_key),
+    FOREIGN KEY (mapping_session_id)
+    references mapping_sessions (mapping_session_id)
+);
+
+CREATE OR REPLACE FUNCTION mapping_sessions_results_tiles_constraint() RETURNS trigger
+    LANGUAGE plpgsql AS
+$$
+DECLARE v mapping_sessions;
+BEGIN
+    IF NOT EXISTS(
+        SELECT 1
+        FROM tasks
+        JOIN mapping_sessions ms
+        ON ms.mapping_session_id = NEW.mapping_session_id
+        WHERE tasks.task_id = tile_key_to_task_id(NEW.task_key) AND
+            tasks.group_id = ms.group_id AND
+            tasks.project_id = ms.project_id AND
+            ms.mapping_session_id = NEW.mapping_session_id
+        )
+    THEN
+        SELECT ms.project_id, ms.group_id, ms.user_id
+        FROM mapping_sessions ms
+        WHERE ms.mapping_session_id = NEW.mapping_session_id
+        INTO v;
+        RAISE EXCEPTION
+        'Tried to insert invalid result: Project: % Group: % Task: % - User: %', v.project_id, v.group_id, tile_key_to_task_id(NEW.task_key), v.user_id
+            USING ERRCODE = '23503';
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS insert_mapping_sessions_results_tiles ON mapping_sessions_results_tiles;
+CREATE TRIGGER insert_mapping_sessions_results_tiles BEFORE INSERT ON mapping_sessions_results_tiles
+    FOR EACH ROW EXECUTE PROCEDURE mapping_sessions_results_tiles_constraint();
+
+-- All results with task ids, independent of how they are stored.
+CREATE OR REPLACE VIEW mapping_sessions_results_all AS
+    SELECT
+        mapping_session_id,
+        task_id,
+        result
+    FROM mapping_sessions_results
+    UNION ALL
+    SELECT
+        mapping_session_id,
+        tile_key_to_task_id(task_key) as task_id,
+        result
+    FROM mapping_sessions_results_tiles;
+
+-- Tasks with geometry and project type specifics (taskX, taskY, url, urlB).
+-- Tile tasks in compact storage have neither geometry nor project type specifics.
+-- Both are derived from the task id and the tile servers of the project.
+CREATE OR REPLACE VIEW tasks_expanded AS
+    SELECT
+        t.project_id,
+        t.group_id,
+        t.task_id,
+        coalesce(
+            t.geom,
+            ST_Multi(tile_to_geometry(tile_key_z(k.key), tile_key_x(k.key), tile_key_y(k.key)))
+        ) as geom,
+        coalesce(
+            t.project_type_specifics,
+            json_strip_nulls(
+                json_build_object(
+                    'taskX', tile_key_x(k.key)::varchar,
+                    'taskY', tile_key_y(k.key)::varchar,
+                    'url', tile_to_url(
+                        tile_key_z(k.key), tile_key_x(k.key), tile_key_y(k.key),
+                        p.project_type_specifics -> 'tileServer'
+                    ),
+                    'urlB', tile_to_url(
+                        tile_key_z(k.key), tile_key_x(k.key), tile_key_y(k.key),
+                        p.project_type_specifics -> 'tileServerB'
+                    )
+                )
+            )
+        ) as project_type_specifics
+    FROM tasks t
+    JOIN projects p USING (project_id)
+    CROSS JOIN LATERAL (
+        SELECT
+            CASE
+                WHEN t.geom IS NULL OR t.project_type_specifics IS NULL
+                THEN task_id_to_tile_key(t.task_id)
+            END as key
+    ) k;
+
+-- Number of results per task and result category.
+-- Updated during the transfer of results in the same transaction as the results.
+CREATE TABLE IF NOT EXISTS task_result_counts (
+    project_id varchar,
+    group_id varchar,
+    task_id varchar,
+    result int2,
+    count int4 not null,
+    PRIMARY KEY (project_id, group_id, task_id, result)
+);
+
+-- Number of results per project which have been transferred
+-- since the stats of the project have been generated.
+-- Updated during the transfer of results and used to schedule the stats.
+CREATE TABLE IF NOT EXISTS project_stats_queue (
+    project_id varchar PRIMARY KEY,
+    new_results int8 NOT NULL DEFAULT 0,
+    -- time of the oldest result which is not part of the stats yet
+    dirty_since timestamp,
+    stats_generated_at timestamp
+);
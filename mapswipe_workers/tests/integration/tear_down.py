@@ -6,6 +6,7 @@ import time
 from typing import List
 
 from mapswipe_workers import auth
+from mapswipe_workers.generate_stats import results_cache, stats_manifest
 
 
 def delete_test_data(project_id: str) -> None:
@@ -58,6 +59,17 @@ def delete_test_data(project_id: str) -> None:
         "FROM mapping_sessions WHERE project_id = %s)"
     )
     pg_db.query(sql_query, [project_id])
+    sql_query = (
+        "DELETE FROM mapping_sessions_results_tiles "
+        "WHERE mapping_session_id IN ("
+        "SELECT mapping_session_id "
+        "FROM mapping_sessions WHERE project_id = %s)"
+    )
+    pg_db.query(sql_query, [project_id])
+    sql_query = "DELETE FROM task_result_counts WHERE project_id = %s"
+    pg_db.query(sql_query, [project_id])
+    sql_query = "DELETE FROM project_stats_queue WHERE project_id = %s"
+    pg_db.query(sql_query, [project_id])
     # Delete user-groups results data
     sql_query = (
         "DELETE FROM mapping_sessions_user_groups "
@@ -95,6 +107,8 @@ def delete_test_data(project_id: str) -> None:
         os.remove(filename)
     except FileNotFoundError:
         pass
+    results_cache.clear(project_id)
+    stats_manifest.delete(project_id)
 
 
 def delete_test_user_group(user_group_ids: List) -> None:
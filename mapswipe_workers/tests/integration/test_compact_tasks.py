@@ -0,0 +1,157 @@
+import json
+import os
+import tempfile
+import unittest
+
+import set_up
+from base import BaseTestCase
+from click.testing import CliRunner
+from osgeo import ogr
+
+from mapswipe_workers import auth, mapswipe_workers
+from mapswipe_workers.generate_stats.project_stats import get_tasks
+
+
+def get_expanded_tasks(project_id: str) -> list:
+    """Get task ids, bounds of the geometry, taskX, taskY and url of all tasks."""
+    pg_db = auth.postgresDB()
+    sql_query = """
+        SELECT
+            task_id,
+            ST_GeometryType(geom),
+            ST_XMin(geom),
+            ST_YMin(geom),
+            ST_XMax(geom),
+            ST_YMax(geom),
+            project_type_specifics ->> 'taskX',
+            project_type_specifics ->> 'taskY',
+            project_type_specifics ->> 'url'
+        FROM tasks_expanded
+        WHERE project_id = %(project_id)s
+        ORDER BY task_id
+    """
+    return pg_db.retr_query(sql_query, {"project_id": project_id})
+
+
+class TestCompactTasks(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project_type = "tile_map_service_grid"
+        fixture_name = "build_area"
+        self.project_id = "test_build_area"
+        for data_type in ["projects", "groups", "tasks"]:
+            set_up.set_postgres_test_data(project_type, data_type, fixture_name)
+
+        # The urls of the tasks in the fixture contain an api key
+        # which is not set for the tile server of the project.
+        pg_db = auth.postgresDB()
+        sql_query = """
+            UPDATE projects
+            SET project_type_specifics = jsonb_set(
+                project_type_specifics::jsonb,
+                '{tileServer,apiKey}',
+                to_jsonb(%(api_key)s::text)
+            )::json
+            WHERE project_id = %(project_id)s
+        """
+        pg_db.query(
+            sql_query,
+            {
+                "project_id": self.project_id,
+                "api_key": (
+                    "AopsdXjtTu-IwNoCTiZBtgRJ1g7yPkzAi65nXplc-"
+                    "eLJwZHYlAIf2yuSY_Kjg3Wn"
+                ),
+            },
+        )
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_tasks_df(self, name: str):
+        filename = os.path.join(self.tmp_dir.name, f"{name}.csv.gz")
+        df = get_tasks(filename, self.project_id)
+        return df.sort_values("task_id").reset_index(drop=True)
+
+    def assert_tasks_equal(self, tasks, expected_tasks):
+        self.assertEqual(len(tasks), len(expected_tasks))
+        for task, expected_task in zip(tasks, expected_tasks):
+            task_id, geometry_type, *bounds = task[:6]
+            self.assertEqual(
+                (task_id, geometry_type, *task[6:]),
+                (expected_task[0], expected_task[1], *expected_task[6:]),
+            )
+            for value, expected_value in zip(bounds, expected_task[2:6]):
+                self.assertAlmostEqual(value, expected_value, places=9)
+
+    def test_compact_tasks(self):
+        """Test that compacted tasks are expanded to the same tasks as before."""
+        expected_tasks = get_expanded_tasks(self.project_id)
+        expected_tasks_df = self.get_tasks_df("tasks_before")
+        self.assertEqual(len(expected_tasks), 5040)
+
+        runner = CliRunner()
+        result = runner.invoke(
+            mapswipe_workers.run_compact_tasks,
+            ["--project-id", self.project_id],
+            catch_exceptions=False,
+        )
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Compacted 5040 tasks of 1 projects", result.output)
+
+        pg_db = auth.postgresDB()
+        sql_query = """
+            SELECT count(*)
+            FROM tasks
+            WHERE project_id = %(project_id)s
+                AND geom IS NULL
+                AND project_type_specifics IS NULL
+        """
+        count = pg_db.retr_query(sql_query, {"project_id": self.project_id})[0][0]
+        self.assertEqual(count, 5040)
+
+        self.assert_tasks_equal(get_expanded_tasks(self.project_id), expected_tasks)
+
+        # the tasks used for the project stats are the same
+        tasks_df = self.get_tasks_df("tasks_after")
+        columns = ["project_id", "group_id", "task_id", "tile_z", "tile_x", "tile_y"]
+        self.assertEqual(
+            tasks_df[columns].values.tolist(),
+            expected_tasks_df[columns].values.tolist(),
+        )
+        for row, expected_row in zip(
+            tasks_df.itertuples(), expected_tasks_df.itertuples()
+        ):
+            envelope = ogr.CreateGeometryFromWkt(row.geom).GetEnvelope()
+            expected_envelope = ogr.CreateGeometryFromWkt(
+                expected_row.geom
+            ).GetEnvelope()
+            for value, expected_value in zip(envelope, expected_envelope):
+                self.assertAlmostEqual(value, expected_value, places=9)
+
+            project_type_specifics = json.loads(row.project_type_specifics)
+            expected_project_type_specifics = json.loads(
+                expected_row.project_type_specifics
+            )
+            for key in ["taskX", "taskY", "url"]:
+                self.assertEqual(
+                    project_type_specifics[key], expected_project_type_specifics[key]
+                )
+
+    def test_compact_tasks_twice(self):
+        """Test that tasks are compacted only once."""
+        runner = CliRunner()
+        runner.invoke(
+            mapswipe_workers.run_compact_tasks, ["--project-id", self.project_id]
+        )
+        result = runner.invoke(
+            mapswipe_workers.run_compact_tasks,
+            ["--project-id", self.project_id],
+            catch_exceptions=False,
+        )
+        self.assertIn("Compacted 0 tasks of 1 projects", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
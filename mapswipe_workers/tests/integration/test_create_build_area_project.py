@@ -27,6 +27,16 @@ class TestCreateProject(unittest.TestCase):
         result = pg_db.retr_query(query, [self.project_id])[0][0]
         self.assertEqual(result, self.project_id)
 
+        # Tasks are generated in Postgres from the tile ranges of the groups
+        query = """
+            SELECT
+              (SELECT sum(number_of_tasks) FROM groups WHERE project_id = %(p)s),
+              (SELECT count(*) FROM tasks WHERE project_id = %(p)s)
+        """
+        number_of_tasks, task_count = pg_db.retr_query(query, {"p": self.project_id})[0]
+        self.assertGreater(task_count, 0)
+        self.assertEqual(number_of_tasks, task_count)
+
         fb_db = auth.firebaseDB()
         ref = fb_db.reference(f"/v2/projects/{self.project_id}")
         result = ref.get(shallow=True)
@@ -1,3 +1,4 @@
+import os
 import time
 import unittest
 
@@ -9,6 +10,7 @@ from mapswipe_workers import auth
 from mapswipe_workers.config import FIREBASE_DB
 from mapswipe_workers.definitions import CustomError
 from mapswipe_workers.firebase_to_postgres import delete_project
+from mapswipe_workers.generate_stats import results_cache, stats_manifest
 
 
 class TestDeleteProject(BaseTestCase):
@@ -113,6 +115,18 @@ class TestDeleteProject(BaseTestCase):
         self.verify_firebase_empty()
         self.verify_postgres_empty()
 
+    def test_deletion_of_stats_manifest_and_results_cache(self):
+        """Test if stats manifest and results cache are deleted."""
+        manifest_filename = stats_manifest.get_manifest_filename(self.project_id)
+        os.makedirs(os.path.dirname(manifest_filename), exist_ok=True)
+        stats_manifest.write_json(manifest_filename, {})
+        os.makedirs(results_cache.get_cache_dir(self.project_id), exist_ok=True)
+
+        delete_project.delete_project([self.project_id])
+
+        self.assertFalse(os.path.exists(manifest_filename))
+        self.assertFalse(os.path.exists(results_cache.get_cache_dir(self.project_id)))
+
     def test_project_id_not_exists(self):
         """Test for project id which does not exists."""
         delete_project.delete_project(["tuna"])
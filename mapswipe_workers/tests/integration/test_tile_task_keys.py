@@ -0,0 +1,178 @@
+import importlib.util
+import os
+import unittest
+from unittest import mock
+
+import set_up
+import tear_down
+from base import BaseTestCase
+
+from mapswipe_workers import auth
+from mapswipe_workers.firebase_to_postgres.transfer_results import transfer_results
+
+
+def load_compact_tile_task_keys_script():
+    """Load the migration script which is not part of the mapswipe_workers package."""
+    file_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "..",
+        "python_scripts",
+        "compact_tile_task_keys.py",
+    )
+    spec = importlib.util.spec_from_file_location("compact_tile_task_keys", file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_results(project_id: str) -> list:
+    """Get all results of a project independent of how they are stored."""
+    pg_db = auth.postgresDB()
+    sql_query = """
+        SELECT msr.mapping_session_id, msr.task_id, msr.result
+        FROM mapping_sessions_results_all msr
+        JOIN mapping_sessions ms USING (mapping_session_id)
+        WHERE ms.project_id = %(project_id)s
+        ORDER BY msr.mapping_session_id, msr.task_id
+    """
+    return pg_db.retr_query(sql_query, {"project_id": project_id})
+
+
+def count_results(table: str, project_id: str) -> int:
+    pg_db = auth.postgresDB()
+    sql_query = f"""
+        SELECT count(*)
+        FROM {table} msr
+        JOIN mapping_sessions ms USING (mapping_session_id)
+        WHERE ms.project_id = %(project_id)s
+    """
+    return pg_db.retr_query(sql_query, {"project_id": project_id})[0][0]
+
+
+class TestTileKey(BaseTestCase):
+    def test_tile_key_round_trip(self):
+        """Test that z, x and y of a tile are packed and unpacked without loss."""
+        pg_db = auth.postgresDB()
+        max_xy = 2**29 - 1
+        for z, x, y in [
+            (0, 0, 0),
+            (18, 156540, 142741),
+            (29, max_xy, max_xy),
+        ]:
+            sql_query = """
+                SELECT
+                    tile_key_z(k.key),
+                    tile_key_x(k.key),
+                    tile_key_y(k.key),
+                    tile_key_to_task_id(k.key),
+                    task_id_to_tile_key(tile_key_to_task_id(k.key)) = k.key
+                FROM (SELECT tile_key(%(z)s, %(x)s, %(y)s) as key) k
+            """
+            result = pg_db.retr_query(sql_query, {"z": z, "x": x, "y": y})
+            self.assertEqual(result[0], (z, x, y, f"{z}-{x}-{y}", True))
+
+    def test_task_id_to_tile_key_without_tile(self):
+        """Test that task ids which are no tiles are not packed."""
+        pg_db = auth.postgresDB()
+        for task_id in ["1", "t1", "18-156540", "18-01-2", "30-0-0", "18-536870912-0"]:
+            result = pg_db.retr_query(
+                "SELECT task_id_to_tile_key(%(task_id)s)", {"task_id": task_id}
+            )
+            self.assertIsNone(result[0][0], task_id)
+
+
+class TestTransferResultsCompactTileTaskKeys(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project_type = "tile_map_service_grid"
+        fixture_name = "build_area"
+        self.project_id = set_up.create_test_project(
+            project_type, fixture_name, results=False
+        )
+        set_up.set_firebase_test_data(project_type, "users", "user", self.project_id)
+        set_up.set_firebase_test_data(project_type, "userGroups", "user_group", "")
+        set_up.set_firebase_test_data(
+            project_type, "results", fixture_name, self.project_id
+        )
+
+    def tearDown(self):
+        tear_down.delete_test_data(self.project_id)
+
+    @mock.patch(
+        "mapswipe_workers.firebase_to_postgres.transfer_results."
+        "COMPACT_TILE_TASK_KEYS",
+        True,
+    )
+    def test_transfer_results(self):
+        """Test that results of tile tasks are stored with packed task keys."""
+        transfer_results(project_id_list=[self.project_id])
+
+        expected_items_count = 252
+        self.assertEqual(count_results("mapping_sessions_results", self.project_id), 0)
+        self.assertEqual(
+            count_results("mapping_sessions_results_tiles", self.project_id),
+            expected_items_count,
+        )
+
+        # the view returns the results with their task ids
+        pg_db = auth.postgresDB()
+        sql_query = """
+            SELECT count(*)
+            FROM mapping_sessions_results_all msr
+            JOIN mapping_sessions ms USING (mapping_session_id)
+            JOIN tasks t
+                ON t.project_id = ms.project_id
+                AND t.group_id = ms.group_id
+                AND t.task_id = msr.task_id
+            WHERE ms.project_id = %(project_id)s
+        """
+        result = pg_db.retr_query(sql_query, {"project_id": self.project_id})
+        self.assertEqual(result[0][0], expected_items_count)
+
+        sql_query = (
+            "SELECT sum(count) "
+            "FROM task_result_counts "
+            "WHERE project_id = %(project_id)s"
+        )
+        result = pg_db.retr_query(sql_query, {"project_id": self.project_id})
+        self.assertEqual(result[0][0], expected_items_count)
+
+
+class TestCompactTileTaskKeysScript(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project_type = "tile_map_service_grid"
+        fixture_name = "build_area"
+        self.project_id = "test_build_area"
+        for data_type, name in [
+            ("projects", fixture_name),
+            ("groups", fixture_name),
+            ("tasks", fixture_name),
+            ("users", "user"),
+            ("mapping_sessions", fixture_name),
+            ("mapping_sessions_results", fixture_name),
+        ]:
+            set_up.set_postgres_test_data(project_type, data_type, name)
+
+    def test_compact_project_results(self):
+        """Test that existing results are moved to packed task keys."""
+        script = load_compact_tile_task_keys_script()
+        results = get_results(self.project_id)
+        self.assertEqual(len(results), 252)
+
+        script.compact_project_results(self.project_id)
+
+        self.assertEqual(count_results("mapping_sessions_results", self.project_id), 0)
+        self.assertEqual(
+            count_results("mapping_sessions_results_tiles", self.project_id), 252
+        )
+        self.assertEqual(get_results(self.project_id), results)
+
+        # moving the results again does not change them
+        script.compact_project_results(self.project_id)
+        self.assertEqual(get_results(self.project_id), results)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -59,6 +59,25 @@ class TestTransferResultsProject(BaseTestCase):
         result2 = pg_db.retr_query(q2)
         self.assertEqual(len(result2), expected_items_count)
 
+        # results are counted per task and result category
+        q3 = (
+            "SELECT sum(count) "
+            "FROM task_result_counts "
+            f"WHERE project_id = '{self.project_id}'"
+        )
+        result3 = pg_db.retr_query(q3)
+        self.assertEqual(result3[0][0], expected_items_count)
+
+        # the project is marked as dirty for the stats scheduler
+        q4 = (
+            "SELECT new_results, dirty_since IS NOT NULL "
+            "FROM project_stats_queue "
+            f"WHERE project_id = '{self.project_id}'"
+        )
+        result4 = pg_db.retr_query(q4)
+        self.assertEqual(result4[0][0], expected_items_count)
+        self.assertTrue(result4[0][1])
+
     def test_changes_given_project_id(self):
         """Test if results are deleted from Firebase for given project id."""
 
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from mapswipe_workers.generate_stats import agreement
+
+
+class TestAgreement(unittest.TestCase):
+    def setUp(self):
+        # example from https://en.wikipedia.org/wiki/Fleiss%27_kappa
+        self.counts = np.array(
+            [
+                [0, 0, 0, 0, 14],
+                [0, 2, 6, 4, 2],
+                [0, 0, 3, 5, 6],
+                [0, 3, 9, 2, 0],
+                [2, 2, 8, 1, 1],
+                [7, 7, 0, 0, 0],
+                [3, 2, 6, 3, 0],
+                [2, 5, 3, 2, 2],
+                [6, 5, 2, 1, 0],
+                [0, 2, 2, 3, 7],
+            ]
+        )
+
+    def test_task_agreement(self):
+        task_agreement = agreement.calc_task_agreement(self.counts)
+        self.assertAlmostEqual(task_agreement[0], 1.0)
+        self.assertAlmostEqual(task_agreement[1], 0.253, places=3)
+        self.assertEqual(agreement.calc_task_agreement(np.array([[0, 1, 0]]))[0], 1.0)
+
+    def test_shares(self):
+        shares = agreement.calc_shares(self.counts)
+        np.testing.assert_allclose(shares.sum(axis=1), 1.0)
+
+    def test_project_agreement(self):
+        project_agreement = agreement.calc_project_agreement(self.counts)
+        self.assertAlmostEqual(project_agreement["mean_agreement"], 0.378, places=3)
+        self.assertAlmostEqual(project_agreement["expected_agreement"], 0.213, places=3)
+        self.assertAlmostEqual(project_agreement["fleiss_kappa"], 0.210, places=3)
+        # same number of results per task: Scott's Pi equals Fleiss' kappa
+        self.assertAlmostEqual(
+            project_agreement["scotts_pi"], project_agreement["fleiss_kappa"]
+        )
+
+    def test_task_kappa(self):
+        task_kappa = agreement.calc_task_kappa(self.counts)
+        self.assertAlmostEqual(task_kappa[0], 1.0)
+        # same number of results per task: the mean equals Fleiss' kappa
+        self.assertAlmostEqual(
+            task_kappa.mean(),
+            agreement.calc_project_agreement(self.counts)["fleiss_kappa"],
+        )
+
+    def test_task_kappa_ignores_single_results_for_expected_agreement(self):
+        counts = np.vstack([self.counts, [1, 0, 0, 0, 0]])
+        task_kappa = agreement.calc_task_kappa(counts)
+        np.testing.assert_allclose(
+            task_kappa[:-1], agreement.calc_task_kappa(self.counts)
+        )
+        self.assertAlmostEqual(
+            task_kappa[:-1].mean(),
+            agreement.calc_project_agreement(counts)["fleiss_kappa"],
+        )
+
+    def test_agreeing_counts(self):
+        counts = np.array([[3, 1, 0], [3, 1, 0]])
+        agreeing = agreement.calc_agreeing_counts(counts, np.array([0, -1]))
+        self.assertEqual(agreeing[0], 2)
+        self.assertTrue(np.isnan(agreeing[1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from mapswipe_workers.utils.changeset_cache import ChangesetCache
+
+
+class TestChangesetCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.test_dir.name, "changeset_cache.sqlite")
+        self.changeset = {
+            "username": "test",
+            "userid": 1,
+            "comment": "add buildings",
+            "editor": "JOSM",
+        }
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_hits_and_misses(self):
+        with ChangesetCache(self.path) as cache:
+            cache.put_many({1: self.changeset, 2: None})
+        with ChangesetCache(self.path) as cache:
+            result = cache.get_many([1, 2, 3])
+            self.assertEqual(result, {1: self.changeset})
+            self.assertEqual(cache.hits, 1)
+            self.assertEqual(cache.misses, 2)
+
+    def test_expired_changesets(self):
+        with ChangesetCache(self.path, ttl=-1) as cache:
+            cache.put_many({1: self.changeset})
+            self.assertEqual(cache.get_many([1]), {})
+            self.assertEqual(cache.expired, 1)
+            self.assertEqual(cache.purge_expired(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from mapswipe_workers.generate_stats import generate_stats
+from mapswipe_workers.generate_stats.generate_stats import get_next_project
+
+GB = 1024**3
+
+
+class TestGetNextProject(unittest.TestCase):
+    def setUp(self):
+        # ordered by estimated memory, largest first
+        self.pending = [("huge", 6 * GB), ("large", 3 * GB), ("small", 1 * GB)]
+
+    def test_largest_project_which_fits(self):
+        self.assertEqual(get_next_project(self.pending, 0, 8 * GB), 0)
+        self.assertEqual(get_next_project(self.pending, 4 * GB, 8 * GB), 1)
+        self.assertEqual(get_next_project(self.pending, 6 * GB, 8 * GB), 2)
+
+    def test_no_project_fits(self):
+        self.assertIsNone(get_next_project(self.pending, 7.5 * GB, 8 * GB))
+
+    def test_project_larger_than_limit_runs_alone(self):
+        self.assertEqual(get_next_project(self.pending, 0, 2 * GB), 2)
+        self.assertIsNone(get_next_project([("huge", 6 * GB)], 1 * GB, 2 * GB))
+        self.assertEqual(get_next_project([("huge", 6 * GB)], 0, 2 * GB), 0)
+
+    def test_no_pending_projects(self):
+        self.assertIsNone(get_next_project([], 0, 8 * GB))
+
+
+class TestDeadline(unittest.TestCase):
+    def setUp(self):
+        self.projects_df = pd.DataFrame({"project_id": ["a", "b"]})
+        self.deadline = time.monotonic() - 1
+
+    def test_parallel_projects_are_skipped_after_deadline(self):
+        with mock.patch.object(
+            generate_stats, "get_number_of_results", return_value={"a": 10, "b": 20}
+        ):
+            results = list(
+                generate_stats.get_per_project_statistics_in_parallel(
+                    ["a", "b"], self.projects_df, processes=2, deadline=self.deadline
+                )
+            )
+        self.assertListEqual(results, [])
+
+    def test_projects_are_skipped_after_deadline(self):
+        results = list(
+            generate_stats.get_per_project_statistics(
+                ["a", "b"], self.projects_df, deadline=self.deadline
+            )
+        )
+        self.assertListEqual(results, [])
+
+
+class TestTimeBudget(unittest.TestCase):
+    def test_time_budget_is_shorter_than_time_interval(self):
+        self.assertEqual(generate_stats.get_time_budget(60), 48)
+        self.assertEqual(generate_stats.get_time_budget(10), 8)
+        self.assertEqual(generate_stats.get_time_budget(1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from mapswipe_workers.utils.geojson_functions import (
+    create_geojson_file_from_dict,
+    write_geojson,
+)
+
+
+class TestWriteGeojson(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame(
+            {
+                "project_id": ["1", "1"],
+                "task_id": ["18-1-2", "18-1-3"],
+                "0_count": [1, 2],
+                "agreement": [0.5, np.nan],
+                "osm_username": ["mapper", ""],
+                "geom": ["POLYGON ((0 0,1 0,1 1,0 1,0 0))", None],
+            }
+        )
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_write_gzipped_geojson(self):
+        outfile = os.path.join(self.test_dir.name, "agg_results_geom.geojson.gz")
+        write_geojson(self.df, outfile, add_metadata=True, index_label="idx")
+
+        with gzip.open(outfile, "rt") as f:
+            geojson = json.load(f)
+
+        self.assertEqual(len(geojson["features"]), 2)
+        self.assertIn("metadata", geojson)
+        first, second = geojson["features"]
+        self.assertDictEqual(
+            first["properties"],
+            {
+                "idx": 0.0,
+                "project_id": "1",
+                "task_id": "18-1-2",
+                "0_count": 1.0,
+                "agreement": 0.5,
+                "osm_username": "mapper",
+            },
+        )
+        self.assertEqual(first["geometry"]["type"], "Polygon")
+        # missing values and empty strings are not written
+        self.assertNotIn("agreement", second["properties"])
+        self.assertNotIn("osm_username", second["properties"])
+        self.assertIsNone(second["geometry"])
+
+    def test_write_batches(self):
+        outfile = os.path.join(self.test_dir.name, "projects_geom.geojson")
+        write_geojson([self.df.iloc[:1], self.df.iloc[1:]], outfile)
+
+        with open(outfile) as f:
+            geojson = json.load(f)
+
+        self.assertEqual(len(geojson["features"]), 2)
+        self.assertNotIn("metadata", geojson)
+        self.assertEqual(os.stat(outfile).st_mode & 0o777, 0o644)
+
+    def test_write_geojson_geometries(self):
+        outfile = os.path.join(self.test_dir.name, "projects_centroid.geojson")
+        df = self.df.assign(
+            geom=['{"type": "Point", "coordinates": [0.5, 0.5]}', "null"]
+        )
+        write_geojson(df, outfile, geometry_format="geojson")
+
+        with open(outfile) as f:
+            geojson = json.load(f)
+
+        first, second = geojson["features"]
+        self.assertDictEqual(
+            first["geometry"], {"type": "Point", "coordinates": [0.5, 0.5]}
+        )
+        self.assertIsNone(second["geometry"])
+
+
+class TestCreateGeojsonFileFromDict(unittest.TestCase):
+    def test_bounding_boxes(self):
+        groups = {
+            1: {
+                "18-140000-90000": {"task_x": 140000, "task_y": 90000, "task_z": 18},
+                "18-140002-90003": {"task_x": 140002, "task_y": 90003, "task_z": 18},
+            }
+        }
+        with tempfile.TemporaryDirectory() as test_dir:
+            outfile = os.path.join(test_dir, "hot_tm.geojson")
+            create_geojson_file_from_dict(groups, outfile)
+            with open(outfile) as f:
+                geojson = json.load(f)
+            mode = os.stat(outfile).st_mode & 0o777
+
+        self.assertEqual(mode, 0o644)
+
+        self.assertEqual(len(geojson["features"]), 1)
+        feature = geojson["features"][0]
+        self.assertDictEqual(feature["properties"], {"group_id": 1})
+        self.assertListEqual(
+            feature["geometry"]["coordinates"],
+            [
+                [
+                    [12.2607422, 49.0198592],
+                    [12.2648621, 49.0198592],
+                    [12.2648621, 49.0234615],
+                    [12.2607422, 49.0234615],
+                    [12.2607422, 49.0198592],
+                ]
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,6 +30,15 @@ class TestGroupSizeIsEven(unittest.TestCase):
             x_group_size = int(group["xMax"]) - int(group["xMin"]) + 1
             self.assertEqual(x_group_size % 2, 0)
 
+    def test_count_tiles_per_group(self):
+        """Test if tiles are counted from the tile ranges of each group."""
+
+        tile_counts = t.count_tiles_per_group(self.groups_dict)
+        self.assertEqual(tile_counts.keys(), self.groups_dict.keys())
+        for group_id, group in self.groups_dict.items():
+            x_group_size = int(group["xMax"]) - int(group["xMin"]) + 1
+            self.assertEqual(tile_counts[group_id], x_group_size * 3)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from mapswipe_workers.utils import ohsome_cache
+from mapswipe_workers.utils.ohsome_cache import get_cache_key
+
+
+class TestOhsomeCacheKey(unittest.TestCase):
+    def setUp(self):
+        self.area = '{"type": "FeatureCollection", "features": []}'
+
+    def test_same_key_for_normalized_request(self):
+        key = get_cache_key(
+            "elements/geometry", self.area, "building=* and geometry:polygon", "tags"
+        )
+        other_key = get_cache_key(
+            "/elements/geometry",
+            '{"features":[],\n "type":"FeatureCollection"}',
+            "building=*  and\ngeometry:polygon",
+            " tags",
+        )
+        self.assertEqual(key, other_key)
+
+    def test_different_key_for_different_filter(self):
+        key = get_cache_key("elements/geometry", self.area, "building=*")
+        other_key = get_cache_key("elements/geometry", self.area, "highway=*")
+        self.assertNotEqual(key, other_key)
+
+    def test_whitespace_in_quoted_values_is_kept(self):
+        key = get_cache_key("elements/geometry", self.area, 'name="A  B"')
+        other_key = get_cache_key("elements/geometry", self.area, 'name="A B"')
+        self.assertNotEqual(key, other_key)
+        self.assertEqual(
+            ohsome_cache.normalize_filter(' name="A  B"  and\n type:way '),
+            'name="A  B" and type:way',
+        )
+
+
+class TestOhsomeCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(
+            ohsome_cache, "OHSOME_CACHE_PATH", self.temp_dir.name
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def add_response(self, key: str, age: float = 0) -> str:
+        temporary_file = ohsome_cache.create_temporary_file()
+        with open(temporary_file, "w") as f:
+            f.write("{}")
+        path = ohsome_cache.add_to_cache(key, temporary_file)
+        cached_at = time.time() - age
+        os.utime(path, (cached_at, cached_at))
+        return path
+
+    def test_cached_response(self):
+        path = self.add_response("key")
+        self.assertEqual(ohsome_cache.get_cached_response("key"), path)
+        self.assertIsNone(ohsome_cache.get_cached_response("other"))
+
+    def test_expired_response(self):
+        path = self.add_response("key", age=2 * 60 * 60)
+        self.assertEqual(ohsome_cache.get_cached_response("key"), path)
+        self.assertIsNone(ohsome_cache.get_cached_response("key", max_age=60 * 60))
+        self.assertFalse(os.path.exists(path))
+
+    def test_evict_expired_responses(self):
+        expired = self.add_response("expired", age=2 * 60 * 60)
+        recent = self.add_response("recent")
+        ohsome_cache.evict(max_bytes=1024, max_age=60 * 60)
+        self.assertFalse(os.path.exists(expired))
+        self.assertTrue(os.path.exists(recent))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+import unittest
+
+from mapswipe_workers.definitions import ProjectType
+from mapswipe_workers.utils.project_planner import plan_project
+
+
+def create_project(path):
+    test_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(test_dir, path)) as json_file:
+        project_draft = json.load(json_file)
+    return ProjectType(project_draft["projectType"]).constructor(project_draft)
+
+
+class TestPlanProject(unittest.TestCase):
+    def test_plan_matches_created_groups(self):
+        project = create_project("fixtures/completeness/projectDraft.json")
+        with tempfile.TemporaryDirectory() as input_geometries_dir:
+            project.geometry = project.validate_geometries(input_geometries_dir)
+            plan = plan_project(project)
+            project.create_groups()
+            self.assertListEqual(
+                os.listdir(input_geometries_dir),
+                [f"raw_input_{project.projectId}.geojson"],
+            )
+
+        number_of_tasks = [group.numberOfTasks for group in project.groups]
+        self.assertEqual(plan["number_of_groups"], len(project.groups))
+        self.assertEqual(plan["number_of_tasks"], sum(number_of_tasks))
+        self.assertEqual(plan["max_tasks_per_group"], max(number_of_tasks))
+        self.assertEqual(plan["postgres_rows"]["tasks"], sum(number_of_tasks))
+        self.assertEqual(
+            plan["required_results"],
+            sum(number_of_tasks) * project.verificationNumber,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
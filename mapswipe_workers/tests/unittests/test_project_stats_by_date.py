@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from mapswipe_workers.generate_stats import project_stats_by_date
+
+
+def create_results(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=["group_id", "user_id", "timestamp"])
+    df["project_id"] = "project"
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df["day"] = df["timestamp"].dt.floor("D")
+    return df
+
+
+class TestProjectStatsByDate(unittest.TestCase):
+    def setUp(self):
+        self.groups_df = pd.DataFrame(
+            {
+                "project_id": "project",
+                "group_id": ["g1", "g2"],
+                "number_of_tasks": [10, 20],
+                "number_of_users_required": [2, 1],
+            }
+        )
+        self.results_df = create_results(
+            [
+                ["g1", "u1", "2020-06-01 10:00"],
+                ["g1", "u2", "2020-06-01 12:00"],
+                ["g2", "u1", "2020-06-02 09:00"],
+                ["g1", "u3", "2020-06-02 11:00"],
+                ["g2", "u3", "2020-06-03 08:00"],
+                ["g1", "u4", "2020-06-03 23:59"],
+            ]
+        )
+
+    def test_project_history(self):
+        df = project_stats_by_date.get_project_history(self.results_df, self.groups_df)
+        self.assertListEqual(list(df["number_of_results"]), [20, 30, 30])
+        self.assertListEqual(list(df["number_of_results_progress"]), [20, 20, 0])
+        self.assertListEqual(list(df["cum_number_of_users"]), [2, 3, 4])
+        self.assertListEqual(list(df["number_of_new_users"]), [2, 1, 1])
+        self.assertEqual(df["cum_progress"].iloc[-1], 1.0)
+
+    def test_update_project_history(self):
+        expected = project_stats_by_date.get_project_history(
+            self.results_df, self.groups_df
+        )
+        # the previous history has been calculated during the second day
+        previous = project_stats_by_date.get_project_history(
+            self.results_df.iloc[:3], self.groups_df
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, "history_project.csv")
+            previous["project_id"] = "project"
+            previous.to_csv(filename)
+            df = project_stats_by_date.update_project_history(
+                self.results_df,
+                self.groups_df,
+                project_stats_by_date.load_project_history(filename),
+            )
+        pd.testing.assert_frame_equal(df, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
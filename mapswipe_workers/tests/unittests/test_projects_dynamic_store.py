@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from mapswipe_workers.generate_stats.projects_dynamic_store import (
+    ProjectsDynamicStore,
+    load_projects_dynamic_store,
+)
+
+
+def get_project_stats(project_id: str, progress: float) -> dict:
+    return {
+        "project_id": project_id,
+        "progress": np.float64(progress),
+        "number_of_users": np.int64(3),
+        "number_of_results": np.int64(120),
+        "number_of_results_progress": np.int64(100),
+        "day": pd.Timestamp("2020-06-15"),
+        "scotts_pi": np.float64(0.5),
+        "fleiss_kappa": np.nan,
+    }
+
+
+class TestProjectsDynamicStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.test_dir.name, "projects_dynamic.sqlite")
+        self.csv_filename = os.path.join(self.test_dir.name, "projects_dynamic.csv")
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_update_replaces_project(self):
+        with ProjectsDynamicStore(self.path) as store:
+            store.update(get_project_stats("a", 0.1))
+            store.update(get_project_stats("b", 0.2))
+            store.update(get_project_stats("a", 0.3))
+            df = store.to_dataframe()
+
+        self.assertListEqual(list(df["project_id"]), ["b", "a"])
+        self.assertListEqual(list(df["progress"]), [0.2, 0.3])
+        self.assertEqual(df["day"].iloc[0], "2020-06-15 00:00:00")
+        self.assertTrue(df["fleiss_kappa"].isna().all())
+
+    def test_delete(self):
+        with ProjectsDynamicStore(self.path) as store:
+            store.update(get_project_stats("a", 0.1))
+            store.delete("a")
+            self.assertEqual(len(store), 0)
+
+    def test_init_from_csv(self):
+        with ProjectsDynamicStore(self.path) as store:
+            store.update(get_project_stats("a", 0.1))
+            store.to_csv(self.csv_filename)
+        os.remove(self.path)
+
+        with load_projects_dynamic_store(self.csv_filename, self.path) as store:
+            df = store.to_dataframe()
+        self.assertListEqual(list(df["project_id"]), ["a"])
+        self.assertListEqual(list(df["number_of_results"]), [120])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from mapswipe_workers.generate_stats.projects_static_store import (
+    PROJECTS_STATIC_COLUMNS,
+    ProjectsStaticStore,
+)
+
+
+def get_project_static_info(project_id: str, status: str, signature: str) -> dict:
+    return {
+        "project_id": project_id,
+        "name": f"project {project_id}",
+        "project_details": "",
+        "look_for": "buildings",
+        "project_type": "1",
+        "tile_server_names": "{bing}",
+        "status": status,
+        "area_sqkm": "12.5",
+        "geom": "MULTIPOLYGON (((0 0,1 0,1 1,0 1,0 0)))",
+        "centroid": "POINT (0.5 0.5)",
+        "signature": signature,
+    }
+
+
+class TestProjectsStaticStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.test_dir.name, "projects_static.sqlite")
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_update_replaces_project(self):
+        with ProjectsStaticStore(self.path) as store:
+            store.update(
+                pd.DataFrame(
+                    [
+                        get_project_static_info("b", "active", "1"),
+                        get_project_static_info("a", "active", "2"),
+                    ]
+                )
+            )
+            store.update(pd.DataFrame([get_project_static_info("b", "finished", "3")]))
+            signatures = store.get_signatures()
+            df = store.to_dataframe()
+
+        self.assertDictEqual(signatures, {"a": "2", "b": "3"})
+        self.assertListEqual(list(df.columns), PROJECTS_STATIC_COLUMNS)
+        self.assertListEqual(list(df["project_id"]), ["a", "b"])
+        self.assertListEqual(list(df["status"]), ["active", "finished"])
+        self.assertEqual(df["project_details"].iloc[0], "")
+
+    def test_geojson_geometries(self):
+        with ProjectsStaticStore(self.path) as store:
+            store.update(pd.DataFrame([get_project_static_info("a", "active", "1")]))
+            geometries = store.get_geojson_geometries()
+
+        self.assertEqual(
+            json.loads(geometries.loc["a", "geom"])["type"], "MultiPolygon"
+        )
+        self.assertDictEqual(
+            json.loads(geometries.loc["a", "centroid"]),
+            {"type": "Point", "coordinates": [0.5, 0.5]},
+        )
+
+    def test_delete(self):
+        with ProjectsStaticStore(self.path) as store:
+            store.update(
+                pd.DataFrame(
+                    [
+                        get_project_static_info("a", "active", "1"),
+                        get_project_static_info("b", "active", "2"),
+                    ]
+                )
+            )
+            store.delete(["a"])
+            self.assertDictEqual(store.get_signatures(), {"b": "2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import datetime
+import tempfile
+import unittest
+from unittest import mock
+
+import pyarrow as pa
+
+from mapswipe_workers.generate_stats import results_cache
+
+
+def create_results(mapping_session_id: int, user_id: str, task_ids: list):
+    start_time = datetime.datetime(2020, 6, 15, 10, 27, 21)
+    return pa.table(
+        {
+            "mapping_session_id": [mapping_session_id] * len(task_ids),
+            "project_id": ["project"] * len(task_ids),
+            "group_id": ["g1"] * len(task_ids),
+            "user_id": [user_id] * len(task_ids),
+            "task_id": task_ids,
+            "start_time": [start_time] * len(task_ids),
+            "end_time": [start_time] * len(task_ids),
+            "result": [1] * len(task_ids),
+        },
+        schema=results_cache.RESULTS_SCHEMA,
+    )
+
+
+class TestResultsCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(
+            results_cache, "RESULTS_CACHE_PATH", self.temp_dir.name
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_watermark_of_empty_cache(self):
+        self.assertEqual(results_cache.get_watermark("project"), 0)
+        self.assertEqual(results_cache.count_rows("project"), 0)
+        self.assertTrue(results_cache.load_results("project").empty)
+
+    def test_append_parts(self):
+        results_cache.write_part("project", create_results(3, "u1", ["18-1-1"]))
+        results_cache.write_part(
+            "project", create_results(12, "u2", ["18-1-1", "18-1-2"])
+        )
+
+        self.assertEqual(len(results_cache.get_parts("project")), 2)
+        self.assertEqual(results_cache.get_watermark("project"), 12)
+        self.assertEqual(results_cache.count_rows("project"), 3)
+
+        df = results_cache.load_results("project")
+        self.assertListEqual(list(df["user_id"]), ["u1", "u2", "u2"])
+        self.assertListEqual(list(df["task_id"]), ["18-1-1", "18-1-1", "18-1-2"])
+        self.assertEqual(df["user_id"].dtype, "category")
+        self.assertListEqual(list(df["user_id"].cat.categories), ["u1", "u2"])
+
+    def test_load_columns(self):
+        results_cache.write_part("project", create_results(3, "u1", ["18-1-1"]))
+
+        df = results_cache.load_results("project", columns=["task_id", "result"])
+        self.assertListEqual(list(df.columns), ["task_id", "result"])
+
+    def test_compact(self):
+        results_cache.write_part("project", create_results(3, "u1", ["18-1-1"]))
+        results_cache.write_part("project", create_results(12, "u2", ["18-1-2"]))
+        df = results_cache.load_results("project")
+
+        results_cache.compact("project")
+
+        self.assertEqual(len(results_cache.get_parts("project")), 1)
+        self.assertEqual(results_cache.get_watermark("project"), 12)
+        self.assertTrue(results_cache.load_results("project").equals(df))
+
+
+if __name__ == "__main__":
+    unittest.main()
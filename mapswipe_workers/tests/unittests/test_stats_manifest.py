@@ -0,0 +1,88 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from mapswipe_workers.generate_stats import stats_manifest
+
+
+def write_text(text: str):
+    def write(path: str):
+        with (gzip.open if path.endswith(".gz") else open)(path, "wt") as f:
+            f.write(text)
+
+    return write
+
+
+class TestStatsManifest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.api_path = self.temp_dir.name
+        for name, value in [
+            ("API_PATH", self.api_path),
+            ("STATS_MANIFEST_PATH", os.path.join(self.api_path, "manifest")),
+        ]:
+            patcher = mock.patch.object(stats_manifest, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+        os.makedirs(os.path.join(self.api_path, "history"))
+        self.filename = os.path.join(self.api_path, "history", "history_project.csv")
+
+    def test_keep_unchanged_file(self):
+        manifest = stats_manifest.StatsManifest("project")
+        self.assertTrue(manifest.write_file(self.filename, write_text("a,b\n")))
+        os.utime(self.filename, (0, 0))
+
+        self.assertFalse(manifest.write_file(self.filename, write_text("a,b\n")))
+        self.assertEqual(os.path.getmtime(self.filename), 0)
+
+        self.assertTrue(manifest.write_file(self.filename, write_text("a,b,c\n")))
+        self.assertNotEqual(os.path.getmtime(self.filename), 0)
+        self.assertEqual(os.stat(self.filename).st_mode & 0o777, 0o644)
+        # no temporary files are left
+        self.assertListEqual(
+            os.listdir(os.path.dirname(self.filename)), ["history_project.csv"]
+        )
+
+    def test_gzipped_files_are_compared_uncompressed(self):
+        filename = self.filename + ".gz"
+        manifest = stats_manifest.StatsManifest("project")
+        manifest.write_file(filename, write_text("a,b\n"))
+        self.assertFalse(manifest.write_file(filename, write_text("a,b\n")))
+        self.assertEqual(
+            manifest.files["history/history_project.csv.gz"]["sha256"],
+            stats_manifest.content_hash(filename),
+        )
+
+    def test_is_up_to_date(self):
+        inputs = {"results_watermark": 12, "number_of_results": 3}
+        manifest = stats_manifest.StatsManifest("project")
+        self.assertFalse(manifest.is_up_to_date(inputs))
+
+        manifest.write_file(self.filename, write_text("a,b\n"))
+        manifest.save(inputs, {"project_id": "project", "progress": 0.5})
+
+        manifest = stats_manifest.StatsManifest("project")
+        self.assertTrue(manifest.is_up_to_date(inputs))
+        self.assertDictEqual(
+            manifest.project_stats, {"project_id": "project", "progress": 0.5}
+        )
+        self.assertSetEqual(
+            set(manifest.files["history/history_project.csv"]), {"sha256", "size"}
+        )
+        self.assertEqual(
+            os.stat(stats_manifest.get_manifest_filename("project")).st_mode & 0o777,
+            0o644,
+        )
+        self.assertFalse(
+            manifest.is_up_to_date({"results_watermark": 13, "number_of_results": 4})
+        )
+
+        os.remove(self.filename)
+        self.assertFalse(manifest.is_up_to_date(inputs))
+
+
+if __name__ == "__main__":
+    unittest.main()
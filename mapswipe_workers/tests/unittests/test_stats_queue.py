@@ -0,0 +1,45 @@
+import unittest
+
+from mapswipe_workers.generate_stats.stats_queue import (
+    MAX_STALENESS,
+    QueuedProject,
+    prioritize_projects,
+)
+
+HOUR = 60 * 60
+
+
+class TestPrioritizeProjects(unittest.TestCase):
+    def test_more_new_results_first(self):
+        projects = [
+            QueuedProject("cold", 1, 60),
+            QueuedProject("hot", 5000, 60),
+            QueuedProject("warm", 200, 60),
+        ]
+        self.assertListEqual(prioritize_projects(projects), ["hot", "warm", "cold"])
+
+    def test_new_results_are_weighted_by_waiting_time(self):
+        projects = [
+            QueuedProject("new", 300, 0),
+            QueuedProject("waiting", 200, 2 * HOUR),
+        ]
+        self.assertListEqual(prioritize_projects(projects), ["waiting", "new"])
+
+    def test_stale_projects_first(self):
+        projects = [
+            QueuedProject("hot", 5000, 60),
+            QueuedProject("stale", 1, MAX_STALENESS),
+            QueuedProject("staler", 1, MAX_STALENESS + HOUR),
+        ]
+        self.assertListEqual(prioritize_projects(projects), ["staler", "stale", "hot"])
+        self.assertListEqual(
+            prioritize_projects(projects, max_staleness=2 * MAX_STALENESS),
+            ["hot", "staler", "stale"],
+        )
+
+    def test_no_projects(self):
+        self.assertListEqual(prioritize_projects([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
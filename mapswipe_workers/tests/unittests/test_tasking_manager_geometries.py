@@ -0,0 +1,105 @@
+import unittest
+from unittest import mock
+
+from osgeo import ogr
+
+from mapswipe_workers.generate_stats import tasking_manager_geometries
+from mapswipe_workers.utils import tile_functions
+
+
+def create_tiles(coords: list, zoom: int = 18) -> list:
+    return [
+        {
+            "id": f"{zoom}-{x}-{y}",
+            "task_x": x,
+            "task_y": y,
+            "task_z": zoom,
+            "wkt": tile_functions.geometry_from_tile_coords(x, y, zoom),
+        }
+        for x, y in coords
+    ]
+
+
+def union_of_tiles(project_data: list) -> ogr.Geometry:
+    multipolygon_geometry = ogr.Geometry(ogr.wkbMultiPolygon)
+    for item in project_data:
+        multipolygon_geometry.AddGeometry(ogr.CreateGeometryFromWkt(item["wkt"]))
+    return multipolygon_geometry.UnionCascaded()
+
+
+class TestDissolveProjectData(unittest.TestCase):
+    def setUp(self):
+        # a ring of tiles with a hole, a tile touching it at a corner
+        # and a single tile further away
+        coords = [
+            (x, y)
+            for x in range(140000, 140003)
+            for y in range(90000, 90003)
+            if (x, y) != (140001, 90001)
+        ]
+        coords += [(140003, 90003), (140010, 90000)]
+        self.project_data = create_tiles(coords)
+
+    def assert_same_geometry(self, geometry, expected):
+        self.assertEqual(geometry.GetGeometryName(), "MULTIPOLYGON")
+        self.assertEqual(geometry.GetGeometryCount(), expected.GetGeometryCount())
+        self.assertAlmostEqual(geometry.SymDifference(expected).GetArea(), 0)
+        self.assertAlmostEqual(geometry.GetArea(), expected.GetArea())
+
+    def test_dissolve_project_data(self):
+        geometry = tasking_manager_geometries.dissolve_project_data(self.project_data)
+        expected = union_of_tiles(self.project_data)
+        self.assert_same_geometry(geometry, expected)
+        # the ring of tiles has an inner ring
+        self.assertIn(
+            2,
+            [
+                geometry.GetGeometryRef(i).GetGeometryCount()
+                for i in range(geometry.GetGeometryCount())
+            ],
+        )
+
+    def test_dissolve_project_data_in_windows(self):
+        with mock.patch.object(tasking_manager_geometries, "DISSOLVE_WINDOW_SIZE", 2):
+            geometry = tasking_manager_geometries.dissolve_project_data(
+                self.project_data
+            )
+        expected = union_of_tiles(self.project_data)
+        self.assert_same_geometry(geometry, expected)
+
+
+class TestCreateHotTmTasks(unittest.TestCase):
+    def test_clusters(self):
+        # two clusters which are connected within a neighbourhood of 5 x 5 tiles
+        coords = [(140000, 90000), (140002, 90002), (140010, 90000)]
+        project_data = create_tiles(coords)
+
+        groups = tasking_manager_geometries.create_hot_tm_tasks("project", project_data)
+        self.assertDictEqual(
+            {group_id: sorted(group) for group_id, group in groups.items()},
+            {
+                1: ["18-140000-90000", "18-140002-90002"],
+                2: ["18-140010-90000"],
+            },
+        )
+
+        groups = tasking_manager_geometries.create_hot_tm_tasks(
+            "project", project_data, neighbourhood_shape="star"
+        )
+        self.assertEqual(len(groups), 3)
+
+    def test_split_clusters(self):
+        coords = [(x, y) for x in range(140000, 140010) for y in range(90000, 90010)]
+        project_data = create_tiles(coords)
+
+        groups = tasking_manager_geometries.create_hot_tm_tasks(
+            "project", project_data, group_size=15
+        )
+        task_ids = [task_id for group in groups.values() for task_id in group]
+        self.assertCountEqual(task_ids, [item["id"] for item in project_data])
+        for group in groups.values():
+            self.assertLess(len(group), 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
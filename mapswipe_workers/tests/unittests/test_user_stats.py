@@ -38,5 +38,46 @@ class TestUserStats(unittest.TestCase):
         )
 
 
+class TestUserStatsChunks(unittest.TestCase):
+    def setUp(self) -> None:
+        self.results_df = pd.DataFrame(
+            {
+                "project_id": "p",
+                "group_id": ["g1", "g1", "g1", "g2", "g2", "g2"],
+                "user_id": ["a", "b", "c", "a", "b", "c"],
+                "username": ["a", "b", "c", "a", "b", "c"],
+                "task_id": ["t1", "t1", "t1", "t2", "t2", "t2"],
+                "result": [1, 1, 0, 2, 2, 2],
+            }
+        )
+        self.agg_results_df = pd.DataFrame(
+            {
+                "task_id": ["t1", "t2"],
+                "0_count": [1, 0],
+                "1_count": [2, 0],
+                "2_count": [0, 3],
+                "3_count": [0, 0],
+                "total_count": [3, 3],
+            }
+        )
+
+    def test_agreeing_contributions(self):
+        df = get_agg_results_by_user_id(self.results_df, self.agg_results_df)
+
+        self.assertListEqual(list(df["user_id"]), ["a", "b", "c"])
+        self.assertListEqual(list(df["groups_completed"]), [2, 2, 2])
+        self.assertListEqual(list(df["total_contributions"]), [2, 2, 2])
+        self.assertListEqual(list(df["agreeing_contributions"]), [3, 3, 2])
+        self.assertListEqual(list(df["disagreeing_contributions"]), [1, 1, 2])
+
+    def test_same_result_for_chunks(self):
+        assert_frame_equal(
+            get_agg_results_by_user_id(self.results_df, self.agg_results_df),
+            get_agg_results_by_user_id(
+                self.results_df, self.agg_results_df, chunk_size=4
+            ),
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,12 @@
 import json
 import os
 import unittest
+from unittest import mock
 
 from osgeo import ogr
 
 from mapswipe_workers.definitions import CustomError, ProjectType
+from mapswipe_workers.utils import geometry_validation
 
 
 def create_project(path):
@@ -120,6 +122,21 @@ class TestGeometryValidation(unittest.TestCase):
         # that the area is too large
         self.assertRaises(CustomError, project.validate_geometries)
 
+    def test_sum_of_areas_is_too_large(self):
+        """Test if validate_geometries throws an error
+        if each feature is small enough, but all features together
+        cover a too large area."""
+
+        path = (
+            "fixtures/tile_map_service_grid/projects/"
+            "projectDraft_sum_of_areas_too_large.json"
+        )
+        project = create_project(path)
+
+        # each of the two polygons covers about 11 sqkm,
+        # the max area for zoom level 22 is 20 sqkm
+        self.assertRaises(CustomError, project.validate_geometries)
+
     def test_broken_geojson_string(self):
         """Test if validate_geometries throws an error
         if the provided geojson string is broken.
@@ -135,5 +152,21 @@ class TestGeometryValidation(unittest.TestCase):
         self.assertRaises(CustomError, project.validate_geometries)
 
 
+class TestDefaultMaxWorkers(unittest.TestCase):
+    def tearDown(self):
+        geometry_validation.set_default_max_workers(None)
+
+    def test_default_max_workers(self):
+        """Test that a default of one worker validates in the calling process."""
+        geometry_validation.set_default_max_workers(1)
+        wkb_geometries = [None] * geometry_validation.PARALLEL_THRESHOLD
+        with mock.patch("concurrent.futures.ProcessPoolExecutor") as executor:
+            validation = geometry_validation.validate_geometries(wkb_geometries)
+        executor.assert_not_called()
+        self.assertEqual(
+            len(validation["is_valid"]), geometry_validation.PARALLEL_THRESHOLD
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
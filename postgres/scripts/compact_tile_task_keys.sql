@@ -0,0 +1,108 @@
+-- Tile task ids ('z-x-y') can be stored as packed 64-bit keys.
+-- Bits 58-63 hold the zoom level, bits 29-57 the tile x
+-- and bits 0-28 the tile y coordinate.
+CREATE OR REPLACE FUNCTION tile_key(z int, x int, y int) RETURNS int8
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT (z::int8 << 58) | (x::int8 << 29) | y::int8;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_key_z(key int8) RETURNS int
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT (key >> 58)::int;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_key_x(key int8) RETURNS int
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT ((key >> 29) & 536870911)::int;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_key_y(key int8) RETURNS int
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT (key & 536870911)::int;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_key_to_task_id(key int8) RETURNS varchar
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT concat_ws('-', tile_key_z(key), tile_key_x(key), tile_key_y(key));
+$$;
+
+-- Returns NULL for task ids which can not be packed without loss,
+-- e.g. task ids of footprint projects.
+CREATE OR REPLACE FUNCTION task_id_to_tile_key(task_id varchar) RETURNS int8
+    LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS
+$$
+DECLARE
+    parts text[];
+BEGIN
+    IF task_id !~ '^([0-9]|[12][0-9])-(0|[1-9][0-9]{0,8})-(0|[1-9][0-9]{0,8})$' THEN
+        RETURN NULL;
+    END IF;
+    parts := string_to_array(task_id, '-');
+    IF parts[2]::int > 536870911 OR parts[3]::int > 536870911 THEN
+        RETURN NULL;
+    END IF;
+    RETURN tile_key(parts[1]::int, parts[2]::int, parts[3]::int);
+END;
+$$;
+
+-- Results of tile tasks with packed task keys.
+-- Used instead of mapping_sessions_results if COMPACT_TILE_TASK_KEYS is set.
+CREATE TABLE IF NOT EXISTS mapping_sessions_results_tiles (
+    mapping_session_id int8,
+    task_key int8,
+    result int2 not null,
+    PRIMARY KEY (mapping_session_id, task_key),
+    FOREIGN KEY (mapping_session_id)
+    references mapping_sessions (mapping_session_id)
+);
+
+CREATE OR REPLACE FUNCTION mapping_sessions_results_tiles_constraint() RETURNS trigger
+    LANGUAGE plpgsql AS
+$$
+DECLARE v mapping_sessions;
+BEGIN
+    IF NOT EXISTS(
+        SELECT 1
+        FROM tasks
+        JOIN mapping_sessions ms
+        ON ms.mapping_session_id = NEW.mapping_session_id
+        WHERE tasks.task_id = tile_key_to_task_id(NEW.task_key) AND
+            tasks.group_id = ms.group_id AND
+            tasks.project_id = ms.project_id AND
+            ms.mapping_session_id = NEW.mapping_session_id
+        )
+    THEN
+        SELECT ms.project_id, ms.group_id, ms.user_id
+        FROM mapping_sessions ms
+        WHERE ms.mapping_session_id = NEW.mapping_session_id
+        INTO v;
+        RAISE EXCEPTION
+        'Tried to insert invalid result: Project: % Group: % Task: % - User: %', v.project_id, v.group_id, tile_key_to_task_id(NEW.task_key), v.user_id
+            USING ERRCODE = '23503';
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS insert_mapping_sessions_results_tiles ON mapping_sessions_results_tiles;
+CREATE TRIGGER insert_mapping_sessions_results_tiles BEFORE INSERT ON mapping_sessions_results_tiles
+    FOR EACH ROW EXECUTE PROCEDURE mapping_sessions_results_tiles_constraint();
+
+-- All results with task ids, independent of how they are stored.
+CREATE OR REPLACE VIEW mapping_sessions_results_all AS
+    SELECT
+        mapping_session_id,
+        task_id,
+        result
+    FROM mapping_sessions_results
+    UNION ALL
+    SELECT
+        mapping_session_id,
+        tile_key_to_task_id(task_key) as task_id,
+        result
+    FROM mapping_sessions_results_tiles;
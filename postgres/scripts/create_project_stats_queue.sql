@@ -0,0 +1,19 @@
+-- Number of results per project which have been transferred
+-- since the stats of the project have been generated.
+-- Updated during the transfer of results and used to schedule the stats.
+CREATE TABLE IF NOT EXISTS project_stats_queue (
+    project_id varchar PRIMARY KEY,
+    new_results int8 NOT NULL DEFAULT 0,
+    -- time of the oldest result which is not part of the stats yet
+    dirty_since timestamp,
+    stats_generated_at timestamp
+);
+
+-- Generate the stats of all projects with results in the last three hours
+-- with the first run of the stats scheduler.
+INSERT INTO project_stats_queue (project_id, new_results, dirty_since)
+    SELECT project_id, sum(items_count), min(start_time)
+    FROM mapping_sessions
+    WHERE start_time >= now() - interval '3 hours'
+    GROUP BY project_id
+ON CONFLICT (project_id) DO NOTHING;
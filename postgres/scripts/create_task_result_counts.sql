@@ -0,0 +1,25 @@
+-- Number of results per task and result category.
+-- Updated during the transfer of results in the same transaction as the results.
+CREATE TABLE IF NOT EXISTS task_result_counts (
+    project_id varchar,
+    group_id varchar,
+    task_id varchar,
+    result int2,
+    count int4 not null,
+    PRIMARY KEY (project_id, group_id, task_id, result)
+);
+
+-- Count the results which already exist.
+-- Stop the transfer of results while running this script.
+INSERT INTO task_result_counts
+    SELECT
+        ms.project_id,
+        ms.group_id,
+        msr.task_id,
+        msr.result,
+        count(*)
+    FROM mapping_sessions_results_all msr
+    JOIN mapping_sessions ms USING (mapping_session_id)
+    GROUP BY ms.project_id, ms.group_id, msr.task_id, msr.result
+ON CONFLICT (project_id, group_id, task_id, result)
+DO UPDATE SET count = EXCLUDED.count;
@@ -0,0 +1,38 @@
+-- Tasks with geometry and project type specifics (taskX, taskY, url, urlB).
+-- Tile tasks in compact storage have neither geometry nor project type specifics.
+-- Both are derived from the task id and the tile servers of the project.
+CREATE OR REPLACE VIEW tasks_expanded AS
+    SELECT
+        t.project_id,
+        t.group_id,
+        t.task_id,
+        coalesce(
+            t.geom,
+            ST_Multi(tile_to_geometry(tile_key_z(k.key), tile_key_x(k.key), tile_key_y(k.key)))
+        ) as geom,
+        coalesce(
+            t.project_type_specifics,
+            json_strip_nulls(
+                json_build_object(
+                    'taskX', tile_key_x(k.key)::varchar,
+                    'taskY', tile_key_y(k.key)::varchar,
+                    'url', tile_to_url(
+                        tile_key_z(k.key), tile_key_x(k.key), tile_key_y(k.key),
+                        p.project_type_specifics -> 'tileServer'
+                    ),
+                    'urlB', tile_to_url(
+                        tile_key_z(k.key), tile_key_x(k.key), tile_key_y(k.key),
+                        p.project_type_specifics -> 'tileServerB'
+                    )
+                )
+            )
+        ) as project_type_specifics
+    FROM tasks t
+    JOIN projects p USING (project_id)
+    CROSS JOIN LATERAL (
+        SELECT
+            CASE
+                WHEN t.geom IS NULL OR t.project_type_specifics IS NULL
+                THEN task_id_to_tile_key(t.task_id)
+            END as key
+    ) k;
@@ -0,0 +1,66 @@
+-- Tile map service helper functions.
+-- Tasks of build area and completeness projects are derived from the
+-- tile ranges of their groups. These functions compute geometry and url
+-- of a tile the same way as mapswipe_workers.utils.tile_functions.
+CREATE OR REPLACE FUNCTION tile_to_geometry(z int, x int, y int) RETURNS geometry
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$
+    SELECT ST_MakeEnvelope(
+        x::float8 / (1 << z) * 360 - 180,
+        degrees(2 * atan(exp(pi() * (1 - 2 * (y + 1)::float8 / (1 << z)))) - pi() / 2),
+        (x + 1)::float8 / (1 << z) * 360 - 180,
+        degrees(2 * atan(exp(pi() * (1 - 2 * y::float8 / (1 << z)))) - pi() / 2),
+        4326
+    );
+$$;
+
+CREATE OR REPLACE FUNCTION tile_to_quadkey(z int, x int, y int) RETURNS varchar
+    LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS
+$$
+DECLARE
+    quadkey varchar := '';
+    digit int;
+    mask int;
+BEGIN
+    FOR i IN REVERSE z..1 LOOP
+        digit := 0;
+        mask := 1 << (i - 1);
+        IF (x & mask) <> 0 THEN
+            digit := digit + 1;
+        END IF;
+        IF (y & mask) <> 0 THEN
+            digit := digit + 2;
+        END IF;
+        quadkey := quadkey || digit;
+    END LOOP;
+    RETURN quadkey;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION tile_to_url(z int, x int, y int, tile_server json) RETURNS varchar
+    LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS
+$$
+DECLARE
+    url varchar := tile_server->>'url';
+    tile_y int := y;
+BEGIN
+    IF tile_server->>'name' = 'bing' THEN
+        RETURN 'https://ecn.t0.tiles.virtualearth.net/tiles/a'
+            || tile_to_quadkey(z, x, y)
+            || '.jpeg?g=7505&mkt=en-US&token='
+            || coalesce(tile_server->>'apiKey', 'None');
+    END IF;
+    -- maxar and '{-y}' urls use the Google tile y coordinate instead of TMS
+    IF tile_server->>'name' <> 'sinergise'
+        AND (tile_server->>'name' LIKE '%maxar%' OR url LIKE '%{-y}%') THEN
+        tile_y := (1 << z) - y - 1;
+        url := replace(url, '{-y}', '{y}');
+    END IF;
+    url := replace(url, '{key}', coalesce(tile_server->>'apiKey', 'None'));
+    url := replace(url, '{layer}', coalesce(tile_server->>'wmtsLayerName', 'None'));
+    url := replace(url, '{x}', x::varchar);
+    url := replace(url, '{y}', tile_y::varchar);
+    url := replace(url, '{z}', z::varchar);
+    RETURN url;
+END;
+$$;